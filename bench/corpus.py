@@ -0,0 +1,146 @@
+'''
+Generated Java sources for the benchmarks. The code is meant to look like
+ordinary hand written Java: Javadoc, fields, generics, control flow, string
+and character literals, numbers and operators. Also the helpers the
+benchmark scripts share: options, timing and walking trees.
+'''
+
+import optparse
+import time
+
+import plyj.model as model
+
+HEADER = '''/*
+ * Copyright (c) 2013 Example Corp. All rights reserved.
+ *
+ * Licensed under the Apache License, Version 2.0 (the "License");
+ * you may not use this file except in compliance with the License.
+ */
+package com.example.generated;
+
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+
+'''
+
+CLASS = '''/**
+ * Generated class number {n}.
+ *
+ * @author generator
+ */
+public class Generated{n}<T extends Comparable<T>> implements Runnable {{
+
+    private static final int LIMIT = {n} * 16 + 0x1F;
+    private final Map<String, List<T>> index = new HashMap<String, List<T>>();
+    protected char separator = ',';
+    private double ratio = 0.75;
+
+    // counts the calls to run
+    private long runs = 0L;
+
+    public Generated{n}(T first, T... rest) {{
+        super();
+        add("first", first);
+        for (T item : rest) {{
+            add("rest", item);
+        }}
+    }}
+
+    /**
+     * Adds an item under the given key.
+     */
+    public void add(String key, T item) {{
+        List<T> items = index.get(key);
+        if (items == null) {{
+            items = new ArrayList<T>();
+            index.put(key, items);
+        }}
+        items.add(item);
+    }}
+
+    public int count(String key) {{
+        List<T> items = index.get(key);
+        return items == null ? 0 : items.size();
+    }}
+
+    @Override
+    public void run() {{
+        runs++;
+        int total = 0;
+        for (int i = 0; i < LIMIT; i += 2) {{
+            total += i % 3 == 0 ? i << 1 : i >> 1;
+            if (total > 1000 && (i & 1) != 0 || total < -1000) {{
+                break;
+            }}
+        }}
+        while (ratio < 1.0) {{
+            ratio *= 1.5;
+        }}
+        switch (total % 4) {{
+            case 0:
+                separator = ';';
+                break;
+            case 1:
+                separator = '\\t';
+                break;
+            default:
+                separator = ',';
+        }}
+        try {{
+            String message = "total=" + total + ", runs=" + runs + "\\n";
+            System.out.print(message);
+        }} catch (RuntimeException e) {{
+            throw new IllegalStateException("failed in " + getClass().getName(), e);
+        }} finally {{
+            runs = runs >>> 1;
+        }}
+    }}
+}}
+
+'''
+
+
+def java_source(classes):
+    '''A compilation unit with the given number of top level classes.'''
+    return HEADER + ''.join(CLASS.format(n=n) for n in range(classes))
+
+
+def option_parser(usage, classes=50, repeat=5):
+    '''
+    An OptionParser with the options --classes, the size of the corpus, and
+    --repeat, the runs to time, with these defaults; None leaves one out.
+    '''
+    opts = optparse.OptionParser(usage=usage)
+    if classes is not None:
+        opts.add_option('--classes', type='int', default=classes)
+    if repeat is not None:
+        opts.add_option('--repeat', type='int', default=repeat)
+    return opts
+
+
+def best_time(run, repeat):
+    '''The shortest time of repeat calls of run and the result of the last.'''
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        result = run()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, result
+
+
+def nodes(tree):
+    '''The nodes of tree.'''
+    found = []
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+        elif isinstance(node, model.SourceElement):
+            found.append(node)
+            stack.extend(getattr(node, f) for f in node._fields)
+    return found
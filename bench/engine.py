@@ -0,0 +1,55 @@
+#!/usr/bin/env python2
+'''
+Compares the parse throughput of the plyj engine with PLY's generic
+LRParser running the same tables and actions on a generated corpus. Both
+parse without tracking spans; the engine is also measured with full
+tracking. The script checks that both produce the same tree.
+
+usage: engine.py [--classes N] [--repeat N]
+'''
+
+import functools
+import itertools
+import sys
+
+import plyj.parser as plyj
+import plyj.scanner as scanner
+import plyj.tables as tables
+from corpus import best_time, java_source, option_parser
+
+
+def main():
+    opts = option_parser(__doc__)
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    parser = plyj.Parser()
+    tokens = len(parser.tokenize_string(source))
+
+    t = tables.load_tables(plyj.MyLexer(), plyj.MyParser(), plyj.START)
+    lr_parser = tables.make_parser(t, plyj.MyParser())
+    lexer = parser.grammar.new_lexer()
+
+    def ply_parse():
+        # the goal token selects the compilation unit like in Parser.parse()
+        lexer.lineno = 1
+        lexer.input(source)
+        tokens = itertools.chain([scanner.Token('GOAL_COMPILATION_UNIT', None, 1, 0, 0)], lexer)
+        return lr_parser.parse(lexer=lexer, tokenfunc=functools.partial(next, tokens, None))
+
+    results = [('PLY', best_time(ply_parse, options.repeat)),
+               ('engine', best_time(lambda: parser.parse_string(source), options.repeat)),
+               ('tracking', best_time(lambda: parser.parse(source).tree, options.repeat))]
+
+    print('{} bytes, {} tokens'.format(len(source), tokens))
+    print('{:<10} {:>10} {:>14} {:>10}'.format('', 'ms', 'tokens/sec', 'speedup'))
+    base = results[0][1][0]
+    for name, (elapsed, tree) in results:
+        print('{:<10} {:>10.1f} {:>14,.0f} {:>9.2f}x'.format(name, elapsed * 1e3, tokens / elapsed,
+                                                             base / elapsed))
+    if any(tree != results[0][1][1] for _, (_, tree) in results):
+        print('FAIL: the trees differ')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python2
+'''
+Measures comparing and hashing trees: two separately parsed trees of a
+generated corpus are compared, once equal and once differing in the last
+class, and hashed, the first time and with the hashes cached. Then all
+subtrees are put into a set to count the distinct ones.
+
+usage: equality.py [--classes N] [--repeat N]
+'''
+
+import sys
+
+import plyj.parser as plyj
+from corpus import best_time, java_source, nodes, option_parser
+
+
+def main():
+    opts = option_parser(__doc__, classes=200)
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    parser = plyj.Parser()
+    a, b = parser.parse_string(source), parser.parse_string(source)
+    # the last literal of the source is another one
+    i = source.rindex('1')
+    c = parser.parse_string(source[:i] + '2' + source[i + 1:])
+    found = nodes(a)
+
+    results = [('equal', best_time(lambda: a == b, options.repeat)),
+               ('differ at the end', best_time(lambda: a == c, options.repeat)),
+               ('first hash', best_time(lambda: hash(a), 1)),
+               ('cached hash', best_time(lambda: hash(a), options.repeat)),
+               ('set of subtrees', best_time(lambda: len(set(found)), options.repeat))]
+
+    print('{} bytes, {:,} nodes'.format(len(source), len(found)))
+    print('{:<20} {:>10}'.format('', 'ms'))
+    for name, (elapsed, _) in results:
+        print('{:<20} {:>10.2f}'.format(name, elapsed * 1e3))
+    print('{:,} distinct subtrees'.format(results[-1][1][1]))
+    if not results[0][1][1] or results[1][1][1] or hash(a) != hash(b):
+        print('FAIL: wrong comparison')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python2
+'''
+Measures the latency of Parser.reparse() for single character edits of a
+generated source of about 5000 lines, compared with parsing the edited
+source again. Every reparsed tree is checked against the full parse,
+including the spans of all nodes.
+
+usage: incremental.py [--lines N] [--repeat N]
+'''
+
+import sys
+
+import plyj.parser as plyj
+import plyj.model as model
+from corpus import best_time, java_source, option_parser
+
+
+def same(a, b, result_a, result_b):
+    '''Whether the trees a and b are equal and their nodes have the same spans.'''
+    if isinstance(a, (list, tuple)):
+        return (type(a) is type(b) and len(a) == len(b) and
+                all(same(x, y, result_a, result_b) for x, y in zip(a, b)))
+    if isinstance(a, model.SourceElement):
+        return (type(a) is type(b) and result_a.span(a) == result_b.span(b) and
+                all(same(getattr(a, f), getattr(b, f), result_a, result_b) for f in a._fields))
+    return a == b
+
+
+def edits(source):
+    '''(name, offset, removed, inserted) of the edits, all in the middle of the source.'''
+    middle = len(source) // 2
+
+    def find(text, delta=0):
+        return source.index(text, middle) + delta
+
+    return [('identifier in a loop', find('total += i % 3', 3), 0, 'x'),
+            ('method statement', find('items.add(item);', 14), 0, ' '),
+            ('field initializer', find('0.75', 3), 1, ''),
+            ('between members', find('    // counts the calls'), 0, '\n')]
+
+
+def main():
+    opts = option_parser(__doc__, classes=None)
+    opts.add_option('--lines', type='int', default=5000)
+    options, _ = opts.parse_args()
+
+    per_class = java_source(2).count('\n') - java_source(1).count('\n')
+    source = java_source(max(1, options.lines // per_class))
+    parser = plyj.Parser()
+    result = parser.parse(source)
+
+    print('{} lines, {} bytes'.format(source.count('\n'), len(source)))
+    print('{:<22} {:>12} {:>12} {:>10}'.format('edit', 'reparse ms', 'full ms', 'speedup'))
+    failed = False
+    for name, offset, removed, inserted in edits(source):
+        new_source = source[:offset] + inserted + source[offset + removed:]
+        incremental, reparsed = best_time(
+            lambda: parser.reparse(result, offset, removed, inserted), options.repeat)
+        full, expected = best_time(lambda: parser.parse(new_source), options.repeat)
+        if not same(reparsed.tree, expected.tree, reparsed, expected):
+            print('FAIL: {} differs from the full parse'.format(name))
+            failed = True
+        print('{:<22} {:>12.2f} {:>12.1f} {:>9.1f}x'.format(name, incremental * 1e3, full * 1e3,
+                                                            full / incremental))
+    if failed:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python2
+'''
+Compares the throughput of the plyj scanner with the PLY lexer built from the
+same rules (plyj.parser.MyLexer) on a generated corpus. The scanner is
+measured twice: producing token objects for the parser and producing a
+TokenStream of arrays with tokenize().
+
+usage: lexer.py [--classes N] [--repeat N]
+'''
+
+
+import ply.lex as lex
+
+import plyj.parser as plyj
+import plyj.scanner as scanner
+from corpus import best_time, java_source, option_parser
+
+
+def count(lexer, source):
+    '''The number of tokens lexer returns for source.'''
+    lexer.input(source)
+    tokens = 0
+    for _ in lexer:
+        tokens += 1
+    return tokens
+
+
+def main():
+    opts = option_parser(__doc__, classes=200)
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    ply_lexer = lex.lex(module=plyj.MyLexer(), errorlog=lex.NullLogger())
+    plyj_scanner = scanner.Scanner(scanner.Lexicon(plyj.MyLexer))
+    results = [('PLY lexer', best_time(lambda: count(ply_lexer, source), options.repeat)),
+               ('scanner', best_time(lambda: count(plyj_scanner, source), options.repeat)),
+               ('tokenize', best_time(lambda: len(plyj_scanner.tokenize(source)), options.repeat))]
+
+    print('{} bytes'.format(len(source)))
+    print('{:<10} {:>8} {:>10} {:>14}'.format('', 'tokens', 'ms', 'tokens/sec'))
+    for name, (elapsed, tokens) in results:
+        print('{:<10} {:>8} {:>10.1f} {:>14,.0f}'.format(name, tokens, elapsed * 1e3, tokens / elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python2
+'''
+Measures the memory that parsed trees take: the bytes per node of the tree
+of a generated corpus, counting its nodes, lists and strings, and the growth
+of the peak RSS of this process while it parses the corpus a number of times
+and keeps all trees. With --nodes the parses share equal names, types,
+wildcards and type parameters. With --shared they intern their strings, and
+share these nodes, in one dict for all files, as a batch run would.
+
+usage: memory.py [--classes N] [--files N] [--nodes] [--shared]
+'''
+
+import resource
+import sys
+
+import plyj.parser as plyj
+from corpus import java_source, nodes, option_parser
+from tables import deep_size
+
+
+def own_size(node):
+    '''Bytes of node itself and of its __dict__ if it has one.'''
+    size = sys.getsizeof(node)
+    if hasattr(node, '__dict__'):
+        size += sys.getsizeof(node.__dict__)
+    return size
+
+
+def max_rss():
+    '''The peak resident set size of this process in kB (Linux units).'''
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def main():
+    opts = option_parser(__doc__, repeat=None)
+    opts.add_option('--files', type='int', default=20)
+    opts.add_option('--nodes', action='store_true')
+    opts.add_option('--shared', action='store_true')
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    parser = plyj.Parser()
+
+    def parse(strings=None, shared=None):
+        if options.nodes and shared is None:
+            shared = {}
+        return parser.parse_string(source, strings=strings, shared=shared)
+
+    tree = parse()
+    found = nodes(tree)
+    total = len(found)
+    distinct = dict((id(n), n) for n in found).values()
+    size = deep_size(tree)
+    own = sum(own_size(n) for n in distinct)
+
+    print('{} bytes of source, {:,} nodes, {:,} distinct'.format(len(source), total, len(distinct)))
+    print('tree:  {:>12,} bytes, {:>6.1f} bytes/node'.format(size, float(size) / total))
+    print('nodes: {:>12,} bytes, {:>6.1f} bytes/node'.format(own, float(own) / total))
+
+    strings = {} if options.shared else None
+    shared = {} if options.shared and options.nodes else None
+    before = max_rss()
+    trees = [parse(strings, shared) for _ in range(options.files)]
+    after = max_rss()
+    print('peak RSS: {:,} kB before, {:,} kB after parsing {} files (+{:.1f} kB/file)'.format(
+        before, after, len(trees), float(after - before) / len(trees)))
+
+if __name__ == '__main__':
+    main()
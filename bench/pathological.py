@@ -0,0 +1,75 @@
+#!/usr/bin/env python2
+'''
+Scans and parses sources dominated by one huge block comment or one huge
+string literal and reports the cost per byte, which should stay flat as the
+size grows. For comparison the same inputs are scanned with the backtracking
+patterns plyj used before (lazy alternations).
+
+usage: pathological.py [--max-comment BYTES] [--max-string CHARS]
+'''
+
+import optparse
+
+import plyj.parser as plyj
+import plyj.scanner as scanner
+from corpus import best_time
+
+
+class BacktrackingLexer(plyj.MyLexer):
+    t_CHAR_LITERAL = r'\'([^\\\n]|(\\.))*?\''
+    t_STRING_LITERAL = r'\"([^\\\n]|(\\.))*?\"'
+
+    @plyj.token_rule(r'/\*(.|\n)*?\*/')
+    def t_BLOCK_COMMENT(self, t):
+        pass
+
+
+def comment_source(size):
+    line = ' * Licensed under the terms of the license, see the LICENSE file.\n'
+    body = line * (size // len(line) + 1)
+    return '/*\n' + body[:size] + ' */\nclass Foo {}\n'
+
+def string_source(size):
+    chunk = 'a \\"quoted\\" word\\n '
+    body = chunk * (size // len(chunk) + 1)
+    return 'class Foo { String s = "' + body[:size].rstrip('\\') + '"; }\n'
+
+
+def scan_time(lexicon, source):
+    def scan():
+        s = scanner.Scanner(lexicon)
+        s.input(source)
+        for _ in s:
+            pass
+    return best_time(scan, 3)[0]
+
+def sizes(largest, steps=5):
+    return [largest >> i for i in reversed(range(steps))]
+
+
+def main():
+    opts = optparse.OptionParser(usage=__doc__)
+    opts.add_option('--max-comment', type='int', default=1 << 20)
+    opts.add_option('--max-string', type='int', default=100000)
+    options, _ = opts.parse_args()
+
+    parser = plyj.Parser()
+    lexicon = scanner.Lexicon(plyj.MyLexer)
+    backtracking = scanner.Lexicon(BacktrackingLexer)
+
+    for name, generate, largest in [('comment', comment_source, options.max_comment),
+                                    ('string', string_source, options.max_string)]:
+        print(name)
+        print('{:>9} {:>12} {:>12} {:>18}'.format('bytes', 'scan ns/B', 'parse ns/B', 'backtracking ns/B'))
+        for size in sizes(largest):
+            source = generate(size)
+            n = float(len(source))
+            scan = scan_time(lexicon, source)
+            parse, _ = best_time(lambda: parser.parse_string(source), 3)
+            old = scan_time(backtracking, source)
+            print('{:>9} {:>12.2f} {:>12.2f} {:>18.2f}'.format(
+                len(source), scan / n * 1e9, parse / n * 1e9, old / n * 1e9))
+        print('')
+
+if __name__ == '__main__':
+    main()
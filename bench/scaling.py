@@ -0,0 +1,70 @@
+#!/usr/bin/env python2
+'''
+Checks that parse time grows linearly with the number of list items by
+parsing generated sources of doubling size: a class with N fields, a method
+with N statements, a call with N arguments and a file with N imports.
+
+usage: scaling.py [--max-size N] [--max-ratio R]
+
+For every shape the time per item at the largest size is compared with the
+time per item at the smallest size. With --max-ratio the script exits with
+status 1 if that ratio exceeds R for any shape.
+'''
+
+import optparse
+import sys
+
+import plyj.parser as plyj
+from corpus import best_time
+
+
+def fields(n):
+    return 'class Foo {\n' + ''.join('    int f{0} = {0};\n'.format(i) for i in range(n)) + '}\n'
+
+def statements(n):
+    return ('class Foo {\n    void bar() {\n        int i = 0;\n' +
+            ''.join('        i += {0};\n'.format(i) for i in range(n)) + '    }\n}\n')
+
+def arguments(n):
+    return ('class Foo {\n    void bar() {\n        baz(' +
+            ', '.join(str(i) for i in range(n)) + ');\n    }\n}\n')
+
+def imports(n):
+    return ''.join('import a.b{0}.C;\n'.format(i) for i in range(n)) + 'class Foo {}\n'
+
+SHAPES = [('fields', fields), ('statements', statements),
+          ('arguments', arguments), ('imports', imports)]
+
+
+def main():
+    opts = optparse.OptionParser(usage=__doc__)
+    opts.add_option('--min-size', type='int', default=1250)
+    opts.add_option('--max-size', type='int', default=20000)
+    opts.add_option('--max-ratio', type='float', default=None,
+                    help='fail if time per item grows by more than this factor')
+    options, _ = opts.parse_args()
+
+    parser = plyj.Parser()
+    failed = False
+    for name, generate in SHAPES:
+        print(name)
+        print('{:>8} {:>10} {:>12}'.format('items', 'ms', 'us/item'))
+        per_item = []
+        n = options.min_size
+        while n <= options.max_size:
+            source = generate(n)
+            elapsed, _ = best_time(lambda: parser.parse_string(source), 3)
+            per_item.append(elapsed / n)
+            print('{:>8} {:>10.1f} {:>12.2f}'.format(n, elapsed * 1e3, elapsed / n * 1e6))
+            n *= 2
+        ratio = per_item[-1] / per_item[0]
+        print('growth of time per item: {:.2f}x\n'.format(ratio))
+        if options.max_ratio is not None and ratio > options.max_ratio:
+            failed = True
+
+    if failed:
+        print('FAIL: time per item grew by more than {:.2f}x'.format(options.max_ratio))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python2
+'''
+Compares a full parse of a generated corpus with a signature-only parse that
+skips the bodies of methods, constructors and initializers and a lazy parse
+that parses them when they are read, none of which are, with and without
+tracking spans. The script checks that all find the same declarations.
+
+usage: signatures.py [--classes N] [--repeat N]
+'''
+
+import sys
+
+import plyj.parser as plyj
+import plyj.model as model
+from corpus import best_time, java_source, option_parser
+
+
+def signatures(tree):
+    '''The names and parameters of the methods and constructors of all classes.'''
+    return [(d.name, repr(d.parameters)) for t in tree.type_declarations for d in t.body
+            if isinstance(d, (model.MethodDeclaration, model.ConstructorDeclaration))]
+
+
+def main():
+    opts = option_parser(__doc__)
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    parser = plyj.Parser()
+    tokens = len(parser.tokenize_string(source))
+
+    results = []
+    for track in (False, True):
+        for bodies in ('parse', 'skip', 'lazy'):
+            name = {'parse': 'full', 'skip': 'signatures', 'lazy': 'lazy'}[bodies]
+            if track:
+                name += ', tracking'
+            parse = lambda: parser.parse(source, track=track, bodies=bodies).tree
+            results.append((name, best_time(parse, options.repeat)))
+
+    print('{} bytes, {} tokens'.format(len(source), tokens))
+    print('{:<22} {:>10} {:>14} {:>10}'.format('', 'ms', 'tokens/sec', 'speedup'))
+    for i, (name, (elapsed, tree)) in enumerate(results):
+        base = results[i - i % 3][1][0]
+        print('{:<22} {:>10.1f} {:>14,.0f} {:>9.2f}x'.format(name, elapsed * 1e3, tokens / elapsed,
+                                                             base / elapsed))
+    expected = signatures(results[0][1][1])
+    if not expected or any(signatures(tree) != expected for _, (_, tree) in results):
+        print('FAIL: the declarations differ')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python2
+'''
+Measures how long a fresh interpreter needs to import plyj.parser, to
+construct a Parser and to parse a first small compilation unit. Every sample
+runs in a new process so that nothing is cached between them.
+
+usage: startup.py [-n SAMPLES] [--threshold SECONDS]
+
+With --threshold the script exits with status 1 if the median total time
+(import + construct + first parse) exceeds the threshold, so it can be used
+as a regression check.
+'''
+
+import json
+import optparse
+import os
+import subprocess
+import sys
+
+PROBE = r'''
+import json, sys, time
+t0 = time.time()
+import plyj.parser
+t1 = time.time()
+parser = plyj.parser.Parser()
+t2 = time.time()
+parser.parse_string('class Foo { int bar(int i) { return i + 1; } }')
+t3 = time.time()
+print(json.dumps({'import': t1 - t0, 'construct': t2 - t1, 'first_parse': t3 - t2,
+                  'ply_loaded': 'ply.yacc' in sys.modules}))
+'''
+
+def sample():
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env['PYTHONPATH'] = os.pathsep.join([root] + [p for p in [env.get('PYTHONPATH')] if p])
+    out = subprocess.check_output([sys.executable, '-c', PROBE], env=env)
+    return json.loads(out.decode('utf-8'))
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+def main():
+    opts = optparse.OptionParser(usage=__doc__)
+    opts.add_option('-n', '--samples', type='int', default=10)
+    opts.add_option('--threshold', type='float', default=None,
+                    help='fail if the median total time exceeds this many seconds')
+    options, _ = opts.parse_args()
+
+    samples = [sample() for _ in range(options.samples)]
+    for s in samples:
+        s['total'] = s['import'] + s['construct'] + s['first_parse']
+
+    print('{} samples'.format(len(samples)))
+    print('{:<12} {:>10} {:>10}'.format('', 'min ms', 'median ms'))
+    for key in ('import', 'construct', 'first_parse', 'total'):
+        values = [s[key] for s in samples]
+        print('{:<12} {:>10.1f} {:>10.1f}'.format(key, min(values) * 1e3, median(values) * 1e3))
+
+    total = median([s['total'] for s in samples])
+    if options.threshold is not None and total > options.threshold:
+        print('FAIL: median total {:.1f} ms exceeds the threshold of {:.1f} ms'.format(
+            total * 1e3, options.threshold * 1e3))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
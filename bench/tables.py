@@ -0,0 +1,98 @@
+#!/usr/bin/env python2
+'''
+Compares the memory footprint and the lookup cost of PLY's dict based LR
+tables with the array based plyj.tables.CompactTables.
+
+usage: tables.py
+'''
+
+import copy_reg
+import random
+import sys
+import timeit
+
+import plyj.parser as plyj
+import plyj.tables as tables
+
+
+def deep_size(obj, seen=None):
+    '''Bytes held by obj and everything it references, counting shared objects once.'''
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_size(k, seen) + deep_size(v, seen)
+    elif isinstance(obj, (list, tuple, set)):
+        for item in obj:
+            size += deep_size(item, seen)
+    else:
+        if hasattr(obj, '__dict__'):
+            size += deep_size(obj.__dict__, seen)
+        for name in copy_reg._slotnames(type(obj)):
+            size += deep_size(getattr(obj, name, None), seen)
+    return size
+
+
+def main():
+    lexer_module, parser_module = plyj.MyLexer(), plyj.MyParser()
+    t = tables.load_tables(lexer_module, parser_module, plyj.START)
+    action, goto = t['parser']['action'], t['parser']['goto']
+    compact = tables.CompactTables.from_dict(t['compact'])
+
+    # symbol names are interned strings shared with the grammar, don't count them
+    names = set(id(n) for n in compact.terminals + compact.nonterminals)
+    dict_bytes = deep_size(action, set(names)) + deep_size(goto, set(names))
+    compact_bytes = deep_size(compact.to_dict(), set(names))
+
+    print('states: {}, terminals: {}, nonterminals: {}'.format(
+        len(action), len(compact.terminals), len(compact.nonterminals)))
+    print('action entries: {}, goto entries: {}'.format(
+        sum(len(row) for row in action.values()), sum(len(row) for row in goto.values())))
+    print('')
+    print('memory (deep sizeof)')
+    print('  dict tables:    {:>9,} bytes'.format(dict_bytes))
+    print('  compact tables: {:>9,} bytes ({:,} bytes of arrays)'.format(
+        compact_bytes, compact.nbytes()))
+
+    # half hits, half misses (syntax errors), in random order
+    rnd = random.Random(0)
+    states = sorted(action)
+    lookups = []
+    for state in states:
+        for tok in action[state]:
+            lookups.append((state, tok))
+            lookups.append((rnd.choice(states), rnd.choice(compact.terminals)))
+    rnd.shuffle(lookups)
+    ids = [(state, compact.terminal_ids[tok]) for state, tok in lookups]
+
+    def dict_lookup():
+        for state, tok in lookups:
+            action[state].get(tok)
+
+    def compact_lookup():
+        lookup = compact.action
+        for state, tok in ids:
+            lookup(state, tok)
+
+    def compact_inline():
+        base, check, value = compact.action_base, compact.action_check, compact.action_value
+        for state, tok in ids:
+            i = base[state] + tok
+            if check[i] == state:
+                value[i]
+
+    print('')
+    print('action lookup ({:,} lookups, best of 5)'.format(len(lookups)))
+    for name, func in [('dict tables', dict_lookup),
+                       ('compact tables, method', compact_lookup),
+                       ('compact tables, inlined', compact_inline)]:
+        best = min(timeit.repeat(func, number=1, repeat=5))
+        print('  {:<24} {:6.1f} ns/lookup'.format(name, best / len(lookups) * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python2
+'''
+Measures the parse throughput of one Parser shared by a growing number of
+threads, each parsing its own copy of a generated corpus. The throughput
+only scales with the number of threads on an interpreter without a global
+interpreter lock, but on any interpreter the trees must be the same as
+those of a single thread.
+
+usage: threads.py [--classes N] [--max-threads N] [--repeat N]
+'''
+
+import sys
+import threading
+import time
+
+import plyj.parser as plyj
+from corpus import java_source, option_parser
+
+
+def run(parser, sources):
+    trees = [None] * len(sources)
+
+    def work(i):
+        trees[i] = parser.parse(sources[i]).tree
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(len(sources))]
+    start = time.time()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.time() - start, trees
+
+
+def main():
+    opts = option_parser(__doc__, classes=20, repeat=3)
+    opts.add_option('--max-threads', type='int', default=8)
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    parser = plyj.Parser()
+    expected = parser.parse(source).tree
+    tokens = len(parser.tokenize_string(source))
+
+    print('{} bytes, {} tokens per thread'.format(len(source), tokens))
+    print('{:>8} {:>10} {:>14} {:>10}'.format('threads', 'ms', 'tokens/sec', 'scaling'))
+    base = None
+    failed = False
+    n = 1
+    while n <= options.max_threads:
+        # a fresh copy of the source per thread, nothing is shared but the parser
+        sources = [source[:1] + source[1:] for _ in range(n)]
+        elapsed = min(run(parser, sources)[0] for _ in range(options.repeat))
+        _, trees = run(parser, sources)
+        failed = failed or any(tree != expected for tree in trees)
+        rate = n * tokens / elapsed
+        base = base or rate
+        print('{:>8} {:>10.1f} {:>14,.0f} {:>9.2f}x'.format(n, elapsed * 1e3, rate, rate / base))
+        n *= 2
+    if failed:
+        print('FAIL: the trees differ')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
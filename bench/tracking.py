@@ -0,0 +1,37 @@
+#!/usr/bin/env python2
+'''
+Measures the cost of recording source spans by parsing a generated corpus
+at every tracking level of Parser.parse(): no tracking, tracking of method
+invocations and declarations only, and tracking of all nodes.
+
+usage: tracking.py [--classes N] [--repeat N]
+'''
+
+
+import plyj.model as model
+import plyj.parser as plyj
+from corpus import best_time, java_source, option_parser
+
+SELECTED = (model.MethodInvocation, model.ClassDeclaration, model.MethodDeclaration,
+            model.ConstructorDeclaration, model.FieldDeclaration)
+
+LEVELS = [('none', False), ('selected', SELECTED), ('full', True)]
+
+
+def main():
+    opts = option_parser(__doc__)
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    parser = plyj.Parser()
+    results = [(name, best_time(lambda: len(parser.parse(source, track=track).spans), options.repeat))
+               for name, track in LEVELS]
+
+    print('{} bytes'.format(len(source)))
+    print('{:<10} {:>8} {:>10} {:>10}'.format('tracking', 'spans', 'ms', 'relative'))
+    base = results[0][1][0]
+    for name, (elapsed, spans) in results:
+        print('{:<10} {:>8} {:>10.1f} {:>9.2f}x'.format(name, spans, elapsed * 1e3, elapsed / base))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python2
+'''
+Compares the traversal of the tree of a generated corpus by accept(), which
+looks the methods of a visitor class up once per node class, with a copy of
+the accept() that looked them up with getattr() on every node. Two visitors
+are used: Visitor itself, whose methods are all stand-ins, and one that
+counts method invocations. The script checks that both count the same.
+
+usage: traversal.py [--classes N] [--repeat N]
+'''
+
+import sys
+
+import plyj.parser as plyj
+import plyj.model as model
+from corpus import best_time, java_source, option_parser
+
+
+def getattr_accept(node, visitor):
+    '''The former SourceElement.accept(): two getattr() calls per node.'''
+    if node.__class__ is model.Try:
+        # and the former Try.accept()
+        if visitor.visit_Try(node):
+            for s in node.block:
+                getattr_accept(s, visitor)
+        for c in node.catches:
+            visitor.visit_Catch(c)
+        if node._finally:
+            getattr_accept(node._finally, visitor)
+        return
+    class_name = node.__class__.__name__
+    if getattr(visitor, 'visit_' + class_name)(node):
+        for f in node._fields:
+            field = getattr(node, f)
+            if field:
+                if isinstance(field, (list, tuple)):
+                    for elem in field:
+                        if isinstance(elem, model.SourceElement):
+                            getattr_accept(elem, visitor)
+                elif isinstance(field, model.SourceElement):
+                    getattr_accept(field, visitor)
+    getattr(visitor, 'leave_' + class_name)(node)
+
+
+class Visits(model.Visitor):
+    '''Counts the nodes it visits.'''
+
+    def __init__(self):
+        super(Visits, self).__init__()
+        self.count = 0
+
+    def __getattr__(self, name):
+        if name.startswith('visit_'):
+            return self.visit
+        return super(Visits, self).__getattr__(name)
+
+    def visit(self, node):
+        self.count += 1
+        return True
+
+
+class Counter(model.Visitor):
+
+    def __init__(self):
+        super(Counter, self).__init__()
+        self.invocations = 0
+
+    def visit_MethodInvocation(self, invocation):
+        self.invocations += 1
+        return True
+
+
+def main():
+    opts = option_parser(__doc__)
+    options, _ = opts.parse_args()
+
+    source = java_source(options.classes)
+    tree = plyj.Parser().parse_string(source)
+    visits = Visits()
+    tree.accept(visits)
+
+    def run(accept, visitor):
+        def traverse():
+            v = visitor()
+            accept(tree, v)
+            return getattr(v, 'invocations', None)
+        return traverse
+
+    results = []
+    for name, visitor in (('Visitor', model.Visitor), ('counting', Counter)):
+        for how, accept in (('getattr', getattr_accept),
+                            ('cached', lambda node, v: node.accept(v))):
+            results.append(('{}, {}'.format(name, how), best_time(run(accept, visitor), options.repeat)))
+
+    print('{:,} nodes visited'.format(visits.count))
+    print('{:<20} {:>10} {:>12} {:>10}'.format('', 'ms', 'ns/node', 'speedup'))
+    for i, (name, (elapsed, _)) in enumerate(results):
+        base = results[i - i % 2][1][0]
+        print('{:<20} {:>10.1f} {:>12.0f} {:>9.2f}x'.format(
+            name, elapsed * 1e3, elapsed / visits.count * 1e9, base / elapsed))
+    if results[2][1][1] != results[3][1][1] or not results[3][1][1]:
+        print('FAIL: the visitors counted differently')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,520 @@
+#!/usr/bin/env python2
+'''
+LR parse engine for the plyj grammar.
+
+PLY's LRParser is written for any grammar and lexer: it wraps every token and
+every reduction in objects (LexToken, YaccSymbol, YaccProduction), looks up
+the actions in dicts keyed by state and symbol name and hands each action a
+YaccProduction whose items are fetched by a Python level __getitem__. The
+Engine runs the same LALR automaton from the flat arrays of
+plyj.tables.CompactTables over a plyj.scanner.TokenStream. Its stacks hold
+plain states and values, and a reduction calls the action with a list of the
+values of the right hand side in which the action stores p[0], so the p_
+functions of MyParser run unchanged.
+
+Spans are tracked by the engine as well: with a span table it keeps a stack
+of the (start, end) of every symbol and records the span of the node a
+reduction returns. Actions that build further nodes record them through the
+production they are given (see plyj.parser.record_span); the p_ functions
+that do so, and those that pass on the value of a single symbol, are marked
+(see plyj.parser.records_spans and plyj.parser.passes_value).
+'''
+
+import sys
+
+from errors import Diagnostic
+from scanner import Token
+
+
+# the most closing tokens the error recovery inserts at the end of the input
+# before it gives up; nesting in real code is far less deep
+MAX_INSERTED = 1000
+
+
+class SpanningProduction(list):
+    '''
+    The values of a production being reduced in a parse that tracks spans.
+    spans holds the (start, end) of every symbol, None for empty ones, and
+    table is the plyj.spans.SpanTable of the parse.
+    '''
+
+    __slots__ = ('spans', 'table')
+
+
+class Engine(object):
+    '''
+    Parses token streams with CompactTables whose production functions are
+    looked up on module. It has no per-parse state, so one engine can be
+    shared by all parsers.
+
+    texts maps the id of every token kind whose text is fixed (keywords and
+    operators) to that text; the value of such a token is taken from there
+    instead of being sliced from the source. levels gives for every
+    production how many characters at the end of its span belong to an
+    enclosing node (the '>' of nested type arguments), growing whether a node
+    passed on as the first symbol of the production grows to its end.
+    recovery_states are the states in which the error recovery can resume
+    parsing, finished_states those reached by a goto on the statement or
+    declaration whose list a recovery state expects. body_states maps the states in which a '{' starts a body that a
+    parse may skip to the nonterminal the body is reduced to.
+
+    shareable are the node classes a parse can hash-cons. mutating maps the
+    names of the actions that change a node among their symbols to the
+    positions of these symbols, whose values are never shared.
+    '''
+
+    def __init__(self, compact, module, texts, levels=None, growing=None, recovery_states=(),
+                 body_states=None, shareable=(), mutating=None, finished_states=()):
+        self.compact = compact
+        self.terminals = compact.terminals
+        # lists instead of arrays: indexing an array creates a new int object
+        # every time
+        self.action_base = list(compact.action_base)
+        self.action_check = list(compact.action_check)
+        self.action_value = list(compact.action_value)
+        self.goto_base = list(compact.goto_base)
+        self.goto_check = list(compact.goto_check)
+        self.goto_value = list(compact.goto_value)
+        self.goto_default = list(compact.goto_default)
+        self.defaulted = list(compact.defaulted)
+        self.prod_lhs = list(compact.prod_lhs)
+        self.prod_len = list(compact.prod_len)
+        self.actions = [getattr(module, name) if name else None for name in compact.prod_func]
+        self.error = module.p_error
+        self.texts = texts
+        self.levels = levels or [0] * len(self.actions)
+        self.growing = growing or [True] * len(self.actions)
+        # the actions marked to record spans themselves get a
+        # SpanningProduction, all others a plain list
+        self.recording = [getattr(action, 'records_spans', False) for action in self.actions]
+        # most reductions are by rules like expression : assignment_expression
+        # whose action is marked to pass the value on; the engine only does
+        # their goto
+        self.passing = [n == 1 and getattr(action, 'passes_value', False)
+                        for action, n in zip(self.actions, self.prod_len)]
+
+        # error recovery
+        self.recovery_states = frozenset(recovery_states)
+        self.finished_states = frozenset(finished_states)
+        ids = compact.terminal_ids
+        self.opening = frozenset(ids[c] for c in '({[')
+        self.closing = frozenset(ids[c] for c in ')}]')
+        self.rbrace = ids['}']
+        # the states entered by shifting a '{' or a '}'
+        shifts = [[compact.action(state, ids[c]) for state in range(len(compact.action_base))]
+                  for c in '{}']
+        self.opened, self.closed = [frozenset(t for t in targets if t is not None and t > 0)
+                                    for targets in shifts]
+        self.semicolon = ids[';']
+        # tried in this order, ';' last as an empty statement always fits
+        self.closers = [ids[c] for c in ')]};']
+
+        # skipped bodies
+        self.body_states = body_states or {}
+        self.lbrace = ids['{']
+
+        # shared nodes: the positions of the symbols of every production
+        # whose values may be replaced by an equal shared node before its
+        # action runs
+        self.shareable = frozenset(shareable)
+        mutating = mutating or {}
+        self.consing = [tuple(j for j in range(1, n + 1)
+                              if j not in mutating.get(name, ())) if name else ()
+                        for name, n in zip(compact.prod_func, self.prod_len)]
+
+    def parse(self, tokens, goal, spans=None, debug=None, start=0, end=None, diagnostics=None,
+              guard=None, bodies=None, strings=None, shared=None):
+        '''
+        Parses the tokens from index start to end and returns the value of the
+        start symbol, or None after reporting a syntax error to the error
+        function of the module. goal is the id of a terminal that is shifted
+        before the first token to select the start rule. The spans of the
+        nodes are recorded in spans if given. debug is a file to write a
+        trace of the shifts and reductions to.
+
+        If diagnostics is a list, syntax errors are added to it as
+        plyj.errors.Diagnostics and the parse recovers from them (see
+        recover()); the result then lacks the parts that could not be parsed.
+
+        guard is a plyj.limits.Guard whose check() is called every few tokens
+        and at the end with the size of the stack and the number of values
+        the actions have created; it raises to stop the parse.
+
+        If bodies is given the bodies that start in one of the body_states are
+        not parsed: the tokens up to the matching '}' are skipped and the
+        value of the body is bodies(first, last, lhs) with the indexes of the
+        '{' and the '}' and the nonterminal the body is reduced to.
+
+        The text of names and literals is interned in the dict strings, a new
+        one if it is None: all equal texts in the tree are one string.
+
+        If shared is a dict the nodes of the shareable classes are hash-consed
+        in it: a node is replaced by the equal one in shared when it becomes
+        a child of another node, so all equal subtrees of these classes are
+        one object. Such a node has no span of its own, so spans must be None.
+        '''
+        action_base = self.action_base
+        action_check = self.action_check
+        action_value = self.action_value
+        goto_base = self.goto_base
+        goto_check = self.goto_check
+        goto_value = self.goto_value
+        goto_default = self.goto_default
+        defaulted = self.defaulted
+        prod_lhs = self.prod_lhs
+        prod_len = self.prod_len
+        actions = self.actions
+        passing = self.passing
+        texts = self.texts
+        intern_text = (strings if strings is not None else {}).setdefault
+        if shared is not None:
+            if spans is not None:
+                raise ValueError('shared nodes have no spans')
+            share = shared.setdefault
+            shareable = self.shareable
+            consing = self.consing
+        else:
+            share = None
+        body_states = self.body_states if bodies is not None else ()
+        lbrace = self.lbrace
+
+        source = tokens.source
+        kinds = tokens.kinds
+        starts = tokens.starts
+        ends = tokens.ends
+        count = len(kinds) if end is None else end
+
+        if spans is not None:
+            classes = spans.classes
+            levels = self.levels
+            growing = self.growing
+            recording = self.recording
+            # whether the instances of a type are tracked
+            tracked_types = {}
+
+        # the bottom entries only make the slices of the top n + 1 entries
+        # valid for every production, the second ones are the goal token
+        k = action_base[0] + goal
+        if action_check[k] != 0 or action_value[k] <= 0:
+            raise ValueError('{} is no goal'.format(self.terminals[goal]))
+        states = [0, action_value[k]]
+        values = [None, None]
+        symbol_spans = [None, None]
+
+        i = start
+        kind = kinds[i] if i < count else 0
+        # the token index at which the parse continued after the last error
+        resumed = None
+        # the number of tokens the error recovery inserted at the end
+        inserted = 0
+        # the number of values created by actions and the token index at
+        # which the guard is asked next
+        created = 0
+        checkpoint = i if guard is not None else sys.maxsize
+        while True:
+            state = states[-1]
+            t = defaulted[state]
+            if not t:
+                k = action_base[state] + kind
+                if action_check[k] != state:
+                    if diagnostics is None:
+                        self.syntax_error(tokens, i if i < count else None, debug)
+                        return None
+                    recovered = self.recover(tokens, i, count, states, values, symbol_spans,
+                                             diagnostics, i != resumed, debug)
+                    if recovered is None:
+                        return None
+                    i, kind = recovered
+                    resumed = i
+                    if i >= count:
+                        inserted += 1
+                        if inserted > MAX_INSERTED:
+                            return None
+                    continue
+                t = action_value[k]
+
+            if t > 0:
+                if i >= checkpoint:
+                    checkpoint = i + guard.check(len(states), created)
+                if kind == lbrace and state in body_states:
+                    j = self._matching_brace(kinds, i, count)
+                    if j is not None:
+                        # reduce to the body without parsing it
+                        lhs = body_states[state]
+                        value = bodies(i, j, lhs)
+                        k = goto_base[lhs] + state
+                        states.append(goto_value[k] if goto_check[k] == lhs else goto_default[lhs])
+                        values.append(value)
+                        if spans is not None:
+                            span_start = starts[i]
+                            span_end = ends[j]
+                            symbol_spans.append((span_start, span_end))
+                            if isinstance(value, classes):
+                                spans.add(value, span_start, span_end)
+                        if debug is not None:
+                            debug.write('skip {} tokens, goto {}\n'.format(j + 1 - i, states[-1]))
+                        i = j + 1
+                        kind = kinds[i] if i < count else 0
+                        continue
+                if i < count:
+                    span_start = starts[i]
+                    span_end = ends[i]
+                    value = texts[kind]
+                    if value is None:
+                        value = source[span_start:span_end]
+                        value = intern_text(value, value)
+                    i += 1
+                else:
+                    # a token inserted by the error recovery at the end
+                    span_start = span_end = ends[count - 1] if count else 0
+                    value = texts[kind]
+                states.append(t)
+                values.append(value)
+                if spans is not None:
+                    symbol_spans.append((span_start, span_end))
+                if debug is not None:
+                    debug.write('shift {} {!r}, goto {}\n'.format(self.terminals[kind], value, t))
+                kind = kinds[i] if i < count else 0
+
+            elif t < 0:
+                r = -t
+                lhs = prod_lhs[r]
+                if passing[r]:
+                    # the value and span of the symbol stay on the stacks
+                    k = goto_base[lhs] + states[-2]
+                    states[-1] = goto_value[k] if goto_check[k] == lhs else goto_default[lhs]
+                    if debug is not None:
+                        debug.write('reduce {} (passed on), goto {}\n'.format(
+                            self.compact.nonterminals[lhs], states[-1]))
+                    continue
+                n = prod_len[r]
+                created += 1
+                if spans is None:
+                    p = values[-n - 1:]
+                    if share is not None:
+                        for j in consing[r]:
+                            value = p[j]
+                            if value.__class__ in shareable:
+                                p[j] = share(value, value)
+                    p[0] = None
+                    actions[r](p)
+                else:
+                    if n == 1:
+                        span = symbol_spans[-1]
+                    elif n:
+                        first = symbol_spans[-n]
+                        last = symbol_spans[-1]
+                        if first is None or last is None:
+                            present = [s for s in symbol_spans[-n:] if s is not None]
+                            if present:
+                                first = present[0]
+                                last = present[-1]
+                        span = (first[0], last[1]) if first is not None else None
+                    else:
+                        span = None
+                    if recording[r]:
+                        p = SpanningProduction(values[-n - 1:])
+                        p.spans = symbol_spans[-n - 1:]
+                        p.table = spans
+                    else:
+                        p = values[-n - 1:]
+                    p[0] = None
+                    actions[r](p)
+                    value = p[0]
+                    if span is not None:
+                        tracked = tracked_types.get(type(value))
+                        if tracked is None:
+                            tracked = tracked_types[type(value)] = issubclass(type(value), classes)
+                        # a node passed on unchanged as the only symbol has
+                        # been recorded by the production that built it
+                        if tracked and not (n == 1 and value is p[1]):
+                            if value not in spans:
+                                spans.add(value, span[0], span[1] - levels[r])
+                            elif growing[r] and value is p[1] and spans.get(value)[0] == span[0]:
+                                spans.grow(value, span[1] - levels[r])
+                    if n != 1:
+                        if n:
+                            del symbol_spans[-n:]
+                        symbol_spans.append(span)
+                if n:
+                    del states[-n:]
+                    del values[-n:]
+                values.append(p[0])
+                k = goto_base[lhs] + states[-1]
+                state = goto_value[k] if goto_check[k] == lhs else goto_default[lhs]
+                states.append(state)
+                if debug is not None:
+                    debug.write('reduce {} ({}), goto {}\n'.format(
+                        self.compact.nonterminals[lhs], actions[r].__name__, state))
+
+            else:
+                if guard is not None:
+                    guard.check(len(states), created)
+                return values[-1]
+
+    def _matching_brace(self, kinds, i, count):
+        '''The index of the '}' that closes the '{' at i, None if there is none.'''
+        lbrace = self.lbrace
+        rbrace = self.rbrace
+        depth = 0
+        j = i
+        while j < count:
+            kind = kinds[j]
+            if kind == lbrace:
+                depth += 1
+            elif kind == rbrace:
+                depth -= 1
+                if depth == 0:
+                    return j
+            j += 1
+        return None
+
+    def recover(self, tokens, i, count, states, values, symbol_spans, diagnostics, report, debug=None):
+        '''
+        Recovers from a syntax error at token i in panic mode and returns the
+        index and kind of the token to continue with, or None if the parse
+        cannot go on. The stacks are changed in place.
+
+        If the stacks end with complete statements or declarations, which are
+        only reduced into their list at the next token, or at the start of
+        one, only the token is dropped. Otherwise the innermost declaration
+        or statement the error occurred in is dropped: the stacks are popped
+        back to the innermost state that expects a block statement, member or
+        type declaration. Unless the token can start the next one, the tokens
+        up to the end of the broken one are skipped, i.e. up to and including
+        a ';' or through a balanced '{ }' block, also one opened by the broken
+        part, but not beyond a '}' that closes the enclosing block. At the
+        end of the input the missing closing tokens are inserted instead.
+
+        report is false if the error is at the token at which the last
+        recovery resumed; it is dropped then without a diagnostic.
+        '''
+        if report:
+            if i < count:
+                message = "unexpected '{}'".format(tokens.text(i))
+                diagnostics.append(Diagnostic(message, tokens.starts[i], tokens.ends[i], tokens.lines[i]))
+            else:
+                end = tokens.ends[count - 1] if count else 0
+                line = tokens.lines[count - 1] if count else 1
+                diagnostics.append(Diagnostic('unexpected end of input', end, end, line))
+        if debug is not None:
+            debug.write('syntax error at token {}\n'.format(i))
+
+        if i >= count:
+            while True:
+                for closer in self.closers:
+                    if self._accepts(states, closer):
+                        return i, closer
+                # drop the innermost statement or declaration and try again
+                if self._pop_to_recovery(states, values, symbol_spans, len(states) - 2) is None:
+                    return None
+
+        if not report:
+            i += 1
+            return i, tokens.kinds[i] if i < count else 0
+
+        kinds = tokens.kinds
+        if self._finishes(states, self.rbrace) or self._finishes(states, 0):
+            i += 1
+            return i, kinds[i] if i < count else 0
+        size = len(states)
+        opened = self._pop_to_recovery(states, values, symbol_spans, size - 1)
+        if opened is None:
+            return None
+        if len(states) == size:
+            # nothing is broken, the token is out of place
+            i += 1
+            return i, kinds[i] if i < count else 0
+        # a ';' ends the broken statement or declaration, it is skipped with
+        # it rather than parsed as an empty one
+        if not opened and kinds[i] != self.semicolon and self._accepts(states, kinds[i]):
+            # the token starts the next statement or declaration, e.g. after
+            # a missing ';'
+            return i, kinds[i]
+        depth = opened
+        while i < count:
+            kind = kinds[i]
+            if kind in self.opening:
+                depth += 1
+            elif kind in self.closing:
+                if depth:
+                    depth -= 1
+                    if not depth and kind == self.rbrace:
+                        i += 1
+                        break
+                elif kind == self.rbrace:
+                    break
+            elif kind == self.semicolon and not depth:
+                i += 1
+                break
+            i += 1
+        return i, kinds[i] if i < count else 0
+
+    def _pop_to_recovery(self, states, values, symbol_spans, top):
+        '''
+        Pops the stacks down to the highest recovery state at or below index
+        top. Returns the number of '{' popped that are not closed, None if
+        there is no recovery state.
+        '''
+        d = top
+        while d > 0 and states[d] not in self.recovery_states:
+            d -= 1
+        if d <= 0:
+            return None
+        opened = 0
+        for state in states[d + 1:]:
+            if state in self.opened:
+                opened += 1
+            elif state in self.closed:
+                opened -= 1
+        del states[d + 1:]
+        del values[d + 1:]
+        del symbol_spans[d + 1:]
+        return max(opened, 0)
+
+    def _finishes(self, states, kind):
+        '''
+        Whether the stack ends with a statement or declaration whose list a
+        recovery state expects, or the reductions before kind reduce one.
+        '''
+        if states[-1] in self.finished_states:
+            return True
+        compact = self.compact
+        stack = list(states)
+        while True:
+            state = stack[-1]
+            t = self.defaulted[state] or compact.action(state, kind)
+            if t is None or t >= 0:
+                return False
+            n = self.prod_len[-t]
+            if n:
+                del stack[-n:]
+            stack.append(compact.goto(stack[-1], self.prod_lhs[-t]))
+            if stack[-1] in self.finished_states:
+                return True
+
+    def _accepts(self, states, kind):
+        '''Whether the parse can shift (or accept) kind with the given state stack.'''
+        compact = self.compact
+        stack = list(states)
+        while True:
+            state = stack[-1]
+            t = self.defaulted[state] or compact.action(state, kind)
+            if t is None:
+                return False
+            if t >= 0:
+                return True
+            n = self.prod_len[-t]
+            if n:
+                del stack[-n:]
+            stack.append(compact.goto(stack[-1], self.prod_lhs[-t]))
+
+    def syntax_error(self, tokens, i, debug=None):
+        '''Reports the syntax error at token i, None at the end of input.'''
+        token = None
+        if i is not None:
+            token = Token(tokens.kind(i), tokens.text(i), tokens.lines[i],
+                          tokens.starts[i], tokens.ends[i])
+        if debug is not None:
+            debug.write('syntax error at {}\n'.format(token))
+        self.error(token)
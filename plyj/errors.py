@@ -0,0 +1,50 @@
+#!/usr/bin/env python2
+'''
+Problems found in the source while scanning and parsing.
+'''
+
+
+class Diagnostic(object):
+    '''
+    A problem in the source: a message and the text it is about, given by
+    its start and end offsets and the line it starts on.
+    '''
+
+    def __init__(self, message, start, end, line):
+        self.message = message
+        self.start = start
+        self.end = end
+        self.line = line
+
+    def __eq__(self, other):
+        return isinstance(other, Diagnostic) and self.__dict__ == other.__dict__
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'Diagnostic({!r}, {}, {}, line={})'.format(self.message, self.start, self.end, self.line)
+
+    def __str__(self):
+        return 'line {}: {}'.format(self.line, self.message)
+
+
+class ParseAborted(Exception):
+    '''A parse stopped before the end of its input.'''
+
+
+class LimitExceeded(ParseAborted):
+    '''
+    A parse used more of a resource than its plyj.limits.Limits allow. limit
+    is the name of the limit ('tokens', 'depth', 'nodes' or 'timeout') and
+    maximum its value.
+    '''
+
+    def __init__(self, limit, maximum):
+        ParseAborted.__init__(self, '{} limit of {} exceeded'.format(limit, maximum))
+        self.limit = limit
+        self.maximum = maximum
+
+
+class Cancelled(ParseAborted):
+    '''A parse was cancelled through its plyj.limits.CancellationToken.'''
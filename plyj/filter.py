@@ -23,7 +23,8 @@ class MethodInvocationFilter(BaseFilter):
         super(MethodInvocationFilter, self).__init__(filter_dict)
 
     def visit_MethodInvocation(self, method_invocation):
-        current_value_items = method_invocation.__dict__.items()
+        current_value_items = [(f, getattr(method_invocation, f))
+                               for f in method_invocation._fields]
         if all(item in current_value_items for item in self._filter_dict_items):
             self.instances.append(method_invocation)
 
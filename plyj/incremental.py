@@ -0,0 +1,142 @@
+#!/usr/bin/env python2
+'''
+Reparsing of an edited source.
+
+An edit replaces the text from offset to offset + removed with inserted.
+reparse() looks for the smallest unit of the old tree that encloses the edit
+and can be parsed on its own: a block, a member of a class body or a type
+declaration of the compilation unit. Only the new text of that unit is
+scanned and parsed. The result is spliced into copies of the nodes on the
+path from the root to the unit, everything else is shared with the old tree,
+and the spans behind the edit are moved by a layer on the old SpanTable.
+
+A unit has to enclose the edit strictly, so that its first and last
+character, and with them the tokens around it, stay the same. If the new
+text of a unit does not parse cleanly the next larger one is tried, and if
+there is none the whole source is parsed again. Both use the options of
+the old parse: units its interned strings, limits and debug output. A tree
+whose bodies were skipped or are parsed lazily, or that has syntax errors,
+is always parsed again as a whole, as its bodies and diagnostics refer to
+the old source.
+'''
+
+import copy
+import sys
+
+from limits import Guard
+from model import Block, ClassDeclaration, CompilationUnit, InstanceCreation, SourceElement
+from spans import SpanTable
+
+# the lists whose elements are units, by the class that holds them, and the
+# goal token that parses a unit in them; any Block is a unit as well
+UNIT_LISTS = {
+    (ClassDeclaration, 'body'): 'GOAL_CLASS_BODY',
+    (InstanceCreation, 'body'): 'GOAL_CLASS_BODY',
+    (CompilationUnit, 'type_declarations'): 'GOAL_COMPILATION_UNIT',
+}
+
+
+def reparse(parser, result, offset, removed, inserted):
+    '''
+    Returns the plyj.parser.ParseResult of the source of result after the
+    edit. result has to track the spans of all nodes.
+    '''
+    source = result.source
+    if not 0 <= offset <= offset + removed <= len(source):
+        raise ValueError('edit of {} characters at {} is outside of the source'.format(removed, offset))
+    new_source = source[:offset] + inserted + source[offset + removed:]
+    options = result.options
+    if (result.tree is not None and result.spans.classes is SourceElement and
+            not result.diagnostics and options.get('bodies', 'parse') == 'parse'):
+        for path, goal in reversed(_enclosing_units(result, offset, offset + removed)):
+            reparsed = _reparse_unit(parser, result, new_source, path, goal,
+                                     len(inserted) - removed)
+            if reparsed is not None:
+                return reparsed
+    return parser.parse(new_source, lineno=result.first_line, **options)
+
+
+def _enclosing_units(result, start, end):
+    '''
+    The paths from the root to the units that enclose start to end and
+    their goal tokens, the innermost last. A path is a list of (node, field,
+    index) steps, index is None for a field that holds a single node; the
+    last step leads to the unit.
+    '''
+    spans = result.spans
+    units = []
+    path = []
+    node = result.tree
+    while node is not None:
+        inner = None
+        for field in node._fields:
+            value = getattr(node, field)
+            if isinstance(value, list):
+                children = enumerate(value)
+            elif isinstance(value, SourceElement):
+                children = [(None, value)]
+            else:
+                continue
+            for index, child in children:
+                span = spans.get(child) if isinstance(child, SourceElement) else None
+                if span is not None and span[0] < start and end < span[1]:
+                    inner = child
+                    path.append((node, field, index))
+                    break
+            if inner is not None:
+                break
+        if inner is not None:
+            if type(inner) is Block:
+                units.append((list(path), 'GOAL_BLOCK'))
+            elif (type(node), field) in UNIT_LISTS:
+                units.append((list(path), UNIT_LISTS[type(node), field]))
+        node = inner
+    return units
+
+
+def _reparse_unit(parser, result, new_source, path, goal, delta):
+    '''The ParseResult with the unit at the end of path reparsed, None if it does not parse.'''
+    node, field, index = path[-1]
+    unit = getattr(node, field)[index] if index is not None else getattr(node, field)
+    start, end = result.spans[unit]
+    engine = parser.grammar.engine
+    options = result.options
+    limits = options.get('limits')
+    cancel = options.get('cancel')
+    guard = Guard(limits, cancel) if limits is not None or cancel is not None else None
+    diagnostics = []
+    lineno = result.first_line + result.source.count('\n', 0, start)
+    tokens = parser._scan(new_source[start:end + delta], lineno, diagnostics, guard)
+    spans = SpanTable(SourceElement)
+    value = engine.parse(tokens, engine.compact.terminal_ids[goal], spans,
+                         sys.stderr if options.get('debug') else None, diagnostics=diagnostics,
+                         guard=guard, strings=options.get('strings'))
+    if diagnostics or value is None:
+        return None
+    root = None
+    if goal == 'GOAL_BLOCK':
+        # the label of a labeled block is outside of its span
+        value.label = getattr(unit, 'label', None)
+    elif goal == 'GOAL_COMPILATION_UNIT':
+        if value.package_declaration is not None or value.import_declarations:
+            return None
+        root = value
+        value = value.type_declarations
+
+    table = result.spans.shifted(start, end, delta, [step[0] for step in path])
+    for new, new_start, new_end in spans.items():
+        if new is not root:
+            table.add(new, new_start + start, new_end + start)
+    # copy the path from the unit up to the root
+    for node, field, index in reversed(path):
+        parent = copy.copy(node)
+        if index is None:
+            setattr(parent, field, value)
+        else:
+            items = list(getattr(node, field))
+            items[index:index + 1] = value if isinstance(value, list) else [value]
+            setattr(parent, field, items)
+        old_start, old_end = result.spans[node]
+        table.add(parent, old_start, old_end + delta)
+        value = parent
+    return result.__class__(value, new_source, table, result.first_line, options=options)
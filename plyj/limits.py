@@ -0,0 +1,94 @@
+#!/usr/bin/env python2
+'''
+Bounds on the resources of a parse, for parsing untrusted input. A parse
+given Limits or a CancellationToken raises a plyj.errors.ParseAborted as soon
+as it notices that it has to stop, instead of running to its end.
+
+The scanner checks the number of tokens, the timeout and the cancellation
+every plyj.scanner.SCAN_INTERVAL matches. The engine checks the other limits
+every CHECK_INTERVAL tokens, more often as the parser stack gets close to its
+limit, and once more at the end of the parse.
+'''
+
+import time
+
+from errors import Cancelled, LimitExceeded
+
+# the most tokens the engine shifts between two checks
+CHECK_INTERVAL = 256
+
+
+class Limits(object):
+    '''
+    The limits of a parse call, None for no limit: tokens is the most tokens
+    of the input, depth the most entries of the parser stack, which grows by
+    a few entries per level of nested brackets, blocks and statements, nodes
+    the most values the grammar actions may create, an upper bound of the
+    nodes of the tree, and timeout the most seconds the call may take.
+    '''
+
+    def __init__(self, tokens=None, depth=None, nodes=None, timeout=None):
+        self.tokens = tokens
+        self.depth = depth
+        self.nodes = nodes
+        self.timeout = timeout
+
+
+class CancellationToken(object):
+    '''
+    Stops parses from another thread: pass the token to the parse calls and
+    call cancel(). The parses raise plyj.errors.Cancelled at their next check.
+    '''
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Guard(object):
+    '''The limits and the cancellation token of one parse call.'''
+
+    def __init__(self, limits=None, cancel=None):
+        limits = limits or Limits()
+        self.limits = limits
+        self.tokens = limits.tokens
+        self.depth = limits.depth
+        self.nodes = limits.nodes
+        self.timeout = limits.timeout
+        self.deadline = time.time() + limits.timeout if limits.timeout is not None else None
+        self.cancel = cancel
+
+    def restarted(self):
+        '''A Guard with the same limits and token whose timeout starts now.'''
+        return Guard(self.limits, self.cancel)
+
+    def _interrupt(self):
+        if self.cancel is not None and self.cancel.cancelled:
+            raise Cancelled('parse cancelled')
+        if self.deadline is not None and time.time() > self.deadline:
+            raise LimitExceeded('timeout', self.timeout)
+
+    def scanned(self, tokens):
+        '''Raises a ParseAborted if the scan has to stop after tokens tokens.'''
+        self._interrupt()
+        if self.tokens is not None and tokens > self.tokens:
+            raise LimitExceeded('tokens', self.tokens)
+
+    def check(self, depth, nodes):
+        '''
+        Raises a ParseAborted if the parse has to stop with depth entries on
+        its stack after creating nodes values. Otherwise returns the number of
+        tokens the engine may shift before the next check.
+        '''
+        self._interrupt()
+        if self.nodes is not None and nodes > self.nodes:
+            raise LimitExceeded('nodes', self.nodes)
+        if self.depth is None:
+            return CHECK_INTERVAL
+        if depth > self.depth:
+            raise LimitExceeded('depth', self.depth)
+        # a token adds at most a few entries to the stack: the token and the
+        # empty symbols reduced before it
+        return max(1, min(CHECK_INTERVAL, (self.depth - depth) // 4))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python2
+'''
+Conversion between source offsets and line/column positions.
+
+A LineIndex records the offset at which every line of a source starts. An
+offset is converted with a binary search over these starts, a whole array
+of offsets with positions(), which runs the searches without a Python loop
+per offset (map over the C implementations of bisect and subtraction).
+
+Lines and columns are 1-based, offsets 0-based. Only '\\n' ends a line, as
+in the scanner.
+'''
+
+from array import array
+from bisect import bisect_right
+from itertools import repeat
+from operator import add, sub
+
+
+class LineIndex(object):
+
+    def __init__(self, source, first_line=1):
+        starts = array('i', [0])
+        find = source.find
+        pos = find('\n')
+        while pos >= 0:
+            pos += 1
+            starts.append(pos)
+            pos = find('\n', pos)
+        self.starts = starts
+        self.first_line = first_line
+        self.length = len(source)
+        # offset - bases[i] is the column of an offset in the line found at
+        # index i by bisect_right, bases[0] is never used
+        self._bases = array('i', [0])
+        self._bases.extend(start - 1 for start in starts)
+
+    def __len__(self):
+        '''Number of lines.'''
+        return len(self.starts)
+
+    def position(self, offset):
+        '''(line, column) of offset.'''
+        if not 0 <= offset <= self.length:
+            raise IndexError('offset {} out of range'.format(offset))
+        i = bisect_right(self.starts, offset)
+        return i - 1 + self.first_line, offset - self._bases[i]
+
+    def positions(self, offsets):
+        '''
+        The lines and columns of a sequence of offsets as two arrays. The
+        offsets are not range checked.
+        '''
+        found = array('i', map(bisect_right, repeat(self.starts, len(offsets)), offsets))
+        lines = array('i', map(add, found, repeat(self.first_line - 1, len(found))))
+        columns = array('i', map(sub, offsets, map(self._bases.__getitem__, found)))
+        return lines, columns
+
+    def offset(self, line, column):
+        '''Offset of a (line, column) position.'''
+        i = line - self.first_line
+        if not 0 <= i < len(self.starts):
+            raise IndexError('line {} out of range'.format(line))
+        return self.starts[i] + column - 1
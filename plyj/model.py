@@ -1,13 +1,72 @@
+import functools
+import types
+
+
+def _hashable(items):
+    '''The list items as a tuple, with lists in it made tuples as well.'''
+    return tuple([_hashable(v) if v.__class__ is list else v for v in items])
+
+
+# the most distinct modifier tuples _modifiers() shares; real code has few
+# combinations of modifiers, this only bounds the table for any input
+MAX_SHARED_MODIFIERS = 1024
+
+_shared_modifiers = {}
+
+
+def _modifiers(modifiers):
+    '''
+    The list modifiers as a tuple. A tuple of keywords only, the same for all
+    nodes with these modifiers, comes from a table shared by all parses.
+    '''
+    if not modifiers:
+        return ()
+    modifiers = tuple(modifiers)
+    for modifier in modifiers:
+        if modifier.__class__ is not str:
+            # annotations are not kept beyond the tree they belong to
+            return modifiers
+    shared = _shared_modifiers.get(modifiers)
+    if shared is None:
+        if len(_shared_modifiers) >= MAX_SHARED_MODIFIERS:
+            return modifiers
+        shared = _shared_modifiers.setdefault(modifiers, modifiers)
+    return shared
+
+
+def _slot_names(cls):
+    '''The names of the slots of cls and its bases, kept on cls once known.'''
+    names = cls.__dict__.get('_slot_names')
+    if names is None:
+        names = []
+        for c in cls.__mro__:
+            for name in c.__dict__.get('__slots__', ()):
+                if name not in names:
+                    names.append(name)
+        names = tuple(names)
+        cls._slot_names = names
+    return names
+
+
 # Base node
 class SourceElement(object):
     '''
     A SourceElement is the base class for all elements that occur in a Java
     file parsed by plyj.
+
+    Every class lists the names of its children in the class attribute
+    _fields and keeps its attributes in __slots__, so nodes have no
+    __dict__.
+
+    Two nodes are equal if they have the same _fields and equal values in
+    them; a class that adds no fields shares _fields with its base, so e.g.
+    an Additive equals a BinaryExpression. Equal nodes have the same hash,
+    which is computed when it is first asked for and then kept: a node must
+    not be changed after it has been hashed, e.g. used as a key of a dict.
     '''
 
-    def __init__(self):
-        super(SourceElement, self).__init__()
-        self._fields = []
+    _fields = ()
+    __slots__ = ('_hash',)
 
     def __repr__(self):
         equals = ("{0}={1!r}".format(k, getattr(self, k))
@@ -15,42 +74,148 @@ class SourceElement(object):
         args = ", ".join(equals)
         return "{0}({1})".format(self.__class__.__name__, args)
 
+    def _state(self):
+        '''The values of the slots that are set, by slot name, without the hash.'''
+        state = {}
+        for name in _slot_names(self.__class__):
+            if name != '_hash':
+                try:
+                    state[name] = getattr(self, name)
+                except AttributeError:
+                    pass
+        return state
+
     def __eq__(self, other):
-        try:
-            return self.__dict__ == other.__dict__
-        except AttributeError:
+        if self is other:
+            return True
+        fields = self._fields
+        if getattr(other, '_fields', None) is not fields:
             return False
+        for name in fields:
+            if not getattr(self, name) == getattr(other, name):
+                return False
+        return True
 
     def __ne__(self, other):
         return not self == other
 
+    def __hash__(self):
+        cached = getattr(self, '_hash', None)
+        if cached is not None:
+            return cached
+        values = []
+        for name in self._fields:
+            value = getattr(self, name)
+            if value.__class__ is list:
+                value = _hashable(value)
+            values.append(value)
+        self._hash = hash(tuple(values))
+        return self._hash
+
+    def __getstate__(self):
+        return self._state()
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+
     def accept(self, visitor):
         """
         default implementation that visit the subnodes in the order
         they are stored in self_field
         """
-        class_name = self.__class__.__name__
-        visit = getattr(visitor, 'visit_' + class_name)
-        if visit(self):
+        try:
+            visit, leave = visitor.__class__._dispatch[self.__class__]
+        except (AttributeError, KeyError):
+            visit, leave = _handlers(visitor.__class__, self.__class__)
+        if visit(visitor, self):
             for f in self._fields:
                 field = getattr(self, f)
                 if field:
-                    if isinstance(field, list):
+                    if isinstance(field, (list, tuple)):
                         for elem in field:
                             if isinstance(elem, SourceElement):
                                 elem.accept(visitor)
                     elif isinstance(field, SourceElement):
                         field.accept(visitor)
-        getattr(visitor, 'leave_' + class_name)(self)
+        leave(visitor, self)
+
+
+class LazyBody(object):
+    '''
+    The body of a method, constructor or initializer that is parsed when it
+    is first read: start and end are the offsets of its '{' and one past its
+    '}', parse is called without arguments to parse it while holding lock.
+    The lazy bodies of one parse share a lock, so each is parsed once and
+    only one at a time adds to the spans and diagnostics of the parse.
+    '''
+
+    __slots__ = ('start', 'end', '_parse', '_lock', '_value')
+
+    def __init__(self, start, end, parse, lock):
+        self.start = start
+        self.end = end
+        self._parse = parse
+        self._lock = lock
+
+    def value(self):
+        '''The parsed body, parsed on the first call.'''
+        if self._parse is not None:
+            with self._lock:
+                parse = self._parse
+                if parse is not None:
+                    self._value = parse()
+                    self._parse = None
+        return self._value
+
+    def __eq__(self, other):
+        if isinstance(other, LazyBody):
+            other = other.value()
+        return self.value() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __reduce__(self):
+        # the parse function cannot be pickled, a copy gets the parsed body
+        return LazyBody, (self.start, self.end, None, None), (None, {'_value': self.value()})
+
+    def __repr__(self):
+        return repr(self.value())
+
+
+class body_field(object):
+    '''
+    The attribute of a body that may be a LazyBody, stored in the slot
+    named slot; reading it replaces the LazyBody with the parsed body.
+    '''
+
+    __slots__ = ('slot',)
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def __get__(self, obj, cls=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self.slot)
+        if isinstance(value, LazyBody):
+            value = value.value()
+            setattr(obj, self.slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self.slot, value)
 
 
 class CompilationUnit(SourceElement):
 
+    _fields = ('package_declaration', 'import_declarations',
+               'type_declarations')
+    __slots__ = _fields
+
     def __init__(self, package_declaration=None, import_declarations=None,
                  type_declarations=None):
-        super(CompilationUnit, self).__init__()
-        self._fields = [
-            'package_declaration', 'import_declarations', 'type_declarations']
         if import_declarations is None:
             import_declarations = []
         if type_declarations is None:
@@ -61,20 +226,20 @@ class CompilationUnit(SourceElement):
 
 class PackageDeclaration(SourceElement):
 
+    _fields = ('name', 'modifiers')
+    __slots__ = _fields
+
     def __init__(self, name, modifiers=None):
-        super(PackageDeclaration, self).__init__()
-        self._fields = ['name', 'modifiers']
-        if modifiers is None:
-            modifiers = []
         self.name = name
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
 
 
 class ImportDeclaration(SourceElement):
 
+    _fields = ('name', 'static', 'on_demand')
+    __slots__ = _fields
+
     def __init__(self, name, static=False, on_demand=False):
-        super(ImportDeclaration, self).__init__()
-        self._fields = ['name', 'static', 'on_demand']
         self.name = name
         self.static = static
         self.on_demand = on_demand
@@ -82,83 +247,84 @@ class ImportDeclaration(SourceElement):
 
 class ClassDeclaration(SourceElement):
 
+    _fields = ('name', 'body', 'modifiers', 'type_parameters', 'extends',
+               'implements')
+    __slots__ = _fields
+
     def __init__(self, name, body, modifiers=None, type_parameters=None,
                  extends=None, implements=None):
-        super(ClassDeclaration, self).__init__()
-        self._fields = ['name', 'body', 'modifiers',
-                        'type_parameters', 'extends', 'implements']
-        if modifiers is None:
-            modifiers = []
         if type_parameters is None:
             type_parameters = []
         if implements is None:
             implements = []
         self.name = name
         self.body = body
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.type_parameters = type_parameters
         self.extends = extends
         self.implements = implements
 
 class ClassInitializer(SourceElement):
 
+    _fields = ('block', 'static')
+    __slots__ = ('_block', 'static')
+    block = body_field('_block')
+
     def __init__(self, block, static=False):
-        super(ClassInitializer, self).__init__()
-        self._fields = ['block', 'static']
         self.block = block
         self.static = static
 
 class ConstructorDeclaration(SourceElement):
 
+    _fields = ('name', 'block', 'modifiers', 'type_parameters', 'parameters',
+               'throws')
+    __slots__ = ('name', '_block', 'modifiers', 'type_parameters',
+                 'parameters', 'throws')
+    block = body_field('_block')
+
     def __init__(self, name, block, modifiers=None, type_parameters=None,
                  parameters=None, throws=None):
-        super(ConstructorDeclaration, self).__init__()
-        self._fields = ['name', 'block', 'modifiers',
-                        'type_parameters', 'parameters', 'throws']
-        if modifiers is None:
-            modifiers = []
         if type_parameters is None:
             type_parameters = []
         if parameters is None:
             parameters = []
         self.name = name
         self.block = block
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.type_parameters = type_parameters
         self.parameters = parameters
         self.throws = throws
 
 class EmptyDeclaration(SourceElement):
-    pass
+    __slots__ = ()
 
 class FieldDeclaration(SourceElement):
 
+    _fields = ('type', 'variable_declarators', 'modifiers')
+    __slots__ = _fields
+
     def __init__(self, type, variable_declarators, modifiers=None):
-        super(FieldDeclaration, self).__init__()
-        self._fields = ['type', 'variable_declarators', 'modifiers']
-        if modifiers is None:
-            modifiers = []
         self.type = type
         self.variable_declarators = variable_declarators
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
 
 class MethodDeclaration(SourceElement):
 
+    _fields = ('name', 'modifiers', 'type_parameters', 'parameters',
+               'return_type', 'body', 'abstract', 'extended_dims', 'throws')
+    __slots__ = ('name', 'modifiers', 'type_parameters', 'parameters',
+                 'return_type', '_body', 'abstract', 'extended_dims', 'throws')
+    body = body_field('_body')
+
     def __init__(self, name, modifiers=None, type_parameters=None,
                  parameters=None, return_type='void', body=None, abstract=False,
                  extended_dims=0, throws=None):
-        super(MethodDeclaration, self).__init__()
-        self._fields = ['name', 'modifiers', 'type_parameters', 'parameters',
-                        'return_type', 'body', 'abstract', 'extended_dims',
-                        'throws']
-        if modifiers is None:
-            modifiers = []
         if type_parameters is None:
             type_parameters = []
         if parameters is None:
             parameters = []
         self.name = name
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.type_parameters = type_parameters
         self.parameters = parameters
         self.return_type = return_type
@@ -167,16 +333,28 @@ class MethodDeclaration(SourceElement):
         self.extended_dims = extended_dims
         self.throws = throws
 
+class UnparsedBody(SourceElement):
+    '''
+    The body of a method, constructor or initializer that a signature-only
+    parse skipped: the offsets of its '{' and one past its '}'.
+    '''
+
+    _fields = ('start', 'end')
+    __slots__ = _fields
+
+    def __init__(self, start, end):
+        self.start = start
+        self.end = end
+
 class FormalParameter(SourceElement):
 
+    _fields = ('variable', 'type', 'modifiers', 'vararg')
+    __slots__ = _fields
+
     def __init__(self, variable, type, modifiers=None, vararg=False):
-        super(FormalParameter, self).__init__()
-        self._fields = ['variable', 'type', 'modifiers', 'vararg']
-        if modifiers is None:
-            modifiers = []
         self.variable = variable
         self.type = type
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.vararg = vararg
 
 
@@ -188,37 +366,38 @@ class Variable(SourceElement):
     # If the variable is to go away, the type has to be duplicated for every
     # variable...
 
+    _fields = ('name', 'dimensions')
+    __slots__ = _fields
+
     def __init__(self, name, dimensions=0):
-        super(Variable, self).__init__()
-        self._fields = ['name', 'dimensions']
         self.name = name
         self.dimensions = dimensions
 
 
 class VariableDeclarator(SourceElement):
 
+    _fields = ('variable', 'initializer')
+    __slots__ = _fields
+
     def __init__(self, variable, initializer=None):
-        super(VariableDeclarator, self).__init__()
-        self._fields = ['variable', 'initializer']
         self.variable = variable
         self.initializer = initializer
 
 class Throws(SourceElement):
 
+    _fields = ('types',)
+    __slots__ = _fields
+
     def __init__(self, types):
-        super(Throws, self).__init__()
-        self._fields = ['types']
         self.types = types
 
 class InterfaceDeclaration(SourceElement):
 
+    _fields = ('name', 'modifiers', 'extends', 'type_parameters', 'body')
+    __slots__ = _fields
+
     def __init__(self, name, modifiers=None, extends=None, type_parameters=None,
                  body=None):
-        super(InterfaceDeclaration, self).__init__()
-        self._fields = [
-            'name', 'modifiers', 'extends', 'type_parameters', 'body']
-        if modifiers is None:
-            modifiers = []
         if extends is None:
             extends = []
         if type_parameters is None:
@@ -226,58 +405,53 @@ class InterfaceDeclaration(SourceElement):
         if body is None:
             body = []
         self.name = name
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.extends = extends
         self.type_parameters = type_parameters
         self.body = body
 
 class EnumDeclaration(SourceElement):
 
+    _fields = ('name', 'implements', 'modifiers', 'type_parameters', 'body')
+    __slots__ = _fields
+
     def __init__(self, name, implements=None, modifiers=None,
                  type_parameters=None, body=None):
-        super(EnumDeclaration, self).__init__()
-        self._fields = [
-            'name', 'implements', 'modifiers', 'type_parameters', 'body']
         if implements is None:
             implements = []
-        if modifiers is None:
-            modifiers = []
         if type_parameters is None:
             type_parameters = []
         if body is None:
             body = []
         self.name = name
         self.implements = implements
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.type_parameters = type_parameters
         self.body = body
 
 class EnumConstant(SourceElement):
 
+    _fields = ('name', 'arguments', 'modifiers', 'body')
+    __slots__ = _fields
+
     def __init__(self, name, arguments=None, modifiers=None, body=None):
-        super(EnumConstant, self).__init__()
-        self._fields = ['name', 'arguments', 'modifiers', 'body']
         if arguments is None:
             arguments = []
-        if modifiers is None:
-            modifiers = []
         if body is None:
             body = []
         self.name = name
         self.arguments = arguments
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.body = body
 
 class AnnotationDeclaration(SourceElement):
 
+    _fields = ('name', 'modifiers', 'type_parameters', 'extends', 'implements',
+               'body')
+    __slots__ = _fields
+
     def __init__(self, name, modifiers=None, type_parameters=None, extends=None,
                  implements=None, body=None):
-        super(AnnotationDeclaration, self).__init__()
-        self._fields = [
-            'name', 'modifiers', 'type_parameters', 'extends', 'implements',
-            'body']
-        if modifiers is None:
-            modifiers = []
         if type_parameters is None:
             type_parameters = []
         if implements is None:
@@ -285,7 +459,7 @@ class AnnotationDeclaration(SourceElement):
         if body is None:
             body = []
         self.name = name
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.type_parameters = type_parameters
         self.extends = extends
         self.implements = implements
@@ -293,30 +467,30 @@ class AnnotationDeclaration(SourceElement):
 
 class AnnotationMethodDeclaration(SourceElement):
 
+    _fields = ('name', 'type', 'parameters', 'default', 'modifiers',
+               'type_parameters', 'extended_dims')
+    __slots__ = _fields
+
     def __init__(self, name, type, parameters=None, default=None,
                  modifiers=None, type_parameters=None, extended_dims=0):
-        super(AnnotationMethodDeclaration, self).__init__()
-        self._fields = ['name', 'type', 'parameters', 'default',
-                        'modifiers', 'type_parameters', 'extended_dims']
         if parameters is None:
             parameters = []
-        if modifiers is None:
-            modifiers = []
         if type_parameters is None:
             type_parameters = []
         self.name = name
         self.type = type
         self.parameters = parameters
         self.default = default
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.type_parameters = type_parameters
         self.extended_dims = extended_dims
 
 class Annotation(SourceElement):
 
+    _fields = ('name', 'members', 'single_member')
+    __slots__ = _fields
+
     def __init__(self, name, members=None, single_member=None):
-        super(Annotation, self).__init__()
-        self._fields = ['name', 'members', 'single_member']
         if members is None:
             members = []
         self.name = name
@@ -326,19 +500,21 @@ class Annotation(SourceElement):
 
 class AnnotationMember(SourceElement):
 
+    _fields = ('name', 'value')
+    __slots__ = _fields
+
     def __init__(self, name, value):
-        super(SourceElement, self).__init__()
-        self._fields = ['name', 'value']
         self.name = name
         self.value = value
 
 
 class Type(SourceElement):
 
+    _fields = ('name', 'type_arguments', 'enclosed_in', 'dimensions')
+    __slots__ = _fields
+
     def __init__(self, name, type_arguments=None, enclosed_in=None,
                  dimensions=0):
-        super(Type, self).__init__()
-        self._fields = ['name', 'type_arguments', 'enclosed_in', 'dimensions']
         if type_arguments is None:
             type_arguments = []
         self.name = name
@@ -349,9 +525,10 @@ class Type(SourceElement):
 
 class Wildcard(SourceElement):
 
+    _fields = ('bounds',)
+    __slots__ = _fields
+
     def __init__(self, bounds=None):
-        super(Wildcard, self).__init__()
-        self._fields = ['bounds']
         if bounds is None:
             bounds = []
         self.bounds = bounds
@@ -359,9 +536,10 @@ class Wildcard(SourceElement):
 
 class WildcardBound(SourceElement):
 
+    _fields = ('type', 'extends', '_super')
+    __slots__ = _fields
+
     def __init__(self, type, extends=False, _super=False):
-        super(WildcardBound, self).__init__()
-        self._fields = ['type', 'extends', '_super']
         self.type = type
         self.extends = extends
         self._super = _super
@@ -369,9 +547,10 @@ class WildcardBound(SourceElement):
 
 class TypeParameter(SourceElement):
 
+    _fields = ('name', 'extends')
+    __slots__ = _fields
+
     def __init__(self, name, extends=None):
-        super(TypeParameter, self).__init__()
-        self._fields = ['name', 'extends']
         if extends is None:
             extends = []
         self.name = name
@@ -379,105 +558,117 @@ class TypeParameter(SourceElement):
 
 
 class Expression(SourceElement):
-
-    def __init__(self):
-        super(Expression, self).__init__()
-        self._fields = []
+    __slots__ = ()
 
 class BinaryExpression(Expression):
 
+    _fields = ('operator', 'lhs', 'rhs')
+    __slots__ = _fields
+
     def __init__(self, operator, lhs, rhs):
-        super(BinaryExpression, self).__init__()
-        self._fields = ['operator', 'lhs', 'rhs']
         self.operator = operator
         self.lhs = lhs
         self.rhs = rhs
 
 class Assignment(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Conditional(Expression):
 
+    _fields = ('predicate', 'if_true', 'if_false')
+    __slots__ = _fields
+
     def __init__(self, predicate, if_true, if_false):
-        super(self.__class__, self).__init__()
-        self._fields = ['predicate', 'if_true', 'if_false']
         self.predicate = predicate
         self.if_true = if_true
         self.if_false = if_false
 
 class ConditionalOr(BinaryExpression):
-    pass
+    __slots__ = ()
 
 class ConditionalAnd(BinaryExpression):
-    pass
+    __slots__ = ()
 
 class Or(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Xor(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class And(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Equality(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class InstanceOf(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Relational(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Shift(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Additive(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Multiplicative(BinaryExpression):
-    pass
+    __slots__ = ()
 
 
 class Unary(Expression):
 
+    _fields = ('sign', 'expression')
+    __slots__ = _fields
+
     def __init__(self, sign, expression):
-        super(Unary, self).__init__()
-        self._fields = ['sign', 'expression']
         self.sign = sign
         self.expression = expression
 
 
 class Cast(Expression):
 
+    _fields = ('target', 'expression')
+    __slots__ = _fields
+
     def __init__(self, target, expression):
-        super(Cast, self).__init__()
-        self._fields = ['target', 'expression']
         self.target = target
         self.expression = expression
 
 
 class Statement(SourceElement):
-    pass
+    # The statement after 'name:' gets the name as its label; it is not a
+    # field. Every statement that can be labelled has a slot for it, a
+    # VariableDeclaration can't, and its second base has slots of its own.
+    # Statements with different labels are not equal.
+    __slots__ = ()
+
+    def __eq__(self, other):
+        return (SourceElement.__eq__(self, other) and
+                getattr(self, 'label', None) == getattr(other, 'label', None))
+
+    __hash__ = SourceElement.__hash__
 
 class Empty(Statement):
-    pass
+    __slots__ = ('label',)
 
 
 class Block(Statement):
 
+    _fields = ('statements',)
+    __slots__ = _fields + ('label',)
+
     def __init__(self, statements=None):
-        super(Statement, self).__init__()
-        self._fields = ['statements']
         if statements is None:
             statements = []
         self.statements = statements
@@ -487,23 +678,23 @@ class Block(Statement):
             yield s
 
 class VariableDeclaration(Statement, FieldDeclaration):
-    pass
+    __slots__ = ()
 
 class ArrayInitializer(SourceElement):
+    _fields = ('elements',)
+    __slots__ = _fields
+
     def __init__(self, elements=None):
-        super(ArrayInitializer, self).__init__()
-        self._fields = ['elements']
         if elements is None:
             elements = []
         self.elements = elements
 
 
 class MethodInvocation(Expression):
-    def __init__(self, name, arguments=None, type_arguments=None, target=None,
-                 startLine=-1, startLexPos=-1, endLine=-1, endLexPos=-1):
-        super(MethodInvocation, self).__init__()
-        self._fields = ['name', 'arguments', 'type_arguments', 'target',
-                        'startLine', 'startLexPos', 'endLine', 'endLexPos']
+    _fields = ('name', 'arguments', 'type_arguments', 'target')
+    __slots__ = _fields
+
+    def __init__(self, name, arguments=None, type_arguments=None, target=None):
         if arguments is None:
             arguments = []
         if type_arguments is None:
@@ -512,33 +703,32 @@ class MethodInvocation(Expression):
         self.arguments = arguments
         self.type_arguments = type_arguments
         self.target = target
-        self.startLine = startLine
-        self.startLexPos = startLexPos
-        self.endLine = endLine
-        self.endLexPos = endLexPos
 
 class IfThenElse(Statement):
 
+    _fields = ('predicate', 'if_true', 'if_false')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, predicate, if_true=None, if_false=None):
-        super(IfThenElse, self).__init__()
-        self._fields = ['predicate', 'if_true', 'if_false']
         self.predicate = predicate
         self.if_true = if_true
         self.if_false = if_false
 
 class While(Statement):
 
+    _fields = ('predicate', 'body')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, predicate, body=None):
-        super(While, self).__init__()
-        self._fields = ['predicate', 'body']
         self.predicate = predicate
         self.body = body
 
 class For(Statement):
 
+    _fields = ('init', 'predicate', 'update', 'body')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, init, predicate, update, body):
-        super(For, self).__init__()
-        self._fields = ['init', 'predicate', 'update', 'body']
         self.init = init
         self.predicate = predicate
         self.update = update
@@ -546,40 +736,42 @@ class For(Statement):
 
 class ForEach(Statement):
 
+    _fields = ('type', 'variable', 'iterable', 'body', 'modifiers')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, type, variable, iterable, body, modifiers=None):
-        super(ForEach, self).__init__()
-        self._fields = ['type', 'variable', 'iterable', 'body', 'modifiers']
-        if modifiers is None:
-            modifiers = []
         self.type = type
         self.variable = variable
         self.iterable = iterable
         self.body = body
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
 
 
 class Assert(Statement):
 
+    _fields = ('predicate', 'message')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, predicate, message=None):
-        super(Assert, self).__init__()
-        self._fields = ['predicate', 'message']
         self.predicate = predicate
         self.message = message
 
 
 class Switch(Statement):
 
+    _fields = ('expression', 'switch_cases')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, expression, switch_cases):
-        super(Switch, self).__init__()
-        self._fields = ['expression', 'switch_cases']
         self.expression = expression
         self.switch_cases = switch_cases
 
 class SwitchCase(SourceElement):
 
+    _fields = ('cases', 'body')
+    __slots__ = _fields
+
     def __init__(self, cases, body=None):
-        super(SwitchCase, self).__init__()
-        self._fields = ['cases', 'body']
         if body is None:
             body = []
         self.cases = cases
@@ -587,59 +779,66 @@ class SwitchCase(SourceElement):
 
 class DoWhile(Statement):
 
+    _fields = ('predicate', 'body')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, predicate, body=None):
-        super(DoWhile, self).__init__()
-        self._fields = ['predicate', 'body']
         self.predicate = predicate
         self.body = body
 
 
 class Continue(Statement):
 
+    _fields = ('label',)
+    __slots__ = _fields
+
     def __init__(self, label=None):
-        super(Continue, self).__init__()
-        self._fields = ['label']
         self.label = label
 
 
 class Break(Statement):
 
+    _fields = ('label',)
+    __slots__ = _fields
+
     def __init__(self, label=None):
-        super(Break, self).__init__()
-        self._fields = ['label']
         self.label = label
 
 
 class Return(Statement):
 
+    _fields = ('result',)
+    __slots__ = _fields + ('label',)
+
     def __init__(self, result=None):
-        super(Return, self).__init__()
-        self._fields = ['result']
         self.result = result
 
 
 class Synchronized(Statement):
 
+    _fields = ('monitor', 'body')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, monitor, body):
-        super(Synchronized, self).__init__()
-        self._fields = ['monitor', 'body']
         self.monitor = monitor
         self.body = body
 
 
 class Throw(Statement):
 
+    _fields = ('exception',)
+    __slots__ = _fields + ('label',)
+
     def __init__(self, exception):
-        super(Throw, self).__init__()
-        self._fields = ['exception']
         self.exception = exception
 
 
 class Try(Statement):
 
+    _fields = ('block', 'catches', '_finally', 'resources')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, block, catches=None, _finally=None, resources=None):
-        super(Try, self).__init__()
-        self._fields = ['block', 'catches', '_finally', 'resources']
         if catches is None:
             catches = []
         if resources is None:
@@ -650,40 +849,39 @@ class Try(Statement):
         self.resources = resources
 
     def accept(self, visitor):
-        if visitor.visit_Try(self):
+        if _handlers(visitor.__class__, Try)[0](visitor, self):
             for s in self.block:
                 s.accept(visitor)
+        visit_catch = _handlers(visitor.__class__, Catch)[0]
         for c in self.catches:
-            visitor.visit_Catch(c)
+            visit_catch(visitor, c)
         if self._finally:
             self._finally.accept(visitor)
 
 
 class Catch(SourceElement):
 
+    _fields = ('variable', 'modifiers', 'types', 'block')
+    __slots__ = _fields
+
     def __init__(self, variable, modifiers=None, types=None, block=None):
-        super(Catch, self).__init__()
-        self._fields = ['variable', 'modifiers', 'types', 'block']
-        if modifiers is None:
-            modifiers = []
         if types is None:
             types = []
         self.variable = variable
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.types = types
         self.block = block
 
 
 class Resource(SourceElement):
 
+    _fields = ('variable', 'type', 'modifiers', 'initializer')
+    __slots__ = _fields
+
     def __init__(self, variable, type=None, modifiers=None, initializer=None):
-        super(Resource, self).__init__()
-        self._fields = ['variable', 'type', 'modifiers', 'initializer']
-        if modifiers is None:
-            modifiers = []
         self.variable = variable
         self.type = type
-        self.modifiers = modifiers
+        self.modifiers = _modifiers(modifiers)
         self.initializer = initializer
 
 
@@ -693,9 +891,10 @@ class ConstructorInvocation(Statement):
     This is a variant of either this() or super(), NOT a "new" expression.
     """
 
+    _fields = ('name', 'target', 'type_arguments', 'arguments')
+    __slots__ = _fields + ('label',)
+
     def __init__(self, name, target=None, type_arguments=None, arguments=None):
-        super(ConstructorInvocation, self).__init__()
-        self._fields = ['name', 'target', 'type_arguments', 'arguments']
         if type_arguments is None:
             type_arguments = []
         if arguments is None:
@@ -708,11 +907,11 @@ class ConstructorInvocation(Statement):
 
 class InstanceCreation(Expression):
 
+    _fields = ('type', 'type_arguments', 'arguments', 'body', 'enclosed_in')
+    __slots__ = _fields
+
     def __init__(self, type, type_arguments=None, arguments=None, body=None,
                  enclosed_in=None):
-        super(InstanceCreation, self).__init__()
-        self._fields = [
-            'type', 'type_arguments', 'arguments', 'body', 'enclosed_in']
         if type_arguments is None:
             type_arguments = []
         if arguments is None:
@@ -728,27 +927,30 @@ class InstanceCreation(Expression):
 
 class FieldAccess(Expression):
 
+    _fields = ('name', 'target')
+    __slots__ = _fields
+
     def __init__(self, name, target):
-        super(FieldAccess, self).__init__()
-        self._fields = ['name', 'target']
         self.name = name
         self.target = target
 
 
 class ArrayAccess(Expression):
 
+    _fields = ('index', 'target')
+    __slots__ = _fields
+
     def __init__(self, index, target):
-        super(ArrayAccess, self).__init__()
-        self._fields = ['index', 'target']
         self.index = index
         self.target = target
 
 
 class ArrayCreation(Expression):
 
+    _fields = ('type', 'dimensions', 'initializer')
+    __slots__ = _fields
+
     def __init__(self, type, dimensions=None, initializer=None):
-        super(ArrayCreation, self).__init__()
-        self._fields = ['type', 'dimensions', 'initializer']
         if dimensions is None:
             dimensions = []
         self.type = type
@@ -758,25 +960,28 @@ class ArrayCreation(Expression):
 
 class Literal(SourceElement):
 
+    _fields = ('value',)
+    __slots__ = _fields
+
     def __init__(self, value):
-        super(Literal, self).__init__()
-        self._fields = ['value']
         self.value = value
 
 
 class ClassLiteral(SourceElement):
 
+    _fields = ('type',)
+    __slots__ = _fields
+
     def __init__(self, type):
-        super(ClassLiteral, self).__init__()
-        self._fields = ['type']
         self.type = type
 
 
 class Name(SourceElement):
 
+    _fields = ('value',)
+    __slots__ = _fields
+
     def __init__(self, value):
-        super(Name, self).__init__()
-        self._fields = ['value']
         self.value = value
 
     def append_name(self, name):
@@ -787,13 +992,55 @@ class Name(SourceElement):
 
 
 class ExpressionStatement(Statement):
+    _fields = ('expression',)
+    __slots__ = _fields + ('label',)
+
     def __init__(self, expression):
-        super(ExpressionStatement, self).__init__()
-        self._fields = ['expression']
         self.expression = expression
 
 
+class _VisitorType(type):
+    '''
+    The class of the Visitor classes. Every one keeps the (visit, leave)
+    functions of the nodes of a class in its _dispatch, by node class (see
+    _handlers()); setting or deleting an attribute of a visitor class
+    empties that of the class and of its subclasses.
+    '''
+
+    def __init__(cls, name, bases, namespace):
+        super(_VisitorType, cls).__init__(name, bases, namespace)
+        type.__setattr__(cls, '_dispatch', {})
+
+    def __setattr__(cls, name, value):
+        type.__setattr__(cls, name, value)
+        _forget(cls)
+
+    def __delattr__(cls, name):
+        type.__delattr__(cls, name)
+        _forget(cls)
+
+
+def _forget(cls):
+    '''Empties the _dispatch of the visitor class cls and of its subclasses.'''
+    classes = [cls]
+    while classes:
+        c = classes.pop()
+        c._dispatch.clear()
+        classes.extend(c.__subclasses__())
+
+
 class Visitor(object):
+    '''
+    The base class of visitors. accept() calls its visit_<class name> method
+    for a node, visits the children of the node if that returns True and
+    then calls leave_<class name>. The methods a visitor leaves out return
+    True and print a message if verbose is set.
+
+    accept() looks the methods up once per visitor class and node class, so
+    they are taken from the class, not from the visitor instance.
+    '''
+
+    __metaclass__ = _VisitorType
 
     def __init__(self, verbose=False):
         self.verbose = verbose
@@ -802,10 +1049,53 @@ class Visitor(object):
         if not (name.startswith('visit_') or name.startswith('leave_')):
             raise AttributeError('name must start with visit_ or leave_ but was {}'
                                  .format(name))
+        return functools.partial(_unimplemented(name), self)
 
-        def f(element):
-            if self.verbose:
-                msg = 'unimplemented call to {}; ignoring ({})'
-                print(msg.format(name, element))
-            return True
-        return f
+
+def _unimplemented(name):
+    '''The function that stands in for a visit_ or leave_ method a Visitor lacks.'''
+    def f(visitor, element):
+        if visitor.verbose:
+            msg = 'unimplemented call to {}; ignoring ({})'
+            print(msg.format(name, element))
+        return True
+    return f
+
+
+def _handlers(visitor_class, node_class):
+    '''
+    The functions that visit and leave a node of node_class, called with the
+    visitor and the node. For a Visitor subclass they are the methods of the
+    class or stand-ins, kept in the _dispatch of the class; other visitors
+    are asked with getattr() on every call, as they may make up their
+    methods at any time.
+    '''
+    dispatch = visitor_class._dispatch if isinstance(visitor_class, _VisitorType) else None
+    if dispatch is not None:
+        handlers = dispatch.get(node_class)
+        if handlers is not None:
+            return handlers
+    handlers = tuple(_handler(visitor_class, prefix + node_class.__name__)
+                     for prefix in ('visit_', 'leave_'))
+    if dispatch is not None:
+        dispatch[node_class] = handlers
+    return handlers
+
+
+def _class_attribute(cls, name):
+    '''The attribute name as defined in the class dict of cls or a base, None if there is none.'''
+    for c in cls.__mro__:
+        if name in c.__dict__:
+            return c.__dict__[name]
+    return None
+
+
+def _handler(visitor_class, name):
+    if isinstance(visitor_class, _VisitorType):
+        method = _class_attribute(visitor_class, name)
+        if isinstance(method, types.FunctionType):
+            return method
+        if (method is None and
+                _class_attribute(visitor_class, '__getattr__') is Visitor.__dict__['__getattr__']):
+            return _unimplemented(name)
+    return lambda visitor, element: getattr(visitor, name)(element)
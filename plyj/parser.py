@@ -1,8 +1,60 @@
 #!/usr/bin/env python2
 
-import ply.lex as lex
-import ply.yacc as yacc
+import functools
+import sys
+import threading
+
 from model import *
+from engine import Engine
+import incremental
+from limits import Guard
+from lines import LineIndex
+import scanner
+from spans import SpanTable
+import tables
+
+START = 'goal'
+
+def token_rule(pattern):
+    '''
+    Sets the regex of a t_ function like ply.lex.TOKEN. Unlike a docstring
+    the pattern survives python -OO, the scanner compiles it at runtime.
+    '''
+    def set_regex(f):
+        f.regex = pattern
+        return f
+    return set_regex
+
+def passes_value(f):
+    '''
+    Marks a p_ function whose productions of one symbol pass the value of
+    that symbol on, like expression : assignment_expression. The engine
+    does not call it for these reductions, it only does their goto.
+    '''
+    f.passes_value = True
+    return f
+
+def records_spans(f):
+    '''
+    Marks a p_ function that records the spans of nodes with record_span(),
+    the engine hands it a production that has the spans of its symbols.
+    '''
+    f.records_spans = True
+    return f
+
+def record_span(p, node, first, last=None):
+    '''
+    Records the span of a node that an action builds besides its result, the
+    node covers the symbols first to last of the production. Returns node.
+    Productions of parses that track no spans are plain lists, they are left
+    alone.
+    '''
+    table = getattr(p, 'table', None)
+    if table is not None and isinstance(node, table.classes):
+        spans = [span for span in p.spans[first:(last or first) + 1] if span is not None]
+        if spans:
+            table.add(node, spans[0][0], spans[-1][1])
+    return node
 
 class MyLexer(object):
 
@@ -37,16 +89,25 @@ class MyLexer(object):
 
         'ELLIPSIS'
     ] + [k.upper() for k in keywords]
+
+    # tokens that never occur in the source: the parser starts the input with
+    # one of them to select what it parses (see Parser.parse)
+    goals = ('GOAL_COMPILATION_UNIT', 'GOAL_EXPRESSION', 'GOAL_STATEMENT', 'GOAL_TYPE',
+             'GOAL_CLASS_BODY', 'GOAL_BLOCK')
+    tokens += goals
     literals = '()+-*/=?:,.^|&~!=[]{};<>@%'
 
     t_NUM = r'\.?[0-9][0-9eE_lLdDa-fA-F.xXpP]*'
-    t_CHAR_LITERAL = r'\'([^\\\n]|(\\.))*?\''
-    t_STRING_LITERAL = r'\"([^\\\n]|(\\.))*?\"'
+    # literals and block comments are written as unrolled loops: the
+    # character classes between the escapes cannot overlap, so the regex
+    # engine never backtracks and the cost is linear in the length
+    t_CHAR_LITERAL = r"'[^'\\\n]*(?:\\.[^'\\\n]*)*'"
+    t_STRING_LITERAL = r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"'
 
     t_ignore_LINE_COMMENT = '//.*'
 
+    @token_rule(r'/\*[^*]*\*+(?:[^/*][^*]*\*+)*/')
     def t_BLOCK_COMMENT(self, t):
-        r'/\*(.|\n)*?\*/'
         t.lexer.lineno += t.value.count('\n')
 
     t_OR = r'\|\|'
@@ -80,18 +141,18 @@ class MyLexer(object):
 
     t_ignore = ' \t\f'
 
+    @token_rule('[A-Za-z_$][A-Za-z0-9_$]*')
     def t_NAME(self, t):
-        '[A-Za-z_$][A-Za-z0-9_$]*'
         if t.value in MyLexer.keywords:
             t.type = t.value.upper()
         return t
 
+    @token_rule(r'\n+')
     def t_newline(self, t):
-        r'\n+'
         t.lexer.lineno += len(t.value)
 
+    @token_rule(r'(\r\n)+')
     def t_newline2(self, t):
-        r'(\r\n)+'
         t.lexer.lineno += len(t.value) / 2
 
     def t_error(self, t):
@@ -100,19 +161,23 @@ class MyLexer(object):
 
 class ExpressionParser(object):
 
+    @passes_value
     def p_expression(self, p):
         '''expression : assignment_expression'''
         p[0] = p[1]
 
+    @passes_value
     def p_expression_not_name(self, p):
         '''expression_not_name : assignment_expression_not_name'''
         p[0] = p[1]
 
+    @passes_value
     def p_assignment_expression(self, p):
         '''assignment_expression : assignment
                                  | conditional_expression'''
         p[0] = p[1]
 
+    @passes_value
     def p_assignment_expression_not_name(self, p):
         '''assignment_expression_not_name : assignment
                                           | conditional_expression_not_name'''
@@ -122,6 +187,7 @@ class ExpressionParser(object):
         '''assignment : postfix_expression assignment_operator assignment_expression'''
         p[0] = Assignment(p[2], p[1], p[3])
 
+    @passes_value
     def p_assignment_operator(self, p):
         '''assignment_operator : '='
                                | TIMES_ASSIGN
@@ -137,6 +203,7 @@ class ExpressionParser(object):
                                | XOR_ASSIGN'''
         p[0] = p[1]
 
+    @passes_value
     def p_conditional_expression(self, p):
         '''conditional_expression : conditional_or_expression
                                   | conditional_or_expression '?' expression ':' conditional_expression'''
@@ -145,6 +212,7 @@ class ExpressionParser(object):
         else:
             p[0] = Conditional(p[1], p[3], p[5])
 
+    @passes_value
     def p_conditional_expression_not_name(self, p):
         '''conditional_expression_not_name : conditional_or_expression_not_name
                                            | conditional_or_expression_not_name '?' expression ':' conditional_expression
@@ -160,67 +228,79 @@ class ExpressionParser(object):
         else:
             p[0] = ctor(p[2], p[1], p[3])
 
+    @passes_value
     def p_conditional_or_expression(self, p):
         '''conditional_or_expression : conditional_and_expression
                                      | conditional_or_expression OR conditional_and_expression'''
         self.binop(p, ConditionalOr)
 
+    @passes_value
     def p_conditional_or_expression_not_name(self, p):
         '''conditional_or_expression_not_name : conditional_and_expression_not_name
                                               | conditional_or_expression_not_name OR conditional_and_expression
                                               | name OR conditional_and_expression'''
         self.binop(p, ConditionalOr)
 
+    @passes_value
     def p_conditional_and_expression(self, p):
         '''conditional_and_expression : inclusive_or_expression
                                       | conditional_and_expression AND inclusive_or_expression'''
         self.binop(p, ConditionalAnd)
 
+    @passes_value
     def p_conditional_and_expression_not_name(self, p):
         '''conditional_and_expression_not_name : inclusive_or_expression_not_name
                                                | conditional_and_expression_not_name AND inclusive_or_expression
                                                | name AND inclusive_or_expression'''
         self.binop(p, ConditionalAnd)
 
+    @passes_value
     def p_inclusive_or_expression(self, p):
         '''inclusive_or_expression : exclusive_or_expression
                                    | inclusive_or_expression '|' exclusive_or_expression'''
         self.binop(p, Or)
 
+    @passes_value
     def p_inclusive_or_expression_not_name(self, p):
         '''inclusive_or_expression_not_name : exclusive_or_expression_not_name
                                             | inclusive_or_expression_not_name '|' exclusive_or_expression
                                             | name '|' exclusive_or_expression'''
         self.binop(p, Or)
 
+    @passes_value
     def p_exclusive_or_expression(self, p):
         '''exclusive_or_expression : and_expression
                                    | exclusive_or_expression '^' and_expression'''
         self.binop(p, Xor)
 
+    @passes_value
     def p_exclusive_or_expression_not_name(self, p):
         '''exclusive_or_expression_not_name : and_expression_not_name
                                             | exclusive_or_expression_not_name '^' and_expression
                                             | name '^' and_expression'''
         self.binop(p, Xor)
 
+    @passes_value
     def p_and_expression(self, p):
         '''and_expression : equality_expression
                           | and_expression '&' equality_expression'''
         self.binop(p, And)
 
+    @passes_value
     def p_and_expression_not_name(self, p):
         '''and_expression_not_name : equality_expression_not_name
                                    | and_expression_not_name '&' equality_expression
                                    | name '&' equality_expression'''
         self.binop(p, And)
 
+    @passes_value
     def p_equality_expression(self, p):
         '''equality_expression : instanceof_expression
                                | equality_expression EQ instanceof_expression
                                | equality_expression NEQ instanceof_expression'''
         self.binop(p, Equality)
 
+    @passes_value
     def p_equality_expression_not_name(self, p):
         '''equality_expression_not_name : instanceof_expression_not_name
                                         | equality_expression_not_name EQ instanceof_expression
@@ -229,17 +309,20 @@ class ExpressionParser(object):
                                         | name NEQ instanceof_expression'''
         self.binop(p, Equality)
 
+    @passes_value
     def p_instanceof_expression(self, p):
         '''instanceof_expression : relational_expression
                                  | instanceof_expression INSTANCEOF reference_type'''
         self.binop(p, InstanceOf)
 
+    @passes_value
     def p_instanceof_expression_not_name(self, p):
         '''instanceof_expression_not_name : relational_expression_not_name
                                           | name INSTANCEOF reference_type
                                           | instanceof_expression_not_name INSTANCEOF reference_type'''
         self.binop(p, InstanceOf)
 
+    @passes_value
     def p_relational_expression(self, p):
         '''relational_expression : shift_expression
                                  | relational_expression '>' shift_expression
@@ -248,6 +331,7 @@ class ExpressionParser(object):
                                  | relational_expression LTEQ shift_expression'''
         self.binop(p, Relational)
 
+    @passes_value
     def p_relational_expression_not_name(self, p):
         '''relational_expression_not_name : shift_expression_not_name
                                           | shift_expression_not_name '<' shift_expression
@@ -260,6 +344,7 @@ class ExpressionParser(object):
                                           | name LTEQ shift_expression'''
         self.binop(p, Relational)
 
+    @passes_value
     def p_shift_expression(self, p):
         '''shift_expression : additive_expression
                             | shift_expression LSHIFT additive_expression
@@ -267,6 +352,7 @@ class ExpressionParser(object):
                             | shift_expression RRSHIFT additive_expression'''
         self.binop(p, Shift)
 
+    @passes_value
     def p_shift_expression_not_name(self, p):
         '''shift_expression_not_name : additive_expression_not_name
                                      | shift_expression_not_name LSHIFT additive_expression
@@ -277,12 +363,14 @@ class ExpressionParser(object):
                                      | name RRSHIFT additive_expression'''
         self.binop(p, Shift)
 
+    @passes_value
     def p_additive_expression(self, p):
         '''additive_expression : multiplicative_expression
                                | additive_expression '+' multiplicative_expression
                                | additive_expression '-' multiplicative_expression'''
         self.binop(p, Additive)
 
+    @passes_value
     def p_additive_expression_not_name(self, p):
         '''additive_expression_not_name : multiplicative_expression_not_name
                                         | additive_expression_not_name '+' multiplicative_expression
@@ -291,6 +379,7 @@ class ExpressionParser(object):
                                         | name '-' multiplicative_expression'''
         self.binop(p, Additive)
 
+    @passes_value
     def p_multiplicative_expression(self, p):
         '''multiplicative_expression : unary_expression
                                      | multiplicative_expression '*' unary_expression
@@ -298,6 +387,7 @@ class ExpressionParser(object):
                                      | multiplicative_expression '%' unary_expression'''
         self.binop(p, Multiplicative)
 
+    @passes_value
     def p_multiplicative_expression_not_name(self, p):
         '''multiplicative_expression_not_name : unary_expression_not_name
                                               | multiplicative_expression_not_name '*' unary_expression
@@ -308,6 +398,7 @@ class ExpressionParser(object):
                                               | name '%' unary_expression'''
         self.binop(p, Multiplicative)
 
+    @passes_value
     def p_unary_expression(self, p):
         '''unary_expression : pre_increment_expression
                             | pre_decrement_expression
@@ -319,6 +410,7 @@ class ExpressionParser(object):
         else:
             p[0] = Unary(p[1], p[2])
 
+    @passes_value
     def p_unary_expression_not_name(self, p):
         '''unary_expression_not_name : pre_increment_expression
                                      | pre_decrement_expression
@@ -338,6 +430,7 @@ class ExpressionParser(object):
         '''pre_decrement_expression : MINUSMINUS unary_expression'''
         p[0] = Unary('--x', p[2])
 
+    @passes_value
     def p_unary_expression_not_plus_minus(self, p):
         '''unary_expression_not_plus_minus : postfix_expression
                                            | '~' unary_expression
@@ -348,6 +441,7 @@ class ExpressionParser(object):
         else:
             p[0] = Unary(p[1], p[2])
 
+    @passes_value
     def p_unary_expression_not_plus_minus_not_name(self, p):
         '''unary_expression_not_plus_minus_not_name : postfix_expression_not_name
                                                     | '~' unary_expression
@@ -358,6 +452,7 @@ class ExpressionParser(object):
         else:
             p[0] = Unary(p[1], p[2])
 
+    @passes_value
     def p_postfix_expression(self, p):
         '''postfix_expression : primary
                               | name
@@ -365,6 +460,7 @@ class ExpressionParser(object):
                               | post_decrement_expression'''
         p[0] = p[1]
 
+    @passes_value
     def p_postfix_expression_not_name(self, p):
         '''postfix_expression_not_name : primary
                                        | post_increment_expression
@@ -379,12 +475,14 @@ class ExpressionParser(object):
         '''post_decrement_expression : postfix_expression MINUSMINUS'''
         p[0] = Unary('x--', p[1])
 
+    @passes_value
     def p_primary(self, p):
         '''primary : primary_no_new_array
                    | array_creation_with_array_initializer
                    | array_creation_without_array_initializer'''
         p[0] = p[1]
 
+    @passes_value
     def p_primary_no_new_array(self, p):
         '''primary_no_new_array : literal
                                 | THIS
@@ -405,16 +503,18 @@ class ExpressionParser(object):
         p[1].append_name(p[3])
         p[0] = p[1]
 
+    @records_spans
     def p_primary_no_new_array4(self, p):
         '''primary_no_new_array : name '.' CLASS
                                 | name dims '.' CLASS
                                 | primitive_type dims '.' CLASS
                                 | primitive_type '.' CLASS'''
         if len(p) == 4:
-            p[0] = ClassLiteral(Type(p[1]))
+            p[0] = ClassLiteral(record_span(p, Type(p[1]), 1))
         else:
-            p[0] = ClassLiteral(Type(p[1], dimensions=p[2]))
+            p[0] = ClassLiteral(record_span(p, Type(p[1], dimensions=p[2]), 1, 2))
 
+    @passes_value
     def p_dims_opt(self, p):
         '''dims_opt : dims'''
         p[0] = p[1]
@@ -423,6 +523,7 @@ class ExpressionParser(object):
         '''dims_opt : empty'''
         p[0] = 0
 
+    @passes_value
     def p_dims(self, p):
         '''dims : dims_loop'''
         p[0] = p[1]
@@ -439,29 +540,34 @@ class ExpressionParser(object):
         '''one_dim_loop : '[' ']' '''
         # ignore
 
+    @records_spans
     def p_cast_expression(self, p):
         '''cast_expression : '(' primitive_type dims_opt ')' unary_expression'''
-        p[0] = Cast(Type(p[2], dimensions=p[3]), p[5])
+        p[0] = Cast(record_span(p, Type(p[2], dimensions=p[3]), 2, 3), p[5])
 
+    @records_spans
     def p_cast_expression2(self, p):
         '''cast_expression : '(' name type_arguments dims_opt ')' unary_expression_not_plus_minus'''
-        p[0] = Cast(Type(p[2], type_arguments=p[3], dimensions=p[4]), p[6])
+        p[0] = Cast(record_span(p, Type(p[2], type_arguments=p[3], dimensions=p[4]), 2, 4), p[6])
 
+    @records_spans
     def p_cast_expression3(self, p):
         '''cast_expression : '(' name type_arguments '.' class_or_interface_type dims_opt ')' unary_expression_not_plus_minus'''
         p[5].dimensions = p[6]
-        p[5].enclosed_in = Type(p[2], type_arguments=p[3])
+        p[5].enclosed_in = record_span(p, Type(p[2], type_arguments=p[3]), 2, 3)
         p[0] = Cast(p[5], p[8])
 
+    @records_spans
     def p_cast_expression4(self, p):
         '''cast_expression : '(' name ')' unary_expression_not_plus_minus'''
         # technically it's not necessarily a type but could be a type parameter
-        p[0] = Cast(Type(p[2]), p[4])
+        p[0] = Cast(record_span(p, Type(p[2]), 2), p[4])
 
+    @records_spans
     def p_cast_expression5(self, p):
         '''cast_expression : '(' name dims ')' unary_expression_not_plus_minus'''
         # technically it's not necessarily a type but could be a type parameter
-        p[0] = Cast(Type(p[2], dimensions=p[3]), p[5])
+        p[0] = Cast(record_span(p, Type(p[2], dimensions=p[3]), 2, 3), p[5])
 
 class StatementParser(object):
 
@@ -469,6 +575,7 @@ class StatementParser(object):
         '''block : '{' block_statements_opt '}' '''
         p[0] = Block(p[2])
 
+    @passes_value
     def p_block_statements_opt(self, p):
         '''block_statements_opt : block_statements'''
         p[0] = p[1]
@@ -483,8 +590,10 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
+    @passes_value
     def p_block_statement(self, p):
         '''block_statement : local_variable_declaration_statement
                            | statement
@@ -512,7 +621,8 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_variable_declarator(self, p):
         '''variable_declarator : variable_declarator_id
@@ -526,11 +636,13 @@ class StatementParser(object):
         '''variable_declarator_id : NAME dims_opt'''
         p[0] = Variable(p[1], dimensions=p[2])
 
+    @passes_value
     def p_variable_initializer(self, p):
         '''variable_initializer : expression
                                 | array_initializer'''
         p[0] = p[1]
 
+    @passes_value
     def p_statement(self, p):
         '''statement : statement_without_trailing_substatement
                      | labeled_statement
@@ -541,6 +653,7 @@ class StatementParser(object):
                      | enhanced_for_statement'''
         p[0] = p[1]
 
+    @passes_value
     def p_statement_without_trailing_substatement(self, p):
         '''statement_without_trailing_substatement : block
                                                    | expression_statement
@@ -557,6 +670,7 @@ class StatementParser(object):
                                                    | try_statement_with_resources'''
         p[0] = p[1]
 
+    @passes_value
     def p_expression_statement(self, p):
         '''expression_statement : statement_expression ';'
                                 | explicit_constructor_invocation'''
@@ -565,6 +679,7 @@ class StatementParser(object):
         else:
             p[0] = ExpressionStatement(p[1])
 
+    @passes_value
     def p_statement_expression(self, p):
         '''statement_expression : assignment
                                 | pre_increment_expression
@@ -595,28 +710,24 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_method_invocation(self, p):
         '''method_invocation : NAME '(' argument_list_opt ')' '''
-        p[0] = MethodInvocation(p[1], arguments=p[3], startLine=p.lineno(1),
-                                startLexPos=p.lexpos(1), endLine=p.lineno(4),
-                                endLexPos=p.lexpos(4))
+        p[0] = MethodInvocation(p[1], arguments=p[3])
 
     def p_method_invocation2(self, p):
         '''method_invocation : name '.' type_arguments NAME '(' argument_list_opt ')'
                              | primary '.' type_arguments NAME '(' argument_list_opt ')'
                              | SUPER '.' type_arguments NAME '(' argument_list_opt ')' '''
-        p[0] = MethodInvocation(p[4], target=p[1], type_arguments=p[3], arguments=p[6],
-                                startLine=p.lineno(4), startLexPos=p.lexpos(4),
-                                endLine=p.lineno(7), endLexPos=p.lexpos(7))
+        p[0] = MethodInvocation(p[4], target=p[1], type_arguments=p[3], arguments=p[6])
 
     def p_method_invocation3(self, p):
         '''method_invocation : name '.' NAME '(' argument_list_opt ')'
                              | primary '.' NAME '(' argument_list_opt ')'
                              | SUPER '.' NAME '(' argument_list_opt ')' '''
-        p[0] = MethodInvocation(p[3], target=p[1], arguments=p[5], startLine=p.lineno(3),
-                                startLexPos=p.lexpos(3), endLine=p.lineno(6), endLexPos=p.lexpos(6))
+        p[0] = MethodInvocation(p[3], target=p[1], arguments=p[5])
 
     def p_labeled_statement(self, p):
         '''labeled_statement : label ':' statement'''
@@ -628,6 +739,7 @@ class StatementParser(object):
         p[3].label = p[1]
         p[0] = p[3]
 
+    @passes_value
     def p_label(self, p):
         '''label : NAME'''
         p[0] = p[1]
@@ -660,11 +772,13 @@ class StatementParser(object):
         '''for_statement_no_short_if : FOR '(' for_init_opt ';' expression_opt ';' for_update_opt ')' statement_no_short_if'''
         p[0] = For(p[3], p[5], p[7], p[9])
 
+    @passes_value
     def p_for_init_opt(self, p):
         '''for_init_opt : for_init
                         | empty'''
         p[0] = p[1]
 
+    @passes_value
     def p_for_init(self, p):
         '''for_init : statement_expression_list
                     | local_variable_declaration'''
@@ -676,18 +790,22 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_expression_opt(self, p):
         '''expression_opt : expression
                           | empty'''
         p[0] = p[1]
 
+    @passes_value
     def p_for_update_opt(self, p):
         '''for_update_opt : for_update
                           | empty'''
         p[0] = p[1]
 
+    @passes_value
     def p_for_update(self, p):
         '''for_update : statement_expression_list'''
         p[0] = p[1]
@@ -705,14 +823,19 @@ class StatementParser(object):
         p[1]['iterable'] = p[3]
         p[0] = p[1]
 
+    @records_spans
     def p_enhanced_for_statement_header_init(self, p):
         '''enhanced_for_statement_header_init : FOR '(' type NAME dims_opt'''
-        p[0] = {'modifiers': [], 'type': p[3], 'variable': Variable(p[4], dimensions=p[5])}
+        p[0] = {'modifiers': [], 'type': p[3],
+                'variable': record_span(p, Variable(p[4], dimensions=p[5]), 4, 5)}
 
+    @records_spans
     def p_enhanced_for_statement_header_init2(self, p):
         '''enhanced_for_statement_header_init : FOR '(' modifiers type NAME dims_opt'''
-        p[0] = {'modifiers': p[3], 'type': p[4], 'variable': Variable(p[5], dimensions=p[6])}
+        p[0] = {'modifiers': p[3], 'type': p[4],
+                'variable': record_span(p, Variable(p[5], dimensions=p[6]), 5, 6)}
 
+    @passes_value
     def p_statement_no_short_if(self, p):
         '''statement_no_short_if : statement_without_trailing_substatement
                                  | labeled_statement_no_short_if
@@ -746,13 +869,16 @@ class StatementParser(object):
         '''switch_block : '{' switch_block_statements '}' '''
         p[0] = p[2]
 
+    @records_spans
     def p_switch_block3(self, p):
         '''switch_block : '{' switch_labels '}' '''
-        p[0] = [SwitchCase(p[2])]
+        p[0] = [record_span(p, SwitchCase(p[2]), 2)]
 
+    @records_spans
     def p_switch_block4(self, p):
         '''switch_block : '{' switch_block_statements switch_labels '}' '''
-        p[0] = p[2] + [SwitchCase(p[3])]
+        p[2].append(record_span(p, SwitchCase(p[3]), 3))
+        p[0] = p[2]
 
     def p_switch_block_statements(self, p):
         '''switch_block_statements : switch_block_statement
@@ -760,7 +886,8 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
     def p_switch_block_statement(self, p):
         '''switch_block_statement : switch_labels block_statements'''
@@ -772,7 +899,8 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
     def p_switch_label(self, p):
         '''switch_label : CASE constant_expression ':'
@@ -782,6 +910,7 @@ class StatementParser(object):
         else:
             p[0] = p[2]
 
+    @passes_value
     def p_constant_expression(self, p):
         '''constant_expression : expression'''
         p[0] = p[1]
@@ -826,6 +955,7 @@ class StatementParser(object):
         else:
             p[0] = Try(p[2], catches=p[3], _finally=p[4])
 
+    @passes_value
     def p_try_block(self, p):
         '''try_block : block'''
         p[0] = p[1]
@@ -836,8 +966,10 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
+    @passes_value
     def p_catches_opt(self, p):
         '''catches_opt : catches'''
         p[0] = p[1]
@@ -854,6 +986,7 @@ class StatementParser(object):
         '''catch_formal_parameter : modifiers_opt catch_type variable_declarator_id'''
         p[0] = {'modifiers': p[1], 'types': p[2], 'variable': p[3]}
 
+    @passes_value
     def p_catch_type(self, p):
         '''catch_type : union_type'''
         p[0] = p[1]
@@ -864,7 +997,8 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_try_statement_with_resources(self, p):
         '''try_statement_with_resources : TRY resource_specification try_block catches_opt
@@ -889,7 +1023,8 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_trailing_semicolon(self, p):
         '''trailing_semicolon : ';' '''
@@ -959,6 +1094,7 @@ class StatementParser(object):
         '''class_instance_creation_expression_name : name '.' '''
         p[0] = p[1]
 
+    @passes_value
     def p_class_body_opt(self, p):
         '''class_body_opt : class_body
                           | empty'''
@@ -986,7 +1122,8 @@ class StatementParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
     def p_dim_with_or_without_expr(self, p):
         '''dim_with_or_without_expr : '[' expression ']'
@@ -1003,6 +1140,7 @@ class StatementParser(object):
 
 class NameParser(object):
 
+    @passes_value
     def p_name(self, p):
         '''name : simple_name
                 | qualified_name'''
@@ -1030,6 +1168,7 @@ class LiteralParser(object):
 
 class TypeParser(object):
 
+    @passes_value
     def p_modifiers_opt(self, p):
         '''modifiers_opt : modifiers'''
         p[0] = p[1]
@@ -1044,8 +1183,10 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
+    @passes_value
     def p_modifier(self, p):
         '''modifier : PUBLIC
                     | PROTECTED
@@ -1061,11 +1202,13 @@ class TypeParser(object):
                     | annotation'''
         p[0] = p[1]
 
+    @passes_value
     def p_type(self, p):
         '''type : primitive_type
                 | reference_type'''
         p[0] = p[1]
 
+    @passes_value
     def p_primitive_type(self, p):
         '''primitive_type : BOOLEAN
                           | VOID
@@ -1078,16 +1221,19 @@ class TypeParser(object):
                           | DOUBLE'''
         p[0] = p[1]
 
+    @passes_value
     def p_reference_type(self, p):
         '''reference_type : class_or_interface_type
                           | array_type'''
         p[0] = p[1]
 
+    @passes_value
     def p_class_or_interface_type(self, p):
         '''class_or_interface_type : class_or_interface
                                    | generic_type'''
         p[0] = p[1]
 
+    @passes_value
     def p_class_type(self, p):
         '''class_type : class_or_interface_type'''
         p[0] = p[1]
@@ -1144,7 +1290,8 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_type_argument_list(self, p):
         '''type_argument_list : type_argument
@@ -1152,13 +1299,16 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_type_argument(self, p):
         '''type_argument : reference_type
                          | wildcard'''
         p[0] = p[1]
 
+    @passes_value
     def p_type_argument1(self, p):
         '''type_argument1 : reference_type1
                           | wildcard1'''
@@ -1179,8 +1329,10 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_type_argument2(self, p):
         '''type_argument2 : reference_type2
                           | wildcard2'''
@@ -1201,8 +1353,10 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_type_argument3(self, p):
         '''type_argument3 : reference_type3
                           | wildcard3'''
@@ -1276,6 +1430,7 @@ class TypeParser(object):
         else:
             p[0] = WildcardBound(p[2], _super=True)
 
+    @passes_value
     def p_type_parameter_header(self, p):
         '''type_parameter_header : NAME'''
         p[0] = p[1]
@@ -1290,7 +1445,8 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_type_parameter(self, p):
         '''type_parameter : type_parameter_header
@@ -1309,7 +1465,8 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
     def p_additional_bound(self, p):
         '''additional_bound : '&' reference_type'''
@@ -1321,7 +1478,8 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_type_parameter1(self, p):
         '''type_parameter1 : type_parameter_header '>'
@@ -1340,7 +1498,8 @@ class TypeParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
     def p_additional_bound1(self, p):
         '''additional_bound1 : '&' reference_type1'''
@@ -1348,6 +1507,7 @@ class TypeParser(object):
 
 class ClassParser(object):
 
+    @passes_value
     def p_type_declaration(self, p):
         '''type_declaration : class_declaration
                             | interface_declaration
@@ -1384,6 +1544,7 @@ class ClassParser(object):
         '''class_header_name1 : modifiers_opt CLASS NAME'''
         p[0] = {'modifiers': p[1], 'name': p[3]}
 
+    @passes_value
     def p_class_header_extends_opt(self, p):
         '''class_header_extends_opt : class_header_extends
                                     | empty'''
@@ -1393,6 +1554,7 @@ class ClassParser(object):
         '''class_header_extends : EXTENDS class_type'''
         p[0] = p[2]
 
+    @passes_value
     def p_class_header_implements_opt(self, p):
         '''class_header_implements_opt : class_header_implements
                                        | empty'''
@@ -1408,8 +1570,10 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_interface_type(self, p):
         '''interface_type : class_or_interface_type'''
         p[0] = p[1]
@@ -1418,6 +1582,7 @@ class ClassParser(object):
         '''class_body : '{' class_body_declarations_opt '}' '''
         p[0] = p[2]
 
+    @passes_value
     def p_class_body_declarations_opt(self, p):
         '''class_body_declarations_opt : class_body_declarations'''
         p[0] = p[1]
@@ -1432,8 +1597,10 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
+    @passes_value
     def p_class_body_declaration(self, p):
         '''class_body_declaration : class_member_declaration
                                   | static_initializer
@@ -1444,6 +1611,7 @@ class ClassParser(object):
         '''class_body_declaration : block'''
         p[0] = ClassInitializer(p[1])
 
+    @passes_value
     def p_class_member_declaration(self, p):
         '''class_member_declaration : field_declaration
                                     | class_declaration
@@ -1485,6 +1653,7 @@ class ClassParser(object):
         else:
             p[0] = {'modifiers': p[1], 'type_parameters': p[2], 'name': p[3]}
 
+    @passes_value
     def p_formal_parameter_list_opt(self, p):
         '''formal_parameter_list_opt : formal_parameter_list'''
         p[0] = p[1]
@@ -1499,7 +1668,8 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_formal_parameter(self, p):
         '''formal_parameter : modifiers_opt type variable_declarator_id
@@ -1509,6 +1679,7 @@ class ClassParser(object):
         else:
             p[0] = FormalParameter(p[4], p[2], modifiers=p[1], vararg=True)
 
+    @passes_value
     def p_method_header_throws_clause_opt(self, p):
         '''method_header_throws_clause_opt : method_header_throws_clause
                                            | empty'''
@@ -1524,8 +1695,10 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_class_type_elt(self, p):
         '''class_type_elt : class_type'''
         p[0] = p[1]
@@ -1534,6 +1707,7 @@ class ClassParser(object):
         '''method_body : '{' block_statements_opt '}' '''
         p[0] = p[2]
 
+    @passes_value
     def p_method_declaration(self, p):
         '''method_declaration : abstract_method_declaration
                               | method_header method_body'''
@@ -1567,6 +1741,7 @@ class ClassParser(object):
         else:
             p[0] = {'modifiers': p[1], 'type_parameters': p[2], 'type': p[3], 'name': p[4]}
 
+    @passes_value
     def p_method_header_extended_dims(self, p):
         '''method_header_extended_dims : dims_opt'''
         p[0] = p[1]
@@ -1596,6 +1771,7 @@ class ClassParser(object):
         '''interface_header_name1 : modifiers_opt INTERFACE NAME'''
         p[0] = {'modifiers': p[1], 'name': p[3]}
 
+    @passes_value
     def p_interface_header_extends_opt(self, p):
         '''interface_header_extends_opt : interface_header_extends'''
         p[0] = p[1]
@@ -1612,6 +1788,7 @@ class ClassParser(object):
         '''interface_body : '{' interface_member_declarations_opt '}' '''
         p[0] = p[2]
 
+    @passes_value
     def p_interface_member_declarations_opt(self, p):
         '''interface_member_declarations_opt : interface_member_declarations'''
         p[0] = p[1]
@@ -1626,8 +1803,10 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
+    @passes_value
     def p_interface_member_declaration(self, p):
         '''interface_member_declaration : constant_declaration
                                         | abstract_method_declaration
@@ -1641,6 +1820,7 @@ class ClassParser(object):
         '''interface_member_declaration : ';' '''
         p[0] = EmptyDeclaration()
 
+    @passes_value
     def p_constant_declaration(self, p):
         '''constant_declaration : field_declaration'''
         p[0] = p[1]
@@ -1686,7 +1866,8 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_enum_constant(self, p):
         '''enum_constant : enum_constant_header class_body
@@ -1705,6 +1886,7 @@ class ClassParser(object):
         '''enum_constant_header_name : modifiers_opt NAME'''
         p[0] = {'modifiers': p[1], 'name': p[2]}
 
+    @passes_value
     def p_arguments_opt(self, p):
         '''arguments_opt : arguments'''
         p[0] = p[1]
@@ -1717,6 +1899,7 @@ class ClassParser(object):
         '''arguments : '(' argument_list_opt ')' '''
         p[0] = p[2]
 
+    @passes_value
     def p_argument_list_opt(self, p):
         '''argument_list_opt : argument_list'''
         p[0] = p[1]
@@ -1729,10 +1912,12 @@ class ClassParser(object):
         '''argument_list : expression
                          | argument_list ',' expression'''
         if len(p) == 2:
-            p[0] = [{'commaLexPos': None, 'startLexPos': p.lexspan(1)[0], 'value': p[1]}]
+            p[0] = [p[1]]
         else:
-            p[0] = p[1] + [{'commaLexPos': p.lexpos(2), 'startLexPos': p.lexspan(3)[0], 'value':p[3]}]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_enum_body_declarations_opt(self, p):
         '''enum_body_declarations_opt : enum_declarations'''
         p[0] = p[1]
@@ -1778,6 +1963,7 @@ class ClassParser(object):
         '''annotation_type_body : '{' annotation_type_member_declarations_opt '}' '''
         p[0] = p[2]
 
+    @passes_value
     def p_annotation_type_member_declarations_opt(self, p):
         '''annotation_type_member_declarations_opt : annotation_type_member_declarations'''
         p[0] = p[1]
@@ -1792,8 +1978,10 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
+    @passes_value
     def p_annotation_type_member_declaration(self, p):
         '''annotation_type_member_declaration : annotation_method_header ';'
                                               | constant_declaration
@@ -1816,6 +2004,7 @@ class ClassParser(object):
         else:
             p[0] = {'modifiers': p[1], 'type_parameters': p[2], 'type': p[3], 'name': p[4]}
 
+    @passes_value
     def p_annotation_method_header_default_value_opt(self, p):
         '''annotation_method_header_default_value_opt : default_value
                                                       | empty'''
@@ -1825,6 +2014,7 @@ class ClassParser(object):
         '''default_value : DEFAULT member_value'''
         p[0] = p[2]
 
+    @passes_value
     def p_member_value(self, p):
         '''member_value : conditional_expression_not_name
                         | name
@@ -1848,8 +2038,10 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
+    @passes_value
     def p_annotation(self, p):
         '''annotation : normal_annotation
                       | marker_annotation
@@ -1864,6 +2056,7 @@ class ClassParser(object):
         '''annotation_name : '@' name'''
         p[0] = p[2]
 
+    @passes_value
     def p_member_value_pairs_opt(self, p):
         '''member_value_pairs_opt : member_value_pairs'''
         p[0] = p[1]
@@ -1878,7 +2071,8 @@ class ClassParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[3]]
+            p[1].append(p[3])
+            p[0] = p[1]
 
     def p_member_value_pair(self, p):
         '''member_value_pair : simple_name '=' member_value'''
@@ -1892,6 +2086,7 @@ class ClassParser(object):
         '''single_member_annotation : annotation_name '(' single_member_annotation_member_value ')' '''
         p[0] = Annotation(p[1], single_member=p[3])
 
+    @passes_value
     def p_single_member_annotation_member_value(self, p):
         '''single_member_annotation_member_value : member_value'''
         p[0] = p[1]
@@ -1951,8 +2146,10 @@ class CompilationUnitParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
+    @passes_value
     def p_import_declaration(self, p):
         '''import_declaration : single_type_import_declaration
                               | type_import_on_demand_declaration
@@ -1982,22 +2179,35 @@ class CompilationUnitParser(object):
         if len(p) == 2:
             p[0] = [p[1]]
         else:
-            p[0] = p[1] + [p[2]]
+            p[1].append(p[2])
+            p[0] = p[1]
 
 class MyParser(ExpressionParser, NameParser, LiteralParser, TypeParser, ClassParser, StatementParser, CompilationUnitParser):
 
     tokens = MyLexer.tokens
 
     def p_goal_compilation_unit(self, p):
-        '''goal : PLUSPLUS compilation_unit'''
+        '''goal : GOAL_COMPILATION_UNIT compilation_unit'''
         p[0] = p[2]
 
     def p_goal_expression(self, p):
-        '''goal : MINUSMINUS expression'''
+        '''goal : GOAL_EXPRESSION expression'''
         p[0] = p[2]
 
     def p_goal_statement(self, p):
-        '''goal : '*' block_statement'''
+        '''goal : GOAL_STATEMENT block_statement'''
+        p[0] = p[2]
+
+    def p_goal_type(self, p):
+        '''goal : GOAL_TYPE type'''
+        p[0] = p[2]
+
+    def p_goal_class_body(self, p):
+        '''goal : GOAL_CLASS_BODY class_body_declarations_opt'''
+        p[0] = p[2]
+
+    def p_goal_block(self, p):
+        '''goal : GOAL_BLOCK block'''
         p[0] = p[2]
 
     def p_error(self, p):
@@ -2006,45 +2216,382 @@ class MyParser(ExpressionParser, NameParser, LiteralParser, TypeParser, ClassPar
     def p_empty(self, p):
         '''empty :'''
 
-class Parser(object):
+class Grammar(object):
+    '''
+    The immutable part of a parser: the compiled token rules and the LR
+    tables bound to the grammar actions. It is built once per process and
+    shared by all Parser instances, see shared_grammar().
+    '''
+
+    def __init__(self, table_cache=None):
+        parser_module = MyParser()
+        _tables = tables.load_tables(MyLexer(), parser_module, START, table_cache)
+        self.lexicon = scanner.Lexicon(MyLexer)
+        compact = tables.CompactTables.from_dict(_tables['compact'])
+        names = [compact.nonterminals[lhs] for lhs in compact.prod_lhs]
+        action = _tables['parser']['action']
+        goto = _tables['parser']['goto']
+        recovery_states = [state for state, row in goto.items()
+                           if any(name in row for name in RECOVERY_RULES)]
+        finished_states = [row[name] for row in goto.values()
+                           for name in RECOVERY_RULES if name in row]
+        # the bodies of methods and constructors and the blocks of
+        # initializers, i.e. of blocks that start a class body declaration or
+        # follow its 'static'
+        body_states = dict((state, 'method_body') for state, row in goto.items()
+                           if 'method_body' in row)
+        for state, row in goto.items():
+            if 'class_body_declaration' in row:
+                for s in (state, action[state].get('STATIC', 0)):
+                    if s > 0 and 'block' in goto.get(s, ()):
+                        body_states[s] = 'block'
+        self.engine = Engine(compact, parser_module, self.lexicon.texts,
+                             [CLOSING_LEVELS.get(name, 0) for name in names],
+                             [name not in NO_GROWTH for name in names],
+                             recovery_states,
+                             dict((state, compact.nonterminal_ids[name])
+                                  for state, name in body_states.items()),
+                             SHARED_CLASSES, MUTATING_ACTIONS, finished_states)
+
+    def new_lexer(self):
+        return scanner.Scanner(self.lexicon)
+
+# The generic type rules that parse the closing '>' of type arguments, the
+# digit says how many '>' beyond the node they build their symbol covers
+CLOSING_LEVELS = dict(('{}{}'.format(name, level), level)
+                      for name in ('reference_type', 'type_argument', 'type_argument_list',
+                                   'type_parameter', 'type_parameter_list', 'wildcard',
+                                   'wildcard_bounds', 'additional_bound', 'additional_bound_list')
+                      for level in (1, 2, 3))
+
+# rules that pass on their first symbol without it growing into the rest
+NO_GROWTH = frozenset(['class_instance_creation_expression_name'])
+
+# the nodes a parse can share between all places they occur in (see
+# Parser.parse()); they are not changed once they are part of another node
+SHARED_CLASSES = (Name, Type, Wildcard, WildcardBound, TypeParameter)
+
+# the actions that change a node among their symbols, by the positions of
+# these symbols; the nodes there are not shared before the change
+MUTATING_ACTIONS = {
+    'p_primary_no_new_array3': (1,),
+    'p_cast_expression3': (5,),
+    'p_labeled_statement': (3,),
+    'p_labeled_statement_no_short_if': (3,),
+    'p_qualified_name': (1,),
+    'p_generic_type': (1,),
+    'p_array_type2': (1,),
+    'p_reference_type1': (1,),
+    'p_reference_type2': (1,),
+}
+
+# the error recovery drops the innermost of these that contains an error
+RECOVERY_RULES = ('block_statement', 'class_body_declaration', 'interface_member_declaration',
+                  'annotation_type_member_declaration', 'import_declaration', 'type_declaration')
+
+_grammar = None
+_grammar_lock = threading.Lock()
+
+def shared_grammar(table_cache=None):
+    '''
+    Returns the process-wide Grammar, building it on first use. table_cache
+    is the directory for cached tables (see plyj.tables); it only has an
+    effect on the call that builds the grammar.
+    '''
+    global _grammar
+    if _grammar is None:
+        with _grammar_lock:
+            if _grammar is None:
+                _grammar = Grammar(table_cache)
+    return _grammar
+
+class ParseResult(object):
+    '''
+    The outcome of Parser.parse(): the tree, the source it was parsed from and
+    the spans of its nodes. Spans are (start, end) offsets into source, end
+    is exclusive. Only the nodes tracked by the parse have spans.
+    diagnostics lists the plyj.errors.Diagnostics of a recovering parse.
+    options are the keyword arguments of the parse besides code and lineno,
+    Parser.reparse() parses with them again.
+    '''
+
+    def __init__(self, tree, source, spans, first_line=1, diagnostics=None, options=None):
+        self.tree = tree
+        self.source = source
+        self.spans = spans
+        self.first_line = first_line
+        self.diagnostics = diagnostics if diagnostics is not None else []
+        self.options = options if options is not None else {}
+        self._lines = None
+
+    @property
+    def lines(self):
+        '''plyj.lines.LineIndex of the source, built on first use.'''
+        if self._lines is None:
+            self._lines = LineIndex(self.source, self.first_line)
+        return self._lines
+
+    def span(self, node):
+        '''(start, end) of node or None if the node has no span.'''
+        return self.spans.get(node)
+
+    def text(self, node):
+        '''The exact source text of node.'''
+        start, end = self.spans[node]
+        return self.source[start:end]
+
+    def position(self, node):
+        '''The (line, column) positions of the start and end of node.'''
+        start, end = self.spans[node]
+        return self.lines.position(start), self.lines.position(end)
+
+
+# what Parser.parse() can parse and the token that starts the input for it;
+# a header is parsed as a compilation unit that ends before the first type
+GOALS = {
+    'compilation_unit': 'GOAL_COMPILATION_UNIT',
+    'expression': 'GOAL_EXPRESSION',
+    'statement': 'GOAL_STATEMENT',
+    'type': 'GOAL_TYPE',
+    'class_body': 'GOAL_CLASS_BODY',
+    'block': 'GOAL_BLOCK',
+    'header': 'GOAL_COMPILATION_UNIT',
+}
+
+# what Parser.parse() can do with the bodies of methods, constructors and
+# initializers
+BODIES = ('parse', 'skip', 'lazy')
+
+def header_end(tokens):
+    '''
+    The index of the first token of tokens (a plyj.scanner.TokenStream) after
+    the package and import declarations at its start.
+    '''
+    end = 0
+    i = 0
+    while i < len(tokens):
+        # a declaration ends at the first ';' outside of parentheses, the
+        # header at the first declaration that is no package or import
+        header = False
+        depth = 0
+        while i < len(tokens):
+            kind = tokens.kind(i)
+            i += 1
+            if kind in ('PACKAGE', 'IMPORT'):
+                header = True
+            elif kind == '(':
+                depth += 1
+            elif kind == ')':
+                depth -= 1
+            elif depth == 0 and kind in (';', '{'):
+                break
+        if not header or kind != ';':
+            break
+        end = i
+    return end
 
-    def __init__(self):
-        self.lexer = lex.lex(module=MyLexer(), optimize=1)
-        self.parser = yacc.yacc(module=MyParser(), start='goal', optimize=1)
-        self.prefix_length = 0
 
-    def tokenize_string(self, code):
-        self.lexer.input(code)
-        for token in self.lexer:
-            print(token)
+class Parser(object):
+    '''
+    Parses Java source. A Parser can be shared by any number of threads: the
+    grammar and the engine are read-only and every call scans with its own
+    Scanner, so no state is kept between calls. lexer is a Scanner for the
+    PLY style token() interface only; it is not used by the methods below.
+    '''
+
+    def __init__(self, table_cache=None):
+        self.grammar = shared_grammar(table_cache)
+        self.lexer = self.grammar.new_lexer()
+
+    def _scan(self, code, lineno, diagnostics=None, guard=None):
+        scanner = self.grammar.new_lexer()
+        scanner.lineno = lineno
+        scanner.diagnostics = diagnostics
+        return scanner.tokenize(code, guard)
+
+    def tokenize_string(self, code, lineno=1):
+        '''
+        Returns the tokens of code as a plyj.scanner.TokenStream: parallel
+        arrays of token kinds, start and end offsets and line numbers.
+        '''
+        return self._scan(code, lineno)
 
     def tokenize_file(self, _file):
         if type(_file) == str:
             _file = open(_file)
-        content = ''
-        for line in _file:
-            content += line
-        return self.tokenize_string(content)
+        return self.tokenize_string(_file.read())
 
     def parse_expression(self, code, debug=0, lineno=1):
-        return self.parse_string(code, debug, lineno, prefix='--')
+        return self.parse_string(code, debug, lineno, goal='expression')
 
     def parse_statement(self, code, debug=0, lineno=1):
-        return self.parse_string(code, debug, lineno, prefix='* ')
-
-    def parse_string(self, code, debug=0, lineno=1, prefix='++'):
-        self.lexer.lineno = lineno
-        self.prefix_length = len(prefix)
-        return self.parser.parse(prefix + code, lexer=self.lexer, debug=debug, tracking=True)
-
-    def parse_file(self, _file, debug=0):
+        return self.parse_string(code, debug, lineno, goal='statement')
+
+    def parse_type(self, code, debug=0, lineno=1):
+        '''Parses a type like int[] or Map<String, List<T>>.'''
+        return self.parse_string(code, debug, lineno, goal='type')
+
+    def parse_class_body(self, code, debug=0, lineno=1):
+        '''
+        Parses the declarations of a class body without the braces and
+        returns them as a list.
+        '''
+        return self.parse_string(code, debug, lineno, goal='class_body')
+
+    def parse_header(self, code, debug=0, lineno=1):
+        '''
+        Parses the package and import declarations of a compilation unit and
+        returns them as a CompilationUnit without type declarations. The
+        rest of the code is not parsed.
+        '''
+        return self.parse_string(code, debug, lineno, goal='header')
+
+    def parse_string(self, code, debug=0, lineno=1, goal='compilation_unit', limits=None,
+                     cancel=None, bodies='parse', strings=None, shared=None):
+        return self.parse(code, debug, lineno, goal, track=False, limits=limits, cancel=cancel,
+                          bodies=bodies, strings=strings, shared=shared).tree
+
+    def parse_signatures(self, code, lineno=1):
+        '''
+        Parses a compilation unit without the bodies of its methods,
+        constructors and initializers, see parse().
+        '''
+        return self.parse_string(code, lineno=lineno, bodies='skip')
+
+    def parse(self, code, debug=0, lineno=1, goal='compilation_unit', track=True, recover=False,
+              limits=None, cancel=None, bodies='parse', strings=None, shared=None):
+        '''
+        Parses code and returns a ParseResult with the tree and the spans of
+        its nodes. goal is one of the keys of GOALS. debug writes a trace of
+        the parse to stderr.
+
+        track selects the nodes whose spans are recorded: True for all nodes,
+        False for none (the fastest) or a class or tuple of classes for the
+        instances of these, e.g. (model.MethodInvocation,
+        model.MethodDeclaration).
+
+        Without recover the first syntax error is printed and the tree is
+        None, illegal characters are printed and skipped. With recover
+        nothing is printed, the errors are listed in the diagnostics of the
+        result and the parse goes on after each syntax error without the
+        statement or declaration it occurred in.
+
+        limits is a plyj.limits.Limits and cancel a
+        plyj.limits.CancellationToken; if either is given the parse raises a
+        plyj.errors.LimitExceeded or plyj.errors.Cancelled when it has to
+        stop.
+
+        bodies 'skip' leaves out the bodies of methods, constructors and
+        initializers: their tokens are only matched up to the closing brace
+        and the body in the tree is a model.UnparsedBody with its offsets.
+        bench/signatures.py measures this at about twice the speed of a full
+        parse of its corpus, for tools that only need declarations.
+        bodies 'lazy' skips them the same way but the body is a
+        model.LazyBody that is parsed from the tokens when the attribute is
+        first read, with the tracking, error handling, debug output, limits
+        and cancellation token of this call; the timeout of a body counts
+        from when it is read.
+
+        The text of names and literals is interned: equal texts in the tree
+        are one string, and so are equal lists of modifiers, which are
+        tuples. strings is the dict the text is interned in, by default a new
+        one for every call. Passing the same dict to the parses of a batch of
+        files shares the strings among all their trees; the dict keeps them
+        alive until it is dropped. It can be shared by threads.
+
+        shared, a dict, makes the parse hash-cons the nodes of the classes in
+        SHARED_CLASSES (names, types, wildcards and type parameters): equal
+        ones are a single node, the one already in shared, wherever they
+        occur. Pass a new dict to share within one tree or the same one to
+        share across the trees of a batch. The shared nodes must not be
+        changed. As a node then occurs in many places it has no span, so
+        track must be False.
+        '''
+        if bodies not in BODIES:
+            raise ValueError('bodies must be one of {}'.format(', '.join(BODIES)))
+        if shared is not None and track:
+            raise ValueError('shared nodes have no spans, track must be False')
+        if strings is None:
+            strings = {}
+        options = dict(debug=debug, goal=goal, track=track, recover=recover, limits=limits,
+                       cancel=cancel, bodies=bodies, strings=strings, shared=shared)
+        guard = Guard(limits, cancel) if limits is not None or cancel is not None else None
+        if track is True:
+            track = SourceElement
+        engine = self.grammar.engine
+        diagnostics = [] if recover else None
+        tokens = self._scan(code, lineno, diagnostics, guard)
+        end = header_end(tokens) if goal == 'header' else None
+        spans = SpanTable(classes=track or ())
+        tree = engine.parse(tokens, engine.compact.terminal_ids[GOALS[goal]],
+                            spans if track else None, sys.stderr if debug else None, end=end,
+                            diagnostics=diagnostics, guard=guard,
+                            bodies=self._bodies(bodies, tokens, spans if track else None,
+                                                sys.stderr if debug else None, diagnostics,
+                                                guard, strings, shared),
+                            strings=strings, shared=shared)
+        if diagnostics:
+            # scanner and parser diagnostics in source order
+            diagnostics.sort(key=lambda d: d.start)
+        return ParseResult(tree, code, spans, lineno, diagnostics, options)
+
+    def reparse(self, result, offset, removed, inserted):
+        '''
+        Returns the ParseResult of the source of result, a ParseResult of a
+        compilation unit with spans of all nodes, after removed characters at
+        offset have been replaced with the text inserted. Only the smallest
+        block, class member or type declaration around the edit is parsed
+        again, the rest of the tree is shared with result.tree, whose nodes
+        are not changed. The source is parsed with the options of result, and
+        the result equals that of parsing the new source with them.
+        '''
+        return incremental.reparse(self, result, offset, removed, inserted)
+
+    def _bodies(self, mode, tokens, spans, debug, diagnostics, guard, strings, shared):
+        '''
+        The function that makes the values of skipped bodies for the engine,
+        None if they are parsed.
+        '''
+        if mode == 'parse':
+            return None
+        starts = tokens.starts
+        ends = tokens.ends
+        if mode == 'skip':
+            return lambda first, last, lhs: UnparsedBody(starts[first], ends[last])
+        engine = self.grammar.engine
+        goal = engine.compact.terminal_ids[GOALS['block']]
+        method_body = engine.compact.nonterminal_ids['method_body']
+
+        def parse_body(first, last, statements):
+            block = engine.parse(tokens, goal, spans, debug, start=first, end=last + 1,
+                                 diagnostics=diagnostics,
+                                 guard=guard.restarted() if guard is not None else None,
+                                 bodies=lazy, strings=strings, shared=shared)
+            if statements and block is not None:
+                # method_body is a list of statements, not a Block
+                return block.statements
+            return block
+
+        lock = threading.Lock()
+
+        def lazy(first, last, lhs):
+            return LazyBody(starts[first], ends[last],
+                            functools.partial(parse_body, first, last, lhs == method_body), lock)
+        return lazy
+
+    def parse_file(self, _file, debug=0, limits=None, cancel=None, bodies='parse', strings=None,
+                   shared=None):
         if type(_file) == str:
             _file = open(_file)
         content = _file.read()
-        return self.parse_string(content, debug=debug)
+        return self.parse_string(content, debug=debug, limits=limits, cancel=cancel, bodies=bodies,
+                                 strings=strings, shared=shared)
 
 if __name__ == '__main__':
     # for testing
+    import ply.lex as lex
+    import ply.yacc as yacc
+
     lexer = lex.lex(module=MyLexer())
     parser = yacc.yacc(module=MyParser(), write_tables=0, start='type_parameters')
 
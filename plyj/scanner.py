@@ -0,0 +1,310 @@
+#!/usr/bin/env python2
+'''
+Hand written scanner for Java source.
+
+The token rules are the ones declared on plyj.parser.MyLexer, but instead of
+running them through PLY's generic lexer (one master regex whose callbacks
+are Python functions, keywords found by scanning a tuple) they are compiled
+into a single regex that skips any run of whitespace and comments and then
+matches one token. Keywords and operators are resolved with one dict lookup
+on the token text, line numbers are advanced by counting the newlines in the
+skipped text.
+
+The scanner implements the subset of the PLY lexer interface used by the PLY
+parser: input(), token(), lineno and lexpos. Tools that only need the tokens
+use tokenize(), which returns them as a TokenStream of parallel arrays
+without creating an object per token.
+'''
+
+from array import array
+import functools
+from itertools import islice
+import re
+
+from errors import Diagnostic
+
+ILLEGAL_CHARACTER = 'illegal character'
+
+# the matches tokenize() takes between two checks of its guard
+SCAN_INTERVAL = 4096
+
+
+class Token(object):
+    '''
+    A token as seen by the parser. lexpos and endlexpos are the offsets of
+    the first character and one past the last character of the token.
+    '''
+
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'endlexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos, endlexpos):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+        self.endlexpos = endlexpos
+
+    @property
+    def span(self):
+        return self.lexpos, self.endlexpos
+
+    def __repr__(self):
+        return 'LexToken({},{!r},{:d},{:d})'.format(self.type, self.value, self.lineno, self.lexpos)
+
+    __str__ = __repr__
+
+
+def _pattern(rule):
+    return rule if isinstance(rule, str) else getattr(rule, 'regex', rule.__doc__)
+
+
+def _unescape(pattern):
+    return re.sub(r'\\(.)', r'\1', pattern)
+
+
+class Lexicon(object):
+    '''
+    The compiled token rules of a lexer class in the style of MyLexer. It is
+    immutable and shared by all scanners.
+    '''
+
+    # token rules that match a class of strings, tried in this order
+    # before the operators
+    classes = ('NAME', 'NUM', 'STRING_LITERAL', 'CHAR_LITERAL')
+
+    def __init__(self, lexer_class):
+        self.keywords = dict((k, k.upper()) for k in lexer_class.keywords)
+
+        # all other t_ rules are fixed strings, map them to their token type
+        operators = dict((c, c) for c in lexer_class.literals)
+        for name in dir(lexer_class):
+            if not name.startswith('t_') or name.startswith('t_ignore'):
+                continue
+            kind = name[2:]
+            if kind in self.classes or kind in ('BLOCK_COMMENT', 'newline', 'newline2', 'error'):
+                continue
+            operators[_unescape(_pattern(getattr(lexer_class, name)))] = kind
+        self.operators = operators
+
+        # the type of every token whose text decides it
+        self.fixed = dict(operators)
+        self.fixed.update(self.keywords)
+
+        # token kinds are numbered like the terminals of the LR tables (see
+        # plyj.tables.CompactTables), 0 is the end of input; the goals are
+        # kinds the scanner never produces
+        self.kinds = ['$end'] + sorted(set(self.fixed.values()) | set(self.classes) |
+                                       set(getattr(lexer_class, 'goals', ())))
+        self.kind_ids = dict((kind, i) for i, kind in enumerate(self.kinds))
+        self.fixed_ids = dict((text, self.kind_ids[kind]) for text, kind in self.fixed.items())
+        # the text of every kind whose tokens all have the same text
+        self.texts = [None] * len(self.kinds)
+        for text, kind in self.fixed_ids.items():
+            self.texts[kind] = text
+
+        # like the lexer rules a '\r' is only a line break before a '\n',
+        # on its own it is an illegal character
+        blank = '(?:[' + re.escape(lexer_class.t_ignore) + r'\n]|\r\n)+'
+        skip = '(?:{}|{}|{})*'.format(blank, lexer_class.t_ignore_LINE_COMMENT,
+                                      _pattern(lexer_class.t_BLOCK_COMMENT))
+        rules = ['(?P<{}>{})'.format(kind, _pattern(getattr(lexer_class, 't_' + kind)))
+                 for kind in self.classes]
+        # longest operators first so that alternation finds the longest match
+        ops = sorted(operators, key=lambda op: (-len(op), op))
+        rules.append('(?P<OP>{})'.format('|'.join(re.escape(op) for op in ops)))
+        self.regex = re.compile('{}(?:{})?'.format(skip, '|'.join(rules)))
+
+
+class Scanner(object):
+    '''
+    Splits a source string into Tokens. Unlike a PLY lexer a scanner can
+    produce all tokens of the input without a Python call per character
+    class; use it through token() or by iterating over it.
+    '''
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+        self.token = self._end
+        # illegal characters are printed unless this is a list to add
+        # plyj.errors.Diagnostics to
+        self.diagnostics = None
+
+    def clone(self):
+        return Scanner(self.lexicon)
+
+    def input(self, data):
+        self.lexdata = data
+        self.lexpos = 0
+        # the parser calls token() once per token, make it the C level next()
+        # of the generator
+        self.token = functools.partial(next, self._scan(data), None)
+
+    def _end(self):
+        return None
+
+    def __iter__(self):
+        return iter(self.token, None)
+
+    def tokenize(self, data, guard=None):
+        '''
+        Scans all of data and returns the tokens as a TokenStream. No object
+        is created per token. guard is a plyj.limits.Guard whose scanned() is
+        called with the number of tokens so far every SCAN_INTERVAL matches
+        and at the end; it raises to stop the scan.
+        '''
+        lexicon = self.lexicon
+        fixed = lexicon.fixed_ids
+        ids = lexicon.kind_ids
+        kinds = []
+        starts = []
+        ends = []
+        lines = []
+        add_kind = kinds.append
+        add_start = starts.append
+        add_end = ends.append
+        add_line = lines.append
+        count = data.count
+        find = data.find
+        end = len(data)
+        lineno = self.lineno
+        # pos is the end of the previous token, eol the first newline after it
+        pos = 0
+        eol = find('\n')
+        if eol < 0:
+            eol = end
+        # the regex matches at every position, so the matches are contiguous;
+        # with a guard they are taken in batches
+        matches = lexicon.regex.finditer(data)
+        batch = SCAN_INTERVAL if guard is not None else None
+        m = True
+        while m is not None:
+            m = None
+            for m in islice(matches, batch):
+                kind = m.lastgroup
+                if kind is None:
+                    # only whitespace and comments, this is either the end of
+                    # the input or a character that starts no token; in the
+                    # latter case finditer continues behind it
+                    start = m.end()
+                    if start == m.start() and start < end:
+                        self.lineno = lineno + count('\n', pos, start)
+                        self.error(data, start)
+                    continue
+                start, stop = m.span(kind)
+                if start > eol:
+                    lineno += count('\n', pos, start)
+                    eol = find('\n', start)
+                    if eol < 0:
+                        eol = end
+                pos = stop
+                # keywords and operators are looked up by their text, no fixed
+                # token has id 0
+                add_kind(fixed.get(data[start:stop]) or ids[kind])
+                add_start(start)
+                add_end(stop)
+                add_line(lineno)
+            if guard is not None:
+                guard.scanned(len(kinds))
+        self.lineno = lineno + count('\n', pos)
+        self.lexpos = end
+        return TokenStream(data, lexicon.kinds, array('B', kinds), array('i', starts),
+                           array('i', ends), array('i', lines))
+
+    def _scan(self, data):
+        # the same loop as tokenize(), creating the tokens right away is
+        # faster than creating them from the arrays
+        fixed = self.lexicon.fixed
+        new = object.__new__
+        count = data.count
+        find = data.find
+        end = len(data)
+        lineno = self.lineno
+        # pos is the end of the previous token, eol the first newline after it
+        pos = 0
+        eol = find('\n')
+        if eol < 0:
+            eol = end
+        # the regex matches at every position, so the matches are contiguous
+        for m in self.lexicon.regex.finditer(data):
+            kind = m.lastgroup
+            if kind is None:
+                # only whitespace and comments, this is either the end of the
+                # input or a character that starts no token; in the latter case
+                # finditer continues behind it
+                start = m.end()
+                if start == m.start() and start < end:
+                    self.lineno = lineno + count('\n', pos, start)
+                    self.error(data, start)
+                continue
+            start, stop = m.span(kind)
+            if start > eol:
+                lineno += count('\n', pos, start)
+                eol = find('\n', start)
+                if eol < 0:
+                    eol = end
+            value = data[start:stop]
+            pos = self.lexpos = stop
+            self.lineno = lineno
+            # Token() without the call to __init__
+            t = new(Token)
+            t.type = fixed.get(value, kind)
+            t.value = value
+            t.lineno = lineno
+            t.lexpos = start
+            t.endlexpos = stop
+            yield t
+        self.lineno = lineno + count('\n', pos)
+        self.lexpos = end
+
+    def error(self, data, pos):
+        if self.diagnostics is None:
+            print("Illegal character '{}' ({}) in line {}".format(data[pos], hex(ord(data[pos])), self.lineno))
+            return
+        # a run of illegal characters, e.g. binary data, is one diagnostic
+        last = self.diagnostics[-1] if self.diagnostics else None
+        if last is not None and last.message == ILLEGAL_CHARACTER and last.end == pos:
+            last.end = pos + 1
+        else:
+            self.diagnostics.append(Diagnostic(ILLEGAL_CHARACTER, pos, pos + 1, self.lineno))
+
+
+class TokenStream(object):
+    '''
+    The tokens of a source as parallel arrays: kinds holds the kind id of
+    every token (an index into names), starts and ends the offsets of its
+    first and one past its last character and lines its line number. The
+    text of a token is only sliced from the source when it is asked for.
+    '''
+
+    def __init__(self, source, names, kinds, starts, ends, lines):
+        self.source = source
+        self.names = names
+        self.kinds = kinds
+        self.starts = starts
+        self.ends = ends
+        self.lines = lines
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def kind(self, i):
+        return self.names[self.kinds[i]]
+
+    def text(self, i):
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def view(self, i):
+        '''
+        The text of token i as a memoryview into the source, without copying.
+        Only available if the source is a byte string.
+        '''
+        return memoryview(self.source)[self.starts[i]:self.ends[i]]
+
+    def __iter__(self):
+        '''Yields (kind name, text) for every token.'''
+        names, source = self.names, self.source
+        for kind, start, end in zip(self.kinds, self.starts, self.ends):
+            yield names[kind], source[start:end]
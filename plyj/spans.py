@@ -0,0 +1,119 @@
+#!/usr/bin/env python2
+'''
+Source spans of AST nodes.
+
+The nodes themselves carry no positions. A parse records the span of every
+node it builds in a SpanTable, a side table that maps the id of a node to
+its start and end offset in two integer arrays. The table also holds a
+reference to every node so that the ids stay valid as long as the table
+lives.
+
+After an edit of the source the spans of the unchanged nodes behind it move.
+Instead of copying all of them, shifted() stacks a new table on the old
+one that moves the spans it looks up there; see plyj.incremental.
+'''
+
+from array import array
+
+# the most tables a table is stacked on before shifted() merges them into one
+MAX_LAYERS = 16
+
+
+class SpanTable(object):
+
+    def __init__(self, classes=object):
+        # the parser only records the spans of instances of these classes,
+        # an empty tuple turns recording off
+        self.classes = classes
+        self.nodes = []
+        self.starts = array('i')
+        self.ends = array('i')
+        self._index = {}
+        # the table this one is stacked on, see shifted()
+        self._base = None
+        self._layers = 0
+
+    def __len__(self):
+        if self._base is None:
+            return len(self.nodes)
+        return sum(1 for _ in self.items())
+
+    def __contains__(self, node):
+        return self.get(node) is not None
+
+    def items(self):
+        '''Yields (node, start, end) for every node with a span.'''
+        if self._base is not None:
+            for node, start, end in self._base.items():
+                span = self._moved(id(node), start, end)
+                if span is not None:
+                    yield (node,) + span
+        for i, node in enumerate(self.nodes):
+            yield node, self.starts[i], self.ends[i]
+
+    def shifted(self, start, end, delta, replaced=()):
+        '''
+        A table for the source after the text from start to end has been
+        replaced with text delta characters longer. It has the spans of the
+        nodes of this table except those within start and end and those in
+        replaced; the spans from end on are moved by delta. The spans of the
+        new nodes are added to it.
+        '''
+        table = SpanTable(self.classes)
+        table._base = self
+        table._layers = self._layers + 1
+        table._start = start
+        table._end = end
+        table._delta = delta
+        table._replaced = frozenset(id(node) for node in replaced)
+        if table._layers <= MAX_LAYERS:
+            return table
+        merged = SpanTable(self.classes)
+        for node, start, end in table.items():
+            merged.add(node, start, end)
+        return merged
+
+    def _moved(self, key, start, end):
+        # the span in this table of a node whose span in the base table is
+        # (start, end), None if it has none
+        if key in self._replaced or (self._start <= start and end <= self._end):
+            return None
+        if start >= self._end:
+            start += self._delta
+        if end >= self._end:
+            end += self._delta
+        return start, end
+
+    def add(self, node, start, end):
+        '''Records the span of node unless it already has one.'''
+        key = id(node)
+        if key not in self._index:
+            self._index[key] = len(self.nodes)
+            self.nodes.append(node)
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def grow(self, node, end):
+        '''Moves the end of the span of node to end if that is further.'''
+        i = self._index[id(node)]
+        if end > self.ends[i]:
+            self.ends[i] = end
+
+    def get(self, node, default=None):
+        '''(start, end) of node or default if it has no span.'''
+        key = id(node)
+        i = self._index.get(key)
+        if i is not None:
+            return self.starts[i], self.ends[i]
+        if self._base is None:
+            return default
+        span = self._base.get(node)
+        if span is not None:
+            span = self._moved(key, span[0], span[1])
+        return span if span is not None else default
+
+    def __getitem__(self, node):
+        span = self.get(node)
+        if span is None:
+            raise KeyError(node)
+        return span
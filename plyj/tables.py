@@ -0,0 +1,456 @@
+#!/usr/bin/env python2
+'''
+Prebuilt LALR tables for the plyj grammar.
+
+Building the LALR tables for the Java grammar takes several seconds, so they
+are generated once at build time and shipped inside the package as
+``tables.dat``. Every table file carries a signature computed from the
+grammar docstrings and lexer rules. Tables whose signature does not match the
+grammar that is actually loaded are never used; the tables are rebuilt in
+memory instead.
+
+Loading the tables does no grammar reflection in the common case: the table
+file also records a digest of the source file that defines the grammar, and
+if that file is unchanged the tables are used without looking at a single
+docstring (which also makes prebuilt tables work under ``python -OO``). Only
+when the digest differs is the signature computed to decide whether the
+tables are still current.
+
+When the packaged tables are missing or stale and a cache directory is
+configured (``cache_dir`` argument or the ``PLYJ_TABLE_CACHE`` environment
+variable) the rebuilt tables are stored there, keyed by their signature. Cache
+files are written to a temporary file and renamed into place so that
+concurrently starting processes never see a partially written file. If the
+cache directory cannot be written the tables are only kept in memory.
+
+Run ``python -m plyj.tables [outputdir]`` to regenerate the tables.
+'''
+
+import hashlib
+import marshal
+import os
+from array import array
+import sys
+
+import ply
+
+# ply.yacc and the modules only needed to build or cache tables are
+# imported when they are used, importing plyj should be cheap
+
+# bump whenever the layout of the table dictionary changes
+TABLE_VERSION = 4
+
+# the tables are stored with marshal, which is specific to the interpreter,
+# and hold PLY data structures
+TABLE_TAG = (TABLE_VERSION, marshal.version, sys.version_info[0], sys.version_info[1],
+             getattr(ply, '__version__', None))
+
+TABLE_FILE = 'tables.dat'
+
+CACHE_ENV = 'PLYJ_TABLE_CACHE'
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _function(member):
+    return getattr(member, '__func__', member)
+
+
+def grammar_signature(lexer_class, parser_class, start):
+    '''
+    Hash of everything the generated tables depend on: the token list, the
+    lexer rules and the productions in the docstrings of the p_ functions
+    (in definition order, which decides the numbering of the productions).
+    '''
+    import ply.yacc as yacc
+
+    parts = ['version {}'.format(TABLE_VERSION),
+             'ply {}'.format(yacc.__tabversion__),
+             'start {}'.format(start),
+             'tokens {}'.format(' '.join(parser_class.tokens)),
+             'literals {}'.format(lexer_class.literals)]
+
+    for name in sorted(dir(lexer_class)):
+        if name.startswith('t_'):
+            rule = getattr(lexer_class, name)
+            if not isinstance(rule, str):
+                rule = _function(rule)
+                rule = getattr(rule, 'regex', rule.__doc__)
+            parts.append('{} {}'.format(name, rule))
+
+    rules = []
+    for name in dir(parser_class):
+        if name.startswith('p_') and name != 'p_error':
+            func = _function(getattr(parser_class, name))
+            rules.append((func.__code__.co_firstlineno, name, func.__doc__))
+    rules.sort()
+    for _, name, doc in rules:
+        parts.append('{} {}'.format(name, ' '.join((doc or '').split())))
+
+    digest = hashlib.sha1('\n'.join(parts).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def source_digest(cls):
+    '''
+    Digest of the source file defining cls or None if the source is not
+    available (e.g. only bytecode is installed).
+    '''
+    path = getattr(sys.modules.get(cls.__module__), '__file__', None)
+    if not path:
+        return None
+    if path.endswith(('.pyc', '.pyo')):
+        path = path[:-1]
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except (IOError, OSError):
+        return None
+
+
+def _members(obj):
+    return dict((k, getattr(obj, k)) for k in dir(obj))
+
+
+class _Attributes(object):
+    '''Read-only mapping view of the attributes of an object.'''
+
+    def __init__(self, obj):
+        self.obj = obj
+
+    def __getitem__(self, name):
+        return getattr(self.obj, name)
+
+
+def _build_parser_table(parser_module, start):
+    import ply.yacc as yacc
+
+    pinfo = yacc.ParserReflect(_members(parser_module), log=yacc.NullLogger())
+    pinfo.get_all()
+    if pinfo.error or pinfo.validate_all():
+        raise yacc.YaccError('Unable to build parser')
+
+    grammar = yacc.Grammar(pinfo.tokens)
+    for term, assoc, level in pinfo.preclist:
+        grammar.set_precedence(term, assoc, level)
+    for funcname, (filename, line, prodname, syms) in pinfo.grammar:
+        grammar.add_production(prodname, syms, funcname, filename, line)
+    grammar.set_start(start)
+
+    undefined = grammar.undefined_symbols()
+    if undefined:
+        raise yacc.YaccError('Symbol {!r} used, but not defined'.format(undefined[0][0]))
+
+    lr = yacc.LRGeneratedTable(grammar, 'LALR', yacc.NullLogger())
+    productions = [(p.str, p.name, p.len, p.func, os.path.basename(p.file), p.line)
+                   for p in lr.lr_productions]
+
+    return {
+        'method': lr.lr_method,
+        'action': lr.lr_action,
+        'goto': lr.lr_goto,
+        'productions': productions,
+    }
+
+
+def _displace(rows, width):
+    '''
+    Row displacement compression: overlays the sparse rows (dicts mapping a
+    column to a value) in one pair of check/value arrays. Entry (r, c) lives
+    at index base[r] + c and is present iff check[base[r] + c] == r.
+    '''
+    base = array('i', [0] * len(rows))
+    size = sum(len(row) for row in rows) + width
+    check = [-1] * size
+    value = [0] * size
+    free = 0
+    # rows with the same columns fail at the same bases; remember where the
+    # search for a column pattern can be resumed
+    resume = {}
+    # place the densest rows first, they are the hardest to fit
+    for r in sorted(range(len(rows)), key=lambda r: -len(rows[r])):
+        cols = sorted(rows[r])
+        if not cols:
+            continue
+        free = check.index(-1, free)
+        first = cols[0]
+        pattern = tuple(cols)
+        pos = check.index(-1, max(free, resume.get(pattern, 0)))
+        while True:
+            b = pos - first
+            if b >= 0:
+                if b + cols[-1] >= len(check):
+                    grow = b + cols[-1] + 1 - len(check)
+                    check.extend([-1] * grow)
+                    value.extend([0] * grow)
+                for c in cols:
+                    if check[b + c] != -1:
+                        break
+                else:
+                    break
+            pos = check.index(-1, pos + 1)
+        base[r] = b
+        resume[pattern] = pos + 1
+        for c in cols:
+            check[b + c] = r
+            value[b + c] = rows[r][c]
+    # keep enough padding that base[r] + c never needs a bounds check
+    end = max(base) + width if rows else 0
+    while len(check) > end and check[-1] == -1:
+        check.pop()
+        value.pop()
+    if end > len(check):
+        check.extend([-1] * (end - len(check)))
+        value.extend([0] * (end - len(value)))
+    return base, array('h', check), array('h', value)
+
+
+class CompactTables(object):
+    '''
+    The LR tables as flat integer arrays instead of nested dicts keyed by
+    state and symbol name. Terminals and nonterminals are numbered, the
+    action table is row displacement compressed and the goto table stores a
+    default per nonterminal plus the displaced exceptions.
+
+    Action values use the PLY encoding: n > 0 shifts and goes to state n,
+    n < 0 reduces by production -n and 0 accepts.
+    '''
+
+    def __init__(self, terminals, nonterminals, action_base, action_check,
+                 action_value, goto_base, goto_check, goto_value, goto_default,
+                 defaulted, prod_lhs, prod_len, prod_func):
+        self.terminals = terminals
+        self.terminal_ids = dict((t, i) for i, t in enumerate(terminals))
+        self.nonterminals = nonterminals
+        self.nonterminal_ids = dict((n, i) for i, n in enumerate(nonterminals))
+        self.action_base = action_base
+        self.action_check = action_check
+        self.action_value = action_value
+        self.goto_base = goto_base
+        self.goto_check = goto_check
+        self.goto_value = goto_value
+        self.goto_default = goto_default
+        self.defaulted = defaulted
+        self.prod_lhs = prod_lhs
+        self.prod_len = prod_len
+        self.prod_func = prod_func
+
+    @classmethod
+    def from_lr(cls, lr_action, lr_goto, productions):
+        from collections import Counter
+
+        terminals = ['$end'] + sorted(set(t for row in lr_action.values() for t in row) - set(['$end']))
+        terminal_ids = dict((t, i) for i, t in enumerate(terminals))
+        nonterminals = []
+        for p in productions:
+            if p[1] not in nonterminals:
+                nonterminals.append(p[1])
+        nonterminal_ids = dict((n, i) for i, n in enumerate(nonterminals))
+        num_states = len(lr_action)
+
+        action_rows = [dict((terminal_ids[t], v) for t, v in lr_action.get(state, {}).items())
+                       for state in range(num_states)]
+        action_base, action_check, action_value = _displace(action_rows, len(terminals))
+
+        columns = [{} for _ in nonterminals]
+        for state, row in lr_goto.items():
+            for n, target in row.items():
+                columns[nonterminal_ids[n]][state] = target
+        goto_default = array('h', [0] * len(nonterminals))
+        for n, column in enumerate(columns):
+            if column:
+                default = Counter(column.values()).most_common(1)[0][0]
+                goto_default[n] = default
+                columns[n] = dict((s, t) for s, t in column.items() if t != default)
+        goto_base, goto_check, goto_value = _displace(columns, num_states)
+
+        defaulted = array('h', [0] * num_states)
+        for state, row in enumerate(action_rows):
+            values = list(row.values())
+            if len(values) == 1 and values[0] < 0:
+                defaulted[state] = values[0]
+
+        return cls(terminals, nonterminals, action_base, action_check, action_value,
+                   goto_base, goto_check, goto_value, goto_default, defaulted,
+                   array('h', [nonterminal_ids[p[1]] for p in productions]),
+                   array('h', [p[2] for p in productions]),
+                   [p[3] for p in productions])
+
+    def action(self, state, terminal):
+        '''Action for terminal id in state or None for a syntax error.'''
+        i = self.action_base[state] + terminal
+        if self.action_check[i] == state:
+            return self.action_value[i]
+        return None
+
+    def goto(self, state, nonterminal):
+        i = self.goto_base[nonterminal] + state
+        if self.goto_check[i] == nonterminal:
+            return self.goto_value[i]
+        return self.goto_default[nonterminal]
+
+    def nbytes(self):
+        '''Size of the table arrays in bytes.'''
+        arrays = (self.action_base, self.action_check, self.action_value,
+                  self.goto_base, self.goto_check, self.goto_value,
+                  self.goto_default, self.defaulted, self.prod_lhs, self.prod_len)
+        return sum(len(a) * a.itemsize for a in arrays)
+
+    def to_dict(self):
+        '''The constructor arguments with arrays as bytes, used to store the tables.'''
+        state = {}
+        for k, v in self.__dict__.items():
+            if isinstance(v, array):
+                v = (v.typecode, _array_bytes(v))
+            state[k] = v
+        del state['terminal_ids'], state['nonterminal_ids']
+        return state
+
+    @classmethod
+    def from_dict(cls, state):
+        kwargs = {}
+        for k, v in state.items():
+            if isinstance(v, tuple):
+                v = _array_from_bytes(*v)
+            kwargs[k] = v
+        return cls(**kwargs)
+
+
+if hasattr(array, 'tobytes'):
+    def _array_bytes(a):
+        return a.tobytes()
+
+    def _array_from_bytes(typecode, data):
+        a = array(typecode)
+        a.frombytes(data)
+        return a
+else:
+    def _array_bytes(a):
+        return a.tostring()
+
+    def _array_from_bytes(typecode, data):
+        a = array(typecode)
+        a.fromstring(data)
+        return a
+
+
+def build_tables(lexer_module, parser_module, start, signature=None):
+    if signature is None:
+        signature = grammar_signature(type(lexer_module), type(parser_module), start)
+    parsetab = _build_parser_table(parser_module, start)
+    return {
+        'signature': signature,
+        'source_digest': source_digest(type(parser_module)),
+        'parser': parsetab,
+        'compact': CompactTables.from_lr(parsetab['action'], parsetab['goto'],
+                                         parsetab['productions']).to_dict(),
+    }
+
+
+def write_tables(tables, path):
+    '''
+    Atomically writes the tables to path: they are dumped into a temporary
+    file in the same directory which is then renamed to path.
+    '''
+    import tempfile
+
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.plyj-', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            marshal.dump(TABLE_TAG, f)
+            marshal.dump(tables, f)
+        os.chmod(tmp_path, 0o644)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # on Windows rename does not replace an existing file
+            if not os.path.exists(path):
+                raise
+            os.remove(tmp_path)
+    except:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_tables(path):
+    '''
+    Returns the tables stored in path or None if the file does not exist or
+    was written in an incompatible format.
+    '''
+    try:
+        with open(path, 'rb') as f:
+            if marshal.load(f) != TABLE_TAG:
+                return None
+            tables = marshal.load(f)
+    except Exception:
+        # missing, unreadable or corrupt; the tables are rebuilt
+        return None
+    if not isinstance(tables, dict):
+        return None
+    return tables
+
+
+def cache_file(cache_dir, signature):
+    return os.path.join(cache_dir, 'plyj-tables-{}.dat'.format(signature))
+
+
+def load_tables(lexer_module, parser_module, start, cache_dir=None):
+    '''
+    Looks for the tables in the package, then in the cache directory and
+    builds them if neither has tables for the current grammar. Freshly built
+    tables are stored in the cache directory if possible.
+    '''
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_ENV) or None
+
+    tables = read_tables(os.path.join(PACKAGE_DIR, TABLE_FILE))
+    digest = source_digest(type(parser_module))
+    if tables is not None and digest is not None and tables.get('source_digest') == digest:
+        return tables
+
+    signature = grammar_signature(type(lexer_module), type(parser_module), start)
+    if tables is not None and tables.get('signature') == signature:
+        return tables
+    if cache_dir is not None:
+        tables = read_tables(cache_file(cache_dir, signature))
+        if tables is not None and tables.get('signature') == signature:
+            return tables
+
+    tables = build_tables(lexer_module, parser_module, start, signature)
+    if cache_dir is not None:
+        try:
+            if not os.path.isdir(cache_dir):
+                os.makedirs(cache_dir)
+            write_tables(tables, cache_file(cache_dir, signature))
+        except (IOError, OSError):
+            # read-only or otherwise unusable cache; keep the tables in memory
+            pass
+    return tables
+
+
+def make_parser(tables, parser_module):
+    import ply.yacc as yacc
+
+    parsetab = tables['parser']
+
+    lr = yacc.LRTable()
+    lr.lr_method = parsetab['method']
+    lr.lr_action = parsetab['action']
+    lr.lr_goto = parsetab['goto']
+    lr.lr_productions = [yacc.MiniProduction(*p) for p in parsetab['productions']]
+    lr.bind_callables(_Attributes(parser_module))
+    return yacc.LRParser(lr, parser_module.p_error)
+
+
+def generate(outputdir=PACKAGE_DIR):
+    from plyj.parser import MyLexer, MyParser, START
+    tables = build_tables(MyLexer(), MyParser(), START)
+    path = os.path.join(outputdir, TABLE_FILE)
+    write_tables(tables, path)
+    return path
+
+
+if __name__ == '__main__':
+    print('wrote {}'.format(generate(*sys.argv[1:])))
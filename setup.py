@@ -1,4 +1,19 @@
+import os
+
 from setuptools import setup
+from setuptools.command.build_py import build_py
+
+
+class build_py_with_tables(build_py):
+    '''Generates the lexer and parser tables into the built package.'''
+
+    def run(self):
+        build_py.run(self)
+        if not self.dry_run:
+            from plyj import tables
+            path = tables.generate(os.path.join(self.build_lib, 'plyj'))
+            self.announce('generated {}'.format(path), level=2)
+
 
 setup(
     name='plyj',
@@ -6,6 +21,8 @@ setup(
     author='Werner Hahn',
     author_email='werner_hahn@gmx.com',
     packages=['plyj'],
+    package_data={'plyj': ['tables.dat']},
+    cmdclass={'build_py': build_py_with_tables},
     url='http://github.com/musiKk/plyj',
     license='COPYING',
     description='A Java parser written in Python using PLY. ',
@@ -23,6 +40,9 @@ setup(
         'Topic :: Software Development :: Libraries :: Python Modules',
         'Topic :: Text Processing'
     ],
+    setup_requires=[
+        "ply >= 3.4",
+    ],
     install_requires=[
         "ply >= 3.4",
     ],
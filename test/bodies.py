@@ -0,0 +1,142 @@
+import sys
+import unittest
+from StringIO import StringIO
+
+import plyj.parser as plyj
+import plyj.model as model
+from plyj.errors import Cancelled, LimitExceeded
+from plyj.limits import CancellationToken, Limits
+
+
+class SkippedBodiesTest(unittest.TestCase):
+
+    code = '''class A {
+    static { init(); }
+    { x = 1; }
+    int[] f = {1, 2};
+    Runnable r = new Runnable() { public void run() { go(); } };
+    A(int a) throws E { this(); }
+    <T> List<T> m(T t) { if (t) { return "}"; } class L { void z() {} } return '{'; }
+    abstract void n();
+    enum F { G { void q() { } }; }
+}'''
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def bodies(self, tree):
+        found = []
+
+        def collect(node):
+            if isinstance(node, (list, tuple)):
+                for n in node:
+                    collect(n)
+            elif isinstance(node, model.UnparsedBody):
+                found.append(self.code[node.start:node.end])
+            elif isinstance(node, model.SourceElement):
+                for f in node._fields:
+                    collect(getattr(node, f))
+        collect(tree)
+        return found
+
+    def test_bodies_are_skipped(self):
+        tree = self.parser.parse_signatures(self.code)
+        self.assertEqual(self.bodies(tree), [
+            '{ init(); }', '{ x = 1; }', '{ go(); }', '{ this(); }',
+            '''{ if (t) { return "}"; } class L { void z() {} } return '{'; }''', '{ }'])
+        static, instance, f = tree.type_declarations[0].body[:3]
+        self.assertTrue(static.static)
+        self.assertFalse(instance.static)
+        self.assertEqual(f, self.parser.parse_string(self.code).type_declarations[0].body[2])
+
+    def test_declarations_are_the_same(self):
+        full = self.parser.parse(self.code)
+        skipped = self.parser.parse(self.code, bodies='skip')
+        for a, b in zip(full.tree.type_declarations[0].body, skipped.tree.type_declarations[0].body):
+            self.assertEqual(type(a), type(b))
+            self.assertEqual(full.span(a), skipped.span(b))
+            body = getattr(b, 'body', None) or getattr(b, 'block', None)
+            if isinstance(body, model.UnparsedBody):
+                self.assertEqual(skipped.span(body), (body.start, body.end))
+
+    def test_errors_in_bodies_are_not_seen(self):
+        tree = self.parser.parse_signatures('class A { void m() { int } int x; }')
+        self.assertEqual(len(tree.type_declarations[0].body), 2)
+
+    def test_unbalanced_body(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.assertEqual(self.parser.parse_signatures('class A { void m() { { }'), None)
+        finally:
+            sys.stdout = stdout
+
+    def test_unknown_mode(self):
+        self.assertRaises(ValueError, self.parser.parse, self.code, bodies='none')
+
+
+class LazyBodiesTest(unittest.TestCase):
+
+    code = SkippedBodiesTest.code
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_same_tree(self):
+        lazy = self.parser.parse_string(self.code, bodies='lazy')
+        self.assertEqual(lazy, self.parser.parse_string(self.code))
+
+    def test_parsed_on_first_read(self):
+        result = self.parser.parse(self.code, bodies='lazy')
+        full = self.parser.parse(self.code)
+        method = result.tree.type_declarations[0].body[5]
+        handle = method._body
+        self.assertTrue(isinstance(handle, model.LazyBody))
+        self.assertEqual(self.code[handle.start:handle.end][:6], '{ if (')
+        statements = method.body
+        self.assertEqual(statements, full.tree.type_declarations[0].body[5].body)
+        self.assertIs(method._body, statements)
+        # spans are recorded in the table of the parse
+        self.assertEqual([result.span(s) for s in statements],
+                         [full.span(s) for s in full.tree.type_declarations[0].body[5].body])
+        initializer = result.tree.type_declarations[0].body[0]
+        self.assertEqual(initializer.block, model.Block([model.ExpressionStatement(
+            model.MethodInvocation('init'))]))
+
+    def test_accept_expands_bodies(self):
+        class Counter(model.Visitor):
+            def __init__(self):
+                super(Counter, self).__init__()
+                self.calls = 0
+
+            def visit_MethodInvocation(self, node):
+                self.calls += 1
+                return True
+
+        counts = []
+        for bodies in ('parse', 'lazy'):
+            counter = Counter()
+            self.parser.parse_string(self.code, bodies=bodies).accept(counter)
+            counts.append(counter.calls)
+        # init() and go() in the initializer and the anonymous class
+        self.assertEqual(counts, [2, 2])
+
+    def test_limits(self):
+        code = 'class A { void m() { x = ' + '(' * 3000 + '1' + ')' * 3000 + '; } }'
+        limits = Limits(depth=200, timeout=10)
+        tree = self.parser.parse_string(code, limits=limits, bodies='lazy')
+        method = tree.type_declarations[0].body[0]
+        with self.assertRaises(LimitExceeded) as cm:
+            method.body
+        self.assertEqual(cm.exception.limit, 'depth')
+        cancel = CancellationToken()
+        tree = self.parser.parse_string(code, cancel=cancel, bodies='lazy')
+        cancel.cancel()
+        self.assertRaises(Cancelled, getattr, tree.type_declarations[0].body[0], 'body')
+
+    def test_errors(self):
+        result = self.parser.parse('class A { void m() { int } int x; }', bodies='lazy', recover=True)
+        self.assertEqual(result.diagnostics, [])
+        method = result.tree.type_declarations[0].body[0]
+        self.assertEqual(method.body, [])
+        self.assertEqual([d.message for d in result.diagnostics], ["unexpected '}'"])
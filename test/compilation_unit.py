@@ -20,7 +20,7 @@ class CompilationUnitTest(unittest.TestCase):
         public static final class Foo {}
         ''')
         cls = self._assert_declaration(m, 'Foo')
-        self.assertEqual(cls.modifiers, ['public', 'static', 'final'])
+        self.assertEqual(cls.modifiers, ('public', 'static', 'final'))
 
     def test_default_package(self):
         m = self.parser.parse_string('''
@@ -81,10 +81,10 @@ class CompilationUnitTest(unittest.TestCase):
         ''')
         t = self._assert_declaration(m, 'Foo')
 
-        self.assertEqual(t.modifiers, [model.Annotation(
+        self.assertEqual(t.modifiers, (model.Annotation(
             name=model.Name('Annot'),
             members=[model.AnnotationMember(name=model.Name('key'),
-                                            value=model.Literal('1'))])])
+                                            value=model.Literal('1'))]),))
 
     def test_line_comment(self):
         m = self.parser.parse_string(r'''
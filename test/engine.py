@@ -0,0 +1,93 @@
+import functools
+import inspect
+import itertools
+import sys
+import unittest
+from StringIO import StringIO
+
+import plyj.parser as plyj
+import plyj.scanner as scanner
+import plyj.tables as tables
+
+
+class EngineTest(unittest.TestCase):
+
+    code = '''
+package p;
+import java.util.*;
+@Deprecated
+public class A<T extends Comparable<? super T>> extends B implements C, D {
+    private int[] a = {1, 2}, b[];
+    static { x = y >>> 2; }
+    A(T... ts) { this(ts[0]); }
+    <U> List<U> m(final int x) throws E {
+        for (int i = 0, j; i < x; i++) { if (i % 2 == 0) continue; else break; }
+        label: while (true) { do x--; while (x > 0); }
+        switch (x) { case 1: case 2: return null; default: }
+        try { throw new E(); } catch (E e) { assert false : "x"; } finally { }
+        synchronized (this) { return (List<U>) (Object) new ArrayList<U>() {}; }
+    }
+    enum F { G, H(1) { void m() {} }; }
+    @interface I { int v() default 1; }
+}
+'''
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_same_tree_as_ply(self):
+        t = tables.load_tables(plyj.MyLexer(), plyj.MyParser(), plyj.START)
+        lr_parser = tables.make_parser(t, plyj.MyParser())
+        lexer = self.parser.grammar.new_lexer()
+        lexer.input(self.code)
+        tokens = itertools.chain([scanner.Token('GOAL_COMPILATION_UNIT', None, 1, 0, 0)], lexer)
+        expected = lr_parser.parse(lexer=lexer, tokenfunc=functools.partial(next, tokens, None))
+        self.assertNotEqual(expected, None)
+        self.assertEqual(self.parser.parse_string(self.code), expected)
+        self.assertEqual(self.parser.parse(self.code).tree, expected)
+
+    def test_syntax_error(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            self.assertEqual(self.parser.parse_string('class A { int }'), None)
+            self.assertEqual(self.parser.parse_string('class A {'), None)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(output.splitlines(), ["error: LexToken(},'}',1,14)", 'error: None'])
+
+    def test_passed_on_values(self):
+        engine = self.parser.grammar.engine
+        names = dict((engine.compact.nonterminals[engine.prod_lhs[r]], engine.actions[r].__name__)
+                     for r in range(1, len(engine.actions)) if engine.passing[r])
+        self.assertEqual(names['expression'], 'p_expression')
+        self.assertEqual(names['multiplicative_expression'], 'p_multiplicative_expression')
+        self.assertFalse('simple_name' in names)
+
+    def test_marked_actions(self):
+        # the marks agree with what the actions do
+        engine = self.parser.grammar.engine
+        for r in range(1, len(engine.actions)):
+            action = engine.actions[r]
+            if engine.prod_len[r] == 1:
+                value = object()
+                p = [None, value]
+                try:
+                    action(p)
+                except Exception:
+                    pass
+                self.assertEqual(engine.passing[r], p[0] is value, action.__name__)
+            self.assertEqual(engine.recording[r], 'record_span(' in inspect.getsource(action),
+                             action.__name__)
+
+    def test_debug_trace(self):
+        stderr = sys.stderr
+        sys.stderr = StringIO()
+        try:
+            self.parser.parse_expression('a + 1', debug=1)
+            trace = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+        self.assertTrue("shift NAME 'a'" in trace)
+        self.assertTrue('reduce additive_expression (p_additive_expression)' in trace)
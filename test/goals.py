@@ -0,0 +1,52 @@
+import unittest
+
+import plyj.parser as plyj
+import plyj.model as model
+
+
+class GoalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_type(self):
+        self.assertEqual(self.parser.parse_type('int[]'), model.Type('int', dimensions=1))
+        t = self.parser.parse_type('Map<String, List<T>>')
+        self.assertEqual(t, model.Type(model.Name('Map'), type_arguments=[
+            model.Type(model.Name('String')),
+            model.Type(model.Name('List'), type_arguments=[model.Type(model.Name('T'))])]))
+
+    def test_class_body(self):
+        declarations = self.parser.parse_class_body('int a; Foo() {} void m() {} static {}')
+        self.assertEqual([type(d) for d in declarations],
+                         [model.FieldDeclaration, model.ConstructorDeclaration,
+                          model.MethodDeclaration, model.ClassInitializer])
+        self.assertEqual(self.parser.parse_class_body(''), [])
+
+    def test_header(self):
+        code = '''
+        @A(x = {1}) package p;
+        import a.b;
+        import static c.*;
+        @B class C { int f = 1 }
+        '''
+        header = self.parser.parse_header(code)
+        self.assertEqual(header.package_declaration.name, model.Name('p'))
+        self.assertEqual([d.name for d in header.import_declarations],
+                         [model.Name('a.b'), model.Name('c')])
+        self.assertEqual(header.type_declarations, [])
+        self.assertEqual(self.parser.parse_header('class C {}'), model.CompilationUnit())
+
+    def test_offsets_are_not_shifted(self):
+        code = 'foo(1) + 2'
+        result = self.parser.parse(code, goal='expression')
+        self.assertEqual(result.span(result.tree), (0, len(code)))
+        tokens = self.parser.tokenize_string(code)
+        self.assertEqual(tokens.starts[0], 0)
+        self.assertEqual(len(tokens), 6)
+
+    def test_operators_at_start(self):
+        # '++' used to select the compilation unit goal
+        self.assertEqual(self.parser.parse_expression('++a'), model.Unary('++x', model.Name('a')))
+        self.assertEqual(self.parser.parse_statement('--a;'),
+                         model.ExpressionStatement(model.Unary('--x', model.Name('a'))))
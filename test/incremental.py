@@ -0,0 +1,129 @@
+import sys
+import unittest
+from StringIO import StringIO
+
+import plyj.parser as plyj
+import plyj.model as model
+import plyj.spans as spans
+from plyj.errors import LimitExceeded
+from plyj.limits import Limits
+
+
+class ReparseTest(unittest.TestCase):
+
+    code = '''package p;
+
+class A {
+    int x = 1;
+
+    void m(int a) {
+        if (a > 0) {
+            f(a);
+        }
+        g();
+    }
+
+    Runnable r = new Runnable() { public void run() { h(); } };
+}
+
+class B {}
+'''
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+        self.result = self.parser.parse(self.code)
+
+    def assertSame(self, a, b, result_a, result_b):
+        if isinstance(a, (list, tuple)):
+            self.assertEqual(type(a), type(b))
+            self.assertEqual(len(a), len(b))
+            for x, y in zip(a, b):
+                self.assertSame(x, y, result_a, result_b)
+        elif isinstance(a, model.SourceElement):
+            self.assertEqual(type(a), type(b))
+            self.assertEqual(result_a.span(a), result_b.span(b))
+            for f in a._fields:
+                self.assertSame(getattr(a, f), getattr(b, f), result_a, result_b)
+        else:
+            self.assertEqual(a, b)
+
+    def reparse(self, result, text, removed, inserted, after=0):
+        offset = result.source.index(text) + after
+        reparsed = self.parser.reparse(result, offset, removed, inserted)
+        expected = self.parser.parse(result.source[:offset] + inserted +
+                                     result.source[offset + removed:])
+        self.assertEqual(reparsed.source, expected.source)
+        self.assertSame(reparsed.tree, expected.tree, reparsed, expected)
+        self.assertEqual(len(reparsed.spans), len(expected.spans))
+        return reparsed
+
+    def test_block(self):
+        old = repr(self.result.tree)
+        reparsed = self.reparse(self.result, 'f(a)', 1, 'foo')
+        # the old tree is not changed, unchanged parts are shared
+        self.assertEqual(repr(self.result.tree), old)
+        a, b = self.result.tree.type_declarations, reparsed.tree.type_declarations
+        self.assertIsNot(a[0], b[0])
+        self.assertIs(a[0].body[0], b[0].body[0])
+        self.assertIs(a[1], b[1])
+        self.assertIs(a[0].body[1].body[1], b[0].body[1].body[1])
+
+    def test_members(self):
+        self.reparse(self.result, 'g();', 0, 'int y; ', after=4)
+        # one member becomes two
+        reparsed = self.reparse(self.result, '1;', 0, '; int y = 2', after=1)
+        self.assertEqual(len(reparsed.tree.type_declarations[0].body), 4)
+        self.reparse(self.result, 'h()', 1, 'hh')
+
+    def test_labeled_block(self):
+        result = self.parser.parse('class A { void m() { outer: { f(a); } } }')
+        reparsed = self.reparse(result, 'f(a)', 1, 'g')
+        block = reparsed.tree.type_declarations[0].body[0].body[0]
+        self.assertEqual(block.label, 'outer')
+        self.assertIsNot(block, result.tree.type_declarations[0].body[0].body[0])
+
+    def test_between_members(self):
+        self.reparse(self.result, '\n\n    void m', 0, '  ')
+        self.reparse(self.result, 'class A', 0, ' /* */ ', after=7)
+
+    def test_outside_of_units(self):
+        self.reparse(self.result, 'package p', 1, 'q', after=8)
+        self.reparse(self.result, 'class B', 1, 'C', after=6)
+
+    def test_errors(self):
+        # the unit does not parse on its own, nor does the whole source
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            reparsed = self.parser.reparse(self.result, self.code.index('g();'), 0, '{')
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(reparsed.tree, None)
+        # the block of the if does not parse, the method does
+        self.reparse(self.result, '{\n            f(a);', 0, '} {', after=1)
+        self.assertRaises(ValueError, self.parser.reparse, self.result, len(self.code), 1, '')
+
+    def test_options(self):
+        # the reparse keeps the options of the parse, also when it parses everything again
+        strings = {}
+        result = self.parser.parse(self.code, strings=strings)
+        reparsed = self.parser.reparse(result, self.code.index('f(a)'), 1, 'foo')
+        self.assertTrue('foo' in strings)
+        self.assertIs(reparsed.options['strings'], strings)
+        lazy = self.parser.parse(self.code, bodies='lazy')
+        reparsed = self.parser.reparse(lazy, self.code.index('f(a)'), 1, 'foo')
+        self.assertTrue(isinstance(reparsed.tree.type_declarations[0].body[1]._body, model.LazyBody))
+        tokens = len(self.parser.tokenize_string(self.code))
+        limited = self.parser.parse(self.code, limits=Limits(tokens=tokens + 10, depth=50))
+        deep = '(' * 100 + 'a' + ')' * 100
+        self.assertRaises(LimitExceeded, self.parser.reparse, limited, self.code.index('f(a)') + 2, 1, deep)
+        self.assertRaises(LimitExceeded, self.parser.reparse, limited, len('package p'), 0, '.q' * 10)
+        broken = self.parser.parse(self.code, recover=True)
+        reparsed = self.parser.reparse(broken, self.code.index('g();'), 0, '{')
+        self.assertEqual([d.message for d in reparsed.diagnostics], ['unexpected end of input'])
+
+    def test_chained_edits(self):
+        result = self.result
+        for i in range(spans.MAX_LAYERS + 4):
+            result = self.reparse(result, 'f(', 0, 'x', after=2)
+        self.assertTrue(result.spans._layers <= spans.MAX_LAYERS)
@@ -0,0 +1,61 @@
+import threading
+import unittest
+from StringIO import StringIO
+
+import plyj.parser as plyj
+from plyj.errors import Cancelled, LimitExceeded, ParseAborted
+from plyj.limits import CancellationToken, Limits
+
+
+class LimitsTest(unittest.TestCase):
+
+    code = 'class A { void m() { f(((1))); } }'
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def assertExceeds(self, limit, code, **kwargs):
+        with self.assertRaises(LimitExceeded) as cm:
+            self.parser.parse_string(code, limits=Limits(**kwargs))
+        self.assertEqual(cm.exception.limit, limit)
+        self.assertEqual(cm.exception.maximum, kwargs[limit])
+
+    def test_within_limits(self):
+        limits = Limits(tokens=100, depth=100, nodes=100, timeout=10)
+        self.assertEqual(self.parser.parse_string(self.code, limits=limits),
+                         self.parser.parse_string(self.code))
+        self.assertEqual(self.parser.parse(self.code, limits=limits, cancel=CancellationToken()).tree,
+                         self.parser.parse_string(self.code))
+
+    def test_tokens(self):
+        self.assertExceeds('tokens', self.code, tokens=18)
+        # all on one line
+        self.assertExceeds('tokens', 'int[] a = {' + '1,' * 100000 + '};', tokens=1000)
+
+    def test_depth(self):
+        self.assertExceeds('depth', 'class A { int x = ' + '(' * 1000 + '1' + ')' * 1000 + '; }',
+                           depth=200)
+        self.assertExceeds('depth', self.code, depth=10)
+
+    def test_nodes(self):
+        self.assertExceeds('nodes', self.code, nodes=5)
+
+    def test_timeout(self):
+        code = 'class A { int[] a = {' + '1, ' * 100000 + '}; }'
+        self.assertExceeds('timeout', code, timeout=0)
+
+    def test_cancel(self):
+        cancel = CancellationToken()
+        cancel.cancel()
+        self.assertRaises(Cancelled, self.parser.parse_string, self.code, cancel=cancel)
+
+    def test_cancel_from_other_thread(self):
+        cancel = CancellationToken()
+        code = 'class A { int[] a = {' + '1, ' * 100000 + '}; }'
+        timer = threading.Timer(0.01, cancel.cancel)
+        timer.start()
+        try:
+            self.assertRaises(ParseAborted, self.parser.parse_file, StringIO(code), cancel=cancel)
+        finally:
+            timer.cancel()
+
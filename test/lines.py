@@ -0,0 +1,49 @@
+import unittest
+
+import plyj.parser as plyj
+from plyj.lines import LineIndex
+
+
+class LineIndexTest(unittest.TestCase):
+
+    source = 'class A {\n  int a;\n\n}'
+
+    def test_position(self):
+        index = LineIndex(self.source)
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.position(0), (1, 1))
+        self.assertEqual(index.position(9), (1, 10))
+        self.assertEqual(index.position(10), (2, 1))
+        self.assertEqual(index.position(16), (2, 7))
+        self.assertEqual(index.position(19), (3, 1))
+        self.assertEqual(index.position(20), (4, 1))
+        self.assertEqual(index.position(len(self.source)), (4, 2))
+        self.assertRaises(IndexError, index.position, -1)
+        self.assertRaises(IndexError, index.position, len(self.source) + 1)
+
+    def test_offset(self):
+        index = LineIndex(self.source)
+        for offset in range(len(self.source) + 1):
+            self.assertEqual(index.offset(*index.position(offset)), offset)
+        self.assertRaises(IndexError, index.offset, 5, 1)
+
+    def test_positions(self):
+        index = LineIndex(self.source, first_line=10)
+        offsets = [16, 0, 20, 10, 9]
+        lines, columns = index.positions(offsets)
+        self.assertEqual(list(zip(lines, columns)), [index.position(o) for o in offsets])
+        self.assertEqual(index.position(16), (11, 7))
+        self.assertEqual([list(a) for a in index.positions([])], [[], []])
+
+    def test_token_positions(self):
+        parser = plyj.Parser()
+        code = 'int a;\n  a = 1;'
+        stream = parser.tokenize_string(code)
+        lines, columns = LineIndex(code).positions(stream.starts)
+        self.assertEqual(list(lines), list(stream.lines))
+        self.assertEqual(list(columns), [1, 5, 6, 3, 5, 7, 8])
+
+    def test_parser_lines(self):
+        parser = plyj.Parser()
+        result = parser.parse('class A {\n}', lineno=3)
+        self.assertEqual(result.lines.position(10), (4, 1))
@@ -0,0 +1,298 @@
+import cPickle
+import copy
+import gc
+import inspect
+import pickle
+import re
+import unittest
+import weakref
+
+import plyj.parser as plyj
+import plyj.model as model
+
+
+class SlotsTest(unittest.TestCase):
+
+    code = 'class A { void m() { l: while (x) { continue l; } int i = 1; } }'
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_no_dict(self):
+        tree = self.parser.parse_string(self.code)
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, (list, tuple)):
+                stack.extend(node)
+            elif isinstance(node, model.SourceElement):
+                self.assertFalse(hasattr(node, '__dict__'), type(node).__name__)
+                self.assertTrue(isinstance(node._fields, tuple))
+                stack.extend(getattr(node, f) for f in node._fields)
+        with self.assertRaises(AttributeError):
+            model.Name('a').position = 1
+
+    def test_labels(self):
+        tree = self.parser.parse_string(self.code)
+        loop = tree.type_declarations[0].body[0].body[0]
+        self.assertEqual(loop.label, 'l')
+        other = self.parser.parse_string(self.code.replace('l: ', ''))
+        self.assertNotEqual(tree, other)
+        invocation = self.parser.parse_statement('foo: this(1);')
+        self.assertEqual(invocation.label, 'foo')
+        # every statement the grammar can label has the slot
+        for cls in vars(model).values():
+            if (isinstance(cls, type) and issubclass(cls, model.Statement) and
+                    cls not in (model.Statement, model.VariableDeclaration)):
+                self.assertTrue('label' in cls.__slots__, cls.__name__)
+
+    def test_copy_and_pickle(self):
+        tree = self.parser.parse_string(self.code)
+        self.assertEqual(copy.copy(tree), tree)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(tree, protocol)), tree)
+        # an unparsed body is stored as such
+        lazy = self.parser.parse_string(self.code, bodies='lazy')
+        method = copy.copy(lazy.type_declarations[0].body[0])
+        self.assertTrue(isinstance(method._body, model.LazyBody))
+        self.assertEqual(method, tree.type_declarations[0].body[0])
+        # pickles and deep copies get the parsed bodies
+        lazy = self.parser.parse_string(self.code, bodies='lazy')
+        self.assertEqual(copy.deepcopy(lazy), tree)
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            self.assertEqual(pickle.loads(pickle.dumps(lazy, protocol)), tree)
+            self.assertEqual(cPickle.loads(cPickle.dumps(lazy, protocol)), tree)
+        self.assertTrue(isinstance(lazy.type_declarations[0].body[0]._body, model.LazyBody))
+
+
+class EqualityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_fields(self):
+        a = self.parser.parse_expression('f(a + 1)')
+        self.assertEqual(a, self.parser.parse_expression('f(a + 1)'))
+        self.assertNotEqual(a, self.parser.parse_expression('f(a + 2)'))
+        # subclasses without fields of their own equal their base
+        self.assertEqual(a.arguments[0],
+                         model.BinaryExpression('+', model.Name('a'), model.Literal('1')))
+        self.assertNotEqual(model.Name('a'), model.Literal('a'))
+        self.assertNotEqual(model.Name('a'), 'a')
+
+    def test_hash(self):
+        code = 'class A { void m() { f(x.y); g(x.y); } }'
+        a, b = self.parser.parse_string(code), self.parser.parse_string(code)
+        self.assertEqual(hash(a), hash(b))
+        self.assertEqual({a: 1}[b], 1)
+        body = a.type_declarations[0].body[0].body
+        args = [s.expression.arguments[0] for s in body]
+        self.assertEqual(len(set(args)), 1)
+        self.assertEqual(len(set(body)), 2)
+
+    def test_copy_is_hashed_again(self):
+        name = model.Name('a')
+        hash(name)
+        other = copy.copy(name)
+        other.value = 'b'
+        self.assertEqual(hash(other), hash(model.Name('b')))
+
+
+class InterningTest(unittest.TestCase):
+
+    code = '''
+    class A {
+        public static final int a = b;
+        @Deprecated public static final int b = a;
+        public void m() { int c = "x".length() + "x".length(); }
+    }
+    '''
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_names_and_literals(self):
+        tree = self.parser.parse_string(self.code)
+        names = [n.value for n in find(tree, model.Name)]
+        self.assertEqual(sorted(names), ['Deprecated', 'a', 'b'])
+        self.assertIs(names[0], tree.type_declarations[0].body[1].variable_declarators[0].variable.name)
+        literals = find(tree, model.Literal)
+        self.assertIs(literals[0].value, literals[1].value)
+
+    def test_shared_strings(self):
+        strings = {}
+        a = self.parser.parse_string(self.code, strings=strings)
+        b = self.parser.parse_string(self.code, bodies='lazy', strings=strings)
+        self.assertTrue('A' in strings)
+        self.assertIs(a.type_declarations[0].name, b.type_declarations[0].name)
+        # lazy bodies are interned in the same dict
+        literal = find(a, model.Literal)[0].value
+        self.assertIs(find(b, model.Literal)[0].value, literal)
+
+    def test_modifiers(self):
+        a = self.parser.parse_string(self.code)
+        b = self.parser.parse_string('class B { public static final long x; }')
+        modifiers = a.type_declarations[0].body[0].modifiers
+        self.assertEqual(modifiers, ('public', 'static', 'final'))
+        self.assertIs(b.type_declarations[0].body[0].modifiers, modifiers)
+        self.assertIs(model.FieldDeclaration('int', [], modifiers=['public', 'static', 'final']).modifiers,
+                      modifiers)
+        annotated = a.type_declarations[0].body[1].modifiers
+        self.assertEqual(annotated, (model.Annotation(model.Name('Deprecated')), 'public', 'static', 'final'))
+        self.assertEqual(a.type_declarations[0].modifiers, ())
+
+        class Counter(model.Visitor):
+            annotations = 0
+
+            def visit_Annotation(self, annotation):
+                self.annotations += 1
+                return True
+        counter = Counter()
+        a.accept(counter)
+        self.assertEqual(counter.annotations, 1)
+
+
+class SharingTest(unittest.TestCase):
+
+    code = '''
+    import a.b.C;
+    class A<T extends Comparable<T>> {
+        java.util.List<String> a;
+        java.util.List<String>[] b;
+        java.util.Map<String, ? extends a.b.C> m(String s, a.b.C c) {
+            a.b.c.d();
+            l: for (;;) { Object o = (java.util.List<String>) x; }
+            return (a.b<String>.C<T>[]) a.b.C.this;
+        }
+    }
+    '''
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_same_tree(self):
+        shared = {}
+        tree = self.parser.parse_string(self.code, shared=shared)
+        self.assertEqual(tree, self.parser.parse_string(self.code))
+        self.assertEqual(self.parser.parse_string(self.code, shared=shared, bodies='lazy'), tree)
+        self.assertEqual(self.parser.parse_string(self.code), tree)
+
+    def test_shared(self):
+        shared = {}
+        tree = self.parser.parse_string(self.code, shared=shared)
+        strings = [t for t in find(tree, model.Type) if t == model.Type(model.Name('String'))]
+        self.assertEqual(len(strings), 6)
+        self.assertEqual(len(set(map(id, strings))), 1)
+        other = self.parser.parse_string('class B { String s; }', shared=shared)
+        self.assertIs(other.type_declarations[0].body[0].type, strings[0])
+
+    def test_no_spans(self):
+        with self.assertRaises(ValueError):
+            self.parser.parse(self.code, shared={})
+        self.parser.parse(self.code, track=False, shared={})
+
+    def test_mutating_actions(self):
+        # every action that changes a symbol's node has to be listed
+        for name, action in inspect.getmembers(plyj.MyParser, inspect.ismethod):
+            source = inspect.getsource(action)
+            changed = set(int(i) for i in re.findall(r'p\[(\d)\]\.(?:\w+ =|append_name\()', source))
+            self.assertEqual(changed, set(plyj.MUTATING_ACTIONS.get(name, ())), name)
+
+
+class VisitorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = plyj.Parser().parse_expression('f(a, g(b))')
+
+    def test_order(self):
+        class Names(model.Visitor):
+            def __init__(self):
+                super(Names, self).__init__()
+                self.calls = []
+
+            def visit_Name(self, name):
+                self.calls.append('visit ' + name.value)
+
+            def leave_Name(self, name):
+                self.calls.append('leave ' + name.value)
+
+            def visit_MethodInvocation(self, invocation):
+                self.calls.append('visit ' + invocation.name)
+                return invocation.name == 'f'
+
+        class Invocations(Names):
+            def leave_MethodInvocation(self, invocation):
+                self.calls.append('leave ' + invocation.name)
+
+        names = Names()
+        self.tree.accept(names)
+        self.assertEqual(names.calls, ['visit f', 'visit a', 'leave a', 'visit g'])
+        invocations = Invocations()
+        self.tree.accept(invocations)
+        self.assertEqual(invocations.calls, ['visit f', 'visit a', 'leave a', 'visit g', 'leave g',
+                                             'leave f'])
+
+    def test_other_visitors(self):
+        # visitors that make up their methods are asked for every node
+        class Any(model.Visitor):
+            def __init__(self):
+                super(Any, self).__init__()
+                self.visited = []
+
+            def __getattr__(self, name):
+                if name.startswith('visit_'):
+                    return lambda node: self.visited.append(name) or True
+                return super(Any, self).__getattr__(name)
+
+        class Duck(object):
+            def __init__(self):
+                self.visited = []
+
+            def __getattr__(self, name):
+                return lambda node: self.visited.append(name) or True
+
+        expected = ['visit_MethodInvocation', 'visit_Name', 'visit_MethodInvocation', 'visit_Name']
+        for visitor in (Any(), Duck()):
+            self.tree.accept(visitor)
+            self.assertEqual([n for n in visitor.visited if n.startswith('visit_')], expected)
+        self.assertTrue(model.Visitor().visit_Name(None))
+
+
+    def test_changed_and_dropped_classes(self):
+        class Names(model.Visitor):
+            def __init__(self):
+                model.Visitor.__init__(self)
+                self.names = []
+
+        class Sub(Names):
+            pass
+
+        for cls in (Names, Sub):
+            self.tree.accept(cls())
+        # methods added after the first visit are called
+        Names.visit_Name = lambda self, name: self.names.append(name.value)
+        for cls in (Names, Sub):
+            visitor = cls()
+            self.tree.accept(visitor)
+            self.assertEqual(visitor.names, ['a', 'b'])
+        del Names.visit_Name
+        visitor = Sub()
+        self.tree.accept(visitor)
+        self.assertEqual(visitor.names, [])
+        # the handlers are kept by the visitor class only
+        ref = weakref.ref(Sub)
+        del cls, Names, Sub, visitor
+        gc.collect()
+        self.assertIs(ref(), None)
+
+
+def find(node, cls):
+    '''All nodes of class cls below node, depth first.'''
+    if isinstance(node, (list, tuple)):
+        return [found for child in node for found in find(child, cls)]
+    if not isinstance(node, model.SourceElement):
+        return []
+    found = [node] if isinstance(node, cls) else []
+    for f in node._fields:
+        found.extend(find(getattr(node, f), cls))
+    return found
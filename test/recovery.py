@@ -0,0 +1,120 @@
+import sys
+import unittest
+from StringIO import StringIO
+
+import plyj.parser as plyj
+import plyj.model as model
+from plyj.errors import Diagnostic
+
+
+class RecoveryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def parse(self, code, goal='compilation_unit'):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            result = self.parser.parse(code, goal=goal, recover=True)
+            self.assertEqual(sys.stdout.getvalue(), '')
+        finally:
+            sys.stdout = stdout
+        return result
+
+    def body(self, result):
+        return result.tree.type_declarations[0].body
+
+    def test_no_errors(self):
+        result = self.parse('class A { int x; }')
+        self.assertEqual(result.diagnostics, [])
+        self.assertEqual(result.tree, self.parser.parse_string('class A { int x; }'))
+
+    def test_broken_statement_is_dropped(self):
+        result = self.parse('class A { void m() { a(); b(; c(); } int x; }')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected ';'", 28, 29, 1)])
+        method, field = self.body(result)
+        self.assertEqual([s.expression.name for s in method.body], ['a', 'c'])
+        self.assertEqual(field.variable_declarators[0].variable.name, 'x')
+
+    def test_broken_member_is_dropped(self):
+        result = self.parse('class A {\n void m() { a(); }\n int y = ;\n void n() { d(); } }')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected ';'", 38, 39, 3)])
+        self.assertEqual([d.name for d in self.body(result)], ['m', 'n'])
+
+    def test_semicolon_of_broken_construct_is_skipped(self):
+        # the ';' that ends what is dropped leaves no empty statement or declaration
+        result = self.parse('class A { void m() { int x = ; } }')
+        self.assertEqual(self.body(result)[0].body, [])
+        result = self.parse('class A { int x = ; int y; }')
+        field, = self.body(result)
+        self.assertEqual(field.variable_declarators[0].variable.name, 'y')
+        result = self.parse('class A { void m() { foo(1,; bar(); ; } }')
+        self.assertEqual(self.body(result)[0].body,
+                         [model.ExpressionStatement(model.MethodInvocation('bar')), model.Empty()])
+        self.assertEqual(len(result.diagnostics), 1)
+
+    def test_stray_token_after_finished_statement(self):
+        result = self.parse('class A { void m() { a(); ) b(); } }')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected ')'", 26, 27, 1)])
+        self.assertEqual([s.expression.name for s in self.body(result)[0].body], ['a', 'b'])
+
+    def test_stray_token_after_finished_declaration(self):
+        result = self.parse('class A { int x; ) int y; int z; }')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected ')'", 17, 18, 1)])
+        self.assertEqual([f.variable_declarators[0].variable.name for f in self.body(result)],
+                         ['x', 'y', 'z'])
+        result = self.parse('import a.b; class A {} ) class B {}')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected ')'", 23, 24, 1)])
+        self.assertEqual([d.name.value for d in result.tree.import_declarations], ['a.b'])
+        self.assertEqual([d.name for d in result.tree.type_declarations], ['A', 'B'])
+
+    def test_stray_closing_brace(self):
+        result = self.parse('class A { int x; } } class B { }')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected '}'", 19, 20, 1)])
+        self.assertEqual([d.name for d in result.tree.type_declarations], ['A', 'B'])
+        result = self.parse('class A { int x; } }')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected '}'", 19, 20, 1)])
+        self.assertEqual([d.name for d in result.tree.type_declarations], ['A'])
+
+    def test_braces_of_dropped_construct_are_counted(self):
+        # the '{' of the switch is popped with the broken case, its '}' must
+        # not end the method
+        result = self.parse('class A { void m() { switch (x) { case : f(); case 1: g(); } h(); } int y; }')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected ':'", 39, 40, 1)])
+        method, field = self.body(result)
+        self.assertEqual(method.body, [model.ExpressionStatement(model.MethodInvocation('h'))])
+        self.assertEqual(field.variable_declarators[0].variable.name, 'y')
+
+    def test_missing_semicolon(self):
+        result = self.parse('package p class A {} class B {}')
+        self.assertEqual(result.diagnostics, [Diagnostic("unexpected 'class'", 10, 15, 1)])
+        self.assertEqual([d.name for d in result.tree.type_declarations], ['A', 'B'])
+
+    def test_end_of_input(self):
+        result = self.parse('class A { void m() { foo(a')
+        self.assertEqual(result.diagnostics, [Diagnostic('unexpected end of input', 26, 26, 1)])
+        statement, = self.body(result)[0].body
+        self.assertEqual(statement.expression.arguments, [model.Name('a')])
+        self.assertEqual(result.span(statement.expression), (21, 26))
+
+    def test_illegal_characters(self):
+        result = self.parse('\x00\x01\x02 class A { \xff\xfe int x; }')
+        self.assertEqual(result.diagnostics, [Diagnostic('illegal character', 0, 3, 1),
+                                              Diagnostic('illegal character', 14, 16, 1)])
+        self.assertEqual(len(self.body(result)), 1)
+
+    def test_expression_goal(self):
+        result = self.parse('a + * b', goal='expression')
+        self.assertEqual(result.tree, None)
+        self.assertEqual(result.diagnostics[0], Diagnostic("unexpected '*'", 4, 5, 1))
+
+    def test_without_recover(self):
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            result = self.parser.parse('class A { int }')
+        finally:
+            sys.stdout = stdout
+        self.assertEqual(result.tree, None)
+        self.assertEqual(result.diagnostics, [])
@@ -0,0 +1,105 @@
+import unittest
+
+import plyj.parser as plyj
+import plyj.scanner as scanner
+import plyj.tables as tables
+
+
+class ScannerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.scanner = plyj.shared_grammar().new_lexer()
+
+    def tokens(self, code):
+        self.scanner.input(code)
+        return [(t.type, t.value) for t in self.scanner]
+
+    def test_keywords_and_names(self):
+        self.assertEqual(self.tokens('class classes $x _ int'),
+                         [('CLASS', 'class'), ('NAME', 'classes'), ('NAME', '$x'),
+                          ('NAME', '_'), ('INT', 'int')])
+
+    def test_longest_operator(self):
+        self.assertEqual(self.tokens('a>>>=b>>c...d.5'),
+                         [('NAME', 'a'), ('RRSHIFT_ASSIGN', '>>>='), ('NAME', 'b'),
+                          ('RSHIFT', '>>'), ('NAME', 'c'), ('ELLIPSIS', '...'),
+                          ('NAME', 'd'), ('NUM', '.5')])
+
+    def test_literals(self):
+        self.assertEqual(self.tokens(r'''"a\"b" 'c' '\n' 0x1FL'''),
+                         [('STRING_LITERAL', r'"a\"b"'), ('CHAR_LITERAL', "'c'"),
+                          ('CHAR_LITERAL', r"'\n'"), ('NUM', '0x1FL')])
+
+    def test_comments_are_skipped(self):
+        self.assertEqual(self.tokens('a // b\n/* c\n * d */ e /**/ f'),
+                         [('NAME', 'a'), ('NAME', 'e'), ('NAME', 'f')])
+
+    def test_comment_delimiters(self):
+        self.assertEqual(self.tokens('a /**/ b /***/ c /* * / ** */ d /*/ e */ f'),
+                         [('NAME', 'a'), ('NAME', 'b'), ('NAME', 'c'), ('NAME', 'd'), ('NAME', 'f')])
+
+    def test_long_comment_and_string(self):
+        comment = '/*' + ' * line\n' * 100000 + '*/'
+        string = '"' + 'a\\"b' * 100000 + '"'
+        self.scanner.input(comment + ' x = ' + string + ';')
+        tokens = list(self.scanner)
+        self.assertEqual([t.type for t in tokens], ['NAME', '=', 'STRING_LITERAL', ';'])
+        self.assertEqual(tokens[0].lineno, 100001)
+        self.assertEqual(tokens[2].value, string)
+
+    def test_positions(self):
+        code = 'a\n  /* b\n */ c\r\n\td'
+        self.scanner.input(code)
+        tokens = [(t.value, t.lineno, t.lexpos, t.endlexpos) for t in self.scanner]
+        self.assertEqual(tokens, [('a', 1, 0, 1), ('c', 3, 13, 14), ('d', 4, 17, 18)])
+        self.assertEqual(self.scanner.lineno, 4)
+
+    def test_illegal_character_is_skipped(self):
+        self.assertEqual(self.tokens('a # b'), [('NAME', 'a'), ('NAME', 'b')])
+
+    def test_lone_carriage_return_is_illegal(self):
+        self.scanner.diagnostics = []
+        self.scanner.input('a\rb\r\n\r\nc')
+        tokens = [(t.value, t.lineno) for t in self.scanner]
+        self.assertEqual(tokens, [('a', 1), ('b', 1), ('c', 3)])
+        self.assertEqual([(d.start, d.end) for d in self.scanner.diagnostics], [(1, 2)])
+
+    def test_same_tokens_as_lexer_rules(self):
+        lexicon = scanner.Lexicon(plyj.MyLexer)
+        self.assertEqual(lexicon.keywords['instanceof'], 'INSTANCEOF')
+        self.assertEqual(lexicon.operators['>>>='], 'RRSHIFT_ASSIGN')
+        self.assertEqual(lexicon.operators['{'], '{')
+        kinds = set(lexicon.operators.values()) | set(lexicon.keywords.values()) | set(lexicon.classes)
+        tokens = set(plyj.MyLexer.tokens) - set(['LINE_COMMENT', 'BLOCK_COMMENT']) - set(plyj.MyLexer.goals)
+        self.assertEqual(kinds, tokens | set(plyj.MyLexer.literals))
+
+
+class TokenStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_arrays(self):
+        stream = self.parser.tokenize_string('int a;\n  a = "x";')
+        self.assertEqual(len(stream), 7)
+        self.assertEqual([stream.kind(i) for i in range(len(stream))],
+                         ['INT', 'NAME', ';', 'NAME', '=', 'STRING_LITERAL', ';'])
+        self.assertEqual(list(stream.starts), [0, 4, 5, 9, 11, 13, 16])
+        self.assertEqual(list(stream.ends), [3, 5, 6, 10, 12, 16, 17])
+        self.assertEqual(list(stream.lines), [1, 1, 1, 2, 2, 2, 2])
+        self.assertEqual(stream.text(5), '"x"')
+        self.assertEqual(stream.view(5).tobytes(), b'"x"')
+        self.assertEqual(list(stream)[:2], [('INT', 'int'), ('NAME', 'a')])
+
+    def test_same_tokens_as_scanner(self):
+        code = 'class A<T> { /* x */ int f() { return a >>= 1 + 0x1F; } }'
+        stream = self.parser.tokenize_string(code)
+        self.parser.lexer.input(code)
+        tokens = [(t.type, t.value, t.lexpos, t.endlexpos, t.lineno) for t in self.parser.lexer]
+        self.assertEqual(tokens, [(stream.kind(i), stream.text(i), stream.starts[i],
+                                   stream.ends[i], stream.lines[i]) for i in range(len(stream))])
+
+    def test_kinds_are_terminal_ids(self):
+        t = tables.load_tables(plyj.MyLexer(), plyj.MyParser(), plyj.START)
+        compact = tables.CompactTables.from_dict(t['compact'])
+        self.assertEqual(self.parser.tokenize_string('').names, compact.terminals)
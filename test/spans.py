@@ -0,0 +1,133 @@
+import unittest
+
+import plyj.parser as plyj
+import plyj.model as model
+from plyj.spans import SpanTable
+
+
+def find(node, cls):
+    '''All nodes of class cls in the tree below node, in source order.'''
+    found = [node] if isinstance(node, cls) else []
+    for name in node._fields:
+        value = getattr(node, name)
+        for child in value if isinstance(value, (list, tuple)) else [value]:
+            if isinstance(child, model.SourceElement):
+                found.extend(find(child, cls))
+    return found
+
+
+class SpanTableTest(unittest.TestCase):
+
+    def test_add_and_grow(self):
+        table = SpanTable()
+        node = model.Name('a')
+        table.add(node, 0, 3)
+        table.add(node, 1, 9)
+        self.assertEqual(table[node], (0, 3))
+        table.grow(node, 6)
+        table.grow(node, 4)
+        self.assertEqual(table.get(node), (0, 6))
+        self.assertTrue(node in table)
+        self.assertEqual(len(table), 1)
+        self.assertEqual(table.get(model.Name('a')), None)
+        self.assertRaises(KeyError, table.__getitem__, model.Name('a'))
+
+    def test_shifted(self):
+        table = SpanTable()
+        before, inside, parent, after = nodes = [model.Name(c) for c in 'abcd']
+        for node, span in zip(nodes, [(0, 2), (4, 6), (3, 8), (9, 12)]):
+            table.add(node, *span)
+        # 4 to 6 replaced with a text one character longer
+        shifted = table.shifted(4, 6, 1, [parent])
+        new = model.Name('e')
+        shifted.add(new, 4, 7)
+        self.assertEqual([shifted.get(node) for node in nodes + [new]],
+                         [(0, 2), None, None, (10, 13), (4, 7)])
+        self.assertEqual(len(shifted), 3)
+        self.assertEqual(table[after], (9, 12))
+
+
+class SpansTest(unittest.TestCase):
+
+    code = '''package p;
+class A<T extends Map<String, List<T>>> {
+    enum E { X, Y(1) }
+    List<List<T>> f = (List<List<T>>) g.h(1, (i & 1));
+    void m() {
+        switch (x) {
+            case 0:
+                a.<T>b();
+            default:
+        }
+    }
+}'''
+
+    def setUp(self):
+        self.result = plyj.Parser().parse(self.code)
+
+    def texts(self, cls):
+        return [self.result.text(node) for node in find(self.result.tree, cls)]
+
+    def test_every_node_has_a_span(self):
+        nodes = find(self.result.tree, model.SourceElement)
+        self.assertTrue(len(nodes) > 30)
+        for node in nodes:
+            self.assertNotEqual(self.result.span(node), None, node)
+        self.assertEqual(self.result.span(self.result.tree), (0, len(self.code)))
+
+    def test_texts(self):
+        self.assertEqual(self.texts(model.MethodInvocation), ['g.h(1, (i & 1))', 'a.<T>b()'])
+        self.assertEqual(self.texts(model.And), ['i & 1'])
+        self.assertEqual(self.texts(model.Cast), ['(List<List<T>>) g.h(1, (i & 1))'])
+        self.assertEqual(self.texts(model.TypeParameter), ['T extends Map<String, List<T>>'])
+        self.assertEqual(self.texts(model.EnumConstant), ['X', 'Y(1)'])
+        self.assertEqual(self.texts(model.SwitchCase), ['case 0:\n                a.<T>b();', 'default:'])
+        types = self.texts(model.Type)
+        self.assertTrue('Map<String, List<T>>' in types)
+        self.assertTrue('List<List<T>>' in types)
+        self.assertTrue('List<T>' in types)
+        declaration = find(self.result.tree, model.ClassDeclaration)[0]
+        self.assertEqual(declaration.modifiers, ())
+        self.assertTrue(self.result.text(declaration).startswith('class A<'))
+
+    def test_position(self):
+        call = find(self.result.tree, model.MethodInvocation)[1]
+        self.assertEqual(self.result.position(call), ((8, 17), (8, 25)))
+
+    def test_expression_spans(self):
+        result = plyj.Parser().parse('a + f(b)', goal='expression')
+        self.assertEqual(result.span(result.tree), (0, 8))
+        self.assertEqual(result.text(result.tree.rhs), 'f(b)')
+
+    def test_no_position_fields(self):
+        call = plyj.Parser().parse_expression('f(a, b)')
+        self.assertEqual(call._fields, ('name', 'arguments', 'type_arguments', 'target'))
+        self.assertEqual(call, model.MethodInvocation('f', arguments=[model.Name('a'), model.Name('b')]))
+
+
+class TrackingTest(unittest.TestCase):
+
+    code = 'class A { void m() { f(1); g(h(2)); } int x = y(); }'
+
+    def setUp(self):
+        self.parser = plyj.Parser()
+
+    def test_no_tracking(self):
+        result = self.parser.parse(self.code, track=False)
+        self.assertEqual(len(result.spans), 0)
+        self.assertEqual(result.tree, self.parser.parse(self.code).tree)
+        self.assertEqual(result.tree, self.parser.parse_string(self.code))
+
+    def test_selected_classes(self):
+        result = self.parser.parse(self.code, track=(model.MethodInvocation, model.MethodDeclaration))
+        self.assertEqual(sorted(result.text(node) for node in result.spans.nodes),
+                         ['f(1)', 'g(h(2))', 'h(2)', 'void m() { f(1); g(h(2)); }', 'y()'])
+        self.assertEqual(result.tree, self.parser.parse(self.code).tree)
+
+    def test_levels_after_another(self):
+        self.parser.parse(self.code, track=model.Literal)
+        self.parser.parse(self.code, track=False)
+        result = self.parser.parse(self.code)
+        call = find(result.tree, model.MethodInvocation)[0]
+        self.assertEqual(result.text(call), 'f(1)')
+        self.assertEqual(result.text(result.tree), self.code)
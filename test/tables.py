@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import plyj.parser as plyj
+import plyj.tables as tables
+
+
+class TablesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def signature(self):
+        return tables.grammar_signature(plyj.MyLexer, plyj.MyParser, plyj.START)
+
+    def test_signature_is_stable(self):
+        self.assertEqual(self.signature(), self.signature())
+
+    def test_signature_covers_grammar_docstrings(self):
+        class ChangedParser(plyj.MyParser):
+            def p_empty(self, p):
+                '''empty : ';' '''
+
+        changed = tables.grammar_signature(plyj.MyLexer, ChangedParser, plyj.START)
+        self.assertNotEqual(changed, self.signature())
+
+    def test_write_and_read(self):
+        path = os.path.join(self.tmpdir, tables.TABLE_FILE)
+        tables.write_tables({'signature': 'abc'}, path)
+        self.assertEqual(tables.read_tables(path), {'signature': 'abc'})
+        self.assertEqual(os.listdir(self.tmpdir), [tables.TABLE_FILE])
+
+    def test_missing_tables(self):
+        path = os.path.join(self.tmpdir, tables.TABLE_FILE)
+        self.assertIsNone(tables.read_tables(path))
+
+    def test_packaged_tables_match_source(self):
+        packaged = tables.read_tables(os.path.join(tables.PACKAGE_DIR, tables.TABLE_FILE))
+        if packaged is None:
+            self.skipTest('no prebuilt tables, run python -m plyj.tables')
+        self.assertEqual(packaged['source_digest'], tables.source_digest(plyj.MyParser))
+        self.assertEqual(packaged['signature'], self.signature())
+
+    def test_parser_does_not_write_to_cwd(self):
+        cwd = os.getcwd()
+        os.chdir(self.tmpdir)
+        try:
+            plyj.Parser().parse_string('class Foo {}')
+        finally:
+            os.chdir(cwd)
+        self.assertEqual(os.listdir(self.tmpdir), [])
+
+    def test_parsers_share_grammar(self):
+        p1 = plyj.Parser()
+        p2 = plyj.Parser()
+        self.assertIs(p1.grammar.engine, p2.grammar.engine)
+        self.assertIsNot(p1.lexer, p2.lexer)
+        self.assertEqual(p1.parse_expression('1 + 2'), p2.parse_expression('1 + 2'))
+
+
+class CompactTablesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        t = tables.load_tables(plyj.MyLexer(), plyj.MyParser(), plyj.START)
+        cls.action = t['parser']['action']
+        cls.goto = t['parser']['goto']
+        cls.compact = tables.CompactTables.from_dict(t['compact'])
+        cls.lr_parser = tables.make_parser(t, plyj.MyParser())
+
+    def test_action(self):
+        compact = self.compact
+        for state, row in self.action.items():
+            for terminal in compact.terminals:
+                self.assertEqual(compact.action(state, compact.terminal_ids[terminal]),
+                                 row.get(terminal))
+
+    def test_goto(self):
+        compact = self.compact
+        for state, row in self.goto.items():
+            for nonterminal, target in row.items():
+                self.assertEqual(compact.goto(state, compact.nonterminal_ids[nonterminal]),
+                                 target)
+
+    def test_defaulted_states(self):
+        defaulted = self.lr_parser.defaulted_states
+        for state, rule in enumerate(self.compact.defaulted):
+            self.assertEqual(rule, defaulted.get(state, 0))
+
+    def test_productions(self):
+        compact = self.compact
+        for i, p in enumerate(self.lr_parser.productions):
+            self.assertEqual(compact.nonterminals[compact.prod_lhs[i]], p.name)
+            self.assertEqual(compact.prod_len[i], p.len)
+            self.assertEqual(compact.prod_func[i], p.func)
+
+
+class TableCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.builds = []
+        self.package_dir = tables.PACKAGE_DIR
+        self.build_tables = tables.build_tables
+        tables.PACKAGE_DIR = self.tmpdir
+        tables.build_tables = self.fake_build_tables
+
+    def tearDown(self):
+        tables.PACKAGE_DIR = self.package_dir
+        tables.build_tables = self.build_tables
+        shutil.rmtree(self.tmpdir)
+
+    def fake_build_tables(self, lexer_module, parser_module, start, signature):
+        self.builds.append(signature)
+        return {'signature': signature, 'source_digest': 'fake'}
+
+    def load(self, cache_dir):
+        return tables.load_tables(plyj.MyLexer(), plyj.MyParser(), plyj.START, cache_dir)
+
+    def test_cache_dir(self):
+        cache_dir = os.path.join(self.tmpdir, 'cache')
+        first = self.load(cache_dir)
+        second = self.load(cache_dir)
+        self.assertEqual(len(self.builds), 1)
+        self.assertEqual(first, second)
+        self.assertEqual(os.listdir(cache_dir),
+                         [os.path.basename(tables.cache_file(cache_dir, self.builds[0]))])
+
+    def test_cache_dir_from_environment(self):
+        cache_dir = os.path.join(self.tmpdir, 'cache')
+        os.environ[tables.CACHE_ENV] = cache_dir
+        try:
+            self.load(None)
+        finally:
+            del os.environ[tables.CACHE_ENV]
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+    def test_unwritable_cache_dir(self):
+        blocker = os.path.join(self.tmpdir, 'file')
+        open(blocker, 'w').close()
+        loaded = self.load(os.path.join(blocker, 'cache'))
+        self.assertEqual(loaded['signature'], self.builds[0])
+
+    def test_corrupt_cache_file(self):
+        cache_dir = os.path.join(self.tmpdir, 'cache')
+        self.load(cache_dir)
+        with open(tables.cache_file(cache_dir, self.builds[0]), 'wb') as f:
+            f.write(b'\x80\x02}q')
+        self.load(cache_dir)
+        self.assertEqual(len(self.builds), 2)
+
+    def test_stale_packaged_tables(self):
+        path = os.path.join(self.tmpdir, tables.TABLE_FILE)
+        tables.write_tables({'signature': 'stale', 'source_digest': 'stale'}, path)
+        self.load(None)
+        self.assertEqual(len(self.builds), 1)
+
+    def test_packaged_tables_with_current_signature(self):
+        signature = tables.grammar_signature(plyj.MyLexer, plyj.MyParser, plyj.START)
+        path = os.path.join(self.tmpdir, tables.TABLE_FILE)
+        tables.write_tables({'signature': signature, 'source_digest': 'edited'}, path)
+        self.assertEqual(self.load(None)['signature'], signature)
+        self.assertEqual(self.builds, [])
+
+    def test_packaged_tables_with_current_source(self):
+        digest = tables.source_digest(plyj.MyParser)
+        path = os.path.join(self.tmpdir, tables.TABLE_FILE)
+        tables.write_tables({'signature': 'not checked', 'source_digest': digest}, path)
+        self.assertEqual(self.load(None)['signature'], 'not checked')
+        self.assertEqual(self.builds, [])
@@ -0,0 +1,67 @@
+import sys
+import threading
+import unittest
+
+import plyj.parser as plyj
+
+
+class ThreadTest(unittest.TestCase):
+
+    def test_shared_parser(self):
+        parser = plyj.Parser()
+        sources = ['class A{0} {{ void m() {{ f({0}); }} }}'.format(i) for i in range(8)]
+        broken = 'class A {\n  int x = ;\n}'
+        expected = [parser.parse(code, lineno=i + 1) for i, code in enumerate(sources)]
+        # the line numbers of diagnostics come from the scanner
+        diagnostics = [parser.parse(broken, lineno=i + 1, recover=True).diagnostics
+                       for i in range(len(sources))]
+        failures = []
+
+        def work(i):
+            try:
+                for _ in range(20):
+                    result = parser.parse(sources[i], lineno=i + 1)
+                    if (result.tree != expected[i].tree or
+                            result.position(result.tree) != expected[i].position(expected[i].tree)):
+                        failures.append(i)
+                    if parser.parse(broken, lineno=i + 1, recover=True).diagnostics != diagnostics[i]:
+                        failures.append(i)
+            except Exception as e:
+                failures.append(e)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(len(sources))]
+        # switch threads as often as possible to provoke races
+        interval = sys.getcheckinterval()
+        sys.setcheckinterval(1)
+        try:
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        finally:
+            sys.setcheckinterval(interval)
+        self.assertEqual(failures, [])
+        self.assertEqual(diagnostics[2][0].line, 4)
+
+    def test_lazy_body(self):
+        # threads that read the same lazy body at once all get the one parse
+        parser = plyj.Parser()
+        code = 'class A { void m() { ' + 'f(1); ' * 200 + 'int } }'
+        for _ in range(10):
+            result = parser.parse(code, bodies='lazy', recover=True)
+            method = result.tree.type_declarations[0].body[0]
+            bodies = []
+            threads = [threading.Thread(target=lambda: bodies.append(method._body.value()))
+                       for _ in range(4)]
+            interval = sys.getcheckinterval()
+            sys.setcheckinterval(1)
+            try:
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+            finally:
+                sys.setcheckinterval(interval)
+            self.assertEqual(len(bodies), 4)
+            self.assertEqual(len(set(map(id, bodies))), 1)
+            self.assertEqual(len(result.diagnostics), 1)